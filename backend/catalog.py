@@ -0,0 +1,597 @@
+"""
+In-memory catalog snapshot for countries and landmarks.
+
+The catalog (~700 landmarks, ~66 countries) only changes when a seed or
+maintenance script runs, or when the API itself writes a landmark
+(create_landmark, admin edits, the periodic upvote count publish). Instead of querying MongoDB on every
+catalog read, each API worker keeps an immutable, versioned snapshot in memory
+and swaps it atomically when the catalog changes.
+
+Derived data (`CatalogSummary`, search/autocomplete/geo indexes, map clusters) is
+computed once per version from the snapshot, so it is refreshed by exactly the
+same version bump.
+
+The version lives in a single `catalog_meta` document. Anything that writes
+`countries` or `landmarks` must publish the change:
+- API code: `CatalogStore.apply_landmark`
+- motor scripts (seed_data.py): `await publish_catalog_changes(db)`
+- pymongo scripts (fix_and_expand.py): `publish_catalog_changes_sync(db)`
+
+Publishing stamps every added or changed document with `updated_version` (and
+a `content_hash` used to detect changes) and records deletions in
+`catalog_changes`, which is what lets mobile clients sync deltas
+(`CatalogSnapshot.changes_since`).
+
+Publishing also gives every new landmark a stable `ordinal`: the next free
+slot of a counter in `catalog_meta`, never reused or renumbered, so per-user
+bitsets keyed by it (visited_set.py) stay valid across catalog versions.
+
+Every worker polls the version (see `CatalogStore.watch`) and reloads when it
+moves, so writes made by scripts or by other workers show up within one poll.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from functools import cached_property
+from types import MappingProxyType
+from typing import Iterable, Mapping, Optional, Tuple
+
+from pymongo import ReturnDocument, UpdateOne
+
+from catalog_file import read_catalog_file, write_catalog_file
+from catalog_search import PrefixIndex, SearchIndex
+from geo_index import GeoIndex
+from map_clusters import MapClusters
+
+logger = logging.getLogger(__name__)
+
+CATALOG_META_ID = "catalog"
+
+# kind -> (collection, id field)
+CATALOG_COLLECTIONS = {
+    "country": ("countries", "country_id"),
+    "landmark": ("landmarks", "landmark_id"),
+}
+
+# Bookkeeping fields that are not part of a document's content
+_BOOKKEEPING_FIELDS = ("_id", "updated_version", "content_hash", "ordinal")
+
+
+def content_hash(doc: dict) -> str:
+    content = {k: v for k, v in doc.items() if k not in _BOOKKEEPING_FIELDS}
+    return hashlib.sha1(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _public(doc: dict) -> dict:
+    return {k: v for k, v in doc.items() if k not in ("_id", "content_hash")}
+
+
+@dataclass(frozen=True)
+class CatalogSummary:
+    """Per-country and per-continent aggregates, computed once per version"""
+    countries: Tuple[dict, ...]  # country docs with landmark_count / total_points
+    continents: Tuple[dict, ...]  # {continent, landmarks, points, countries}, sorted by continent
+    grand_total: Mapping[str, int]
+
+
+def summarize_catalog(countries: Iterable[dict], landmarks: Iterable[dict]) -> CatalogSummary:
+    country_totals = {}
+    continent_totals = {}
+    for landmark in landmarks:
+        country = country_totals.setdefault(landmark.get("country_id"), {"landmark_count": 0, "total_points": 0})
+        country["landmark_count"] += 1
+        # Total available points (official=10pts, premium=25pts)
+        country["total_points"] += landmark.get("points", 10)
+
+        continent = continent_totals.setdefault(
+            landmark.get("continent"), {"landmarks": 0, "points": 0, "countries": set()}
+        )
+        continent["landmarks"] += 1
+        continent["points"] += landmark.get("points", 0)
+        continent["countries"].add(landmark.get("country_name"))
+
+    country_rows = tuple(
+        {**country, **country_totals.get(country["country_id"], {"landmark_count": 0, "total_points": 0})}
+        for country in countries
+    )
+    continent_rows = tuple(
+        {
+            "continent": continent,
+            "landmarks": totals["landmarks"],
+            "points": totals["points"],
+            "countries": len(totals["countries"]),
+        }
+        for continent, totals in sorted(continent_totals.items(), key=lambda item: item[0] or "")
+    )
+    grand_total = MappingProxyType({
+        "landmarks": sum(c["landmarks"] for c in continent_rows),
+        "points": sum(c["points"] for c in continent_rows),
+        "countries": sum(c["countries"] for c in continent_rows),
+    })
+    return CatalogSummary(countries=country_rows, continents=continent_rows, grand_total=grand_total)
+
+
+def category_rank(landmark: dict) -> int:
+    """Official landmarks always list before premium / user-suggested ones"""
+    return 0 if landmark.get("category") == "official" else 1
+
+
+# sort_by -> (secondary key, descending), applied after category_rank
+LANDMARK_SORTS = {
+    "upvotes_desc": (lambda l: l.get("upvotes", 0), True),
+    "points_desc": (lambda l: l.get("points", 0), True),
+    "points_asc": (lambda l: l.get("points", 0), False),
+    "name_asc": (lambda l: l.get("name", ""), False),
+    "name_desc": (lambda l: l.get("name", ""), True),
+}
+DEFAULT_LANDMARK_SORT = "name_asc"
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """Immutable view of the catalog at one version.
+
+    The documents themselves are plain dicts shared by every request: treat
+    them as read-only and copy (`dict(doc)`) before adding per-user fields.
+    """
+    version: int
+    countries: Tuple[dict, ...]
+    landmarks: Tuple[dict, ...]
+    countries_by_id: Mapping[str, dict]
+    landmarks_by_id: Mapping[str, dict]
+    landmarks_by_country: Mapping[str, Tuple[dict, ...]]
+    summary: CatalogSummary
+    # Deletion records from `catalog_changes`: {"kind", "id", "version"}
+    tombstones: Tuple[dict, ...] = ()
+    # Autocomplete index of the version this one replaced, if it was built
+    _previous_autocomplete: Optional[PrefixIndex] = field(default=None, repr=False, compare=False)
+
+    @classmethod
+    def build(
+        cls,
+        version: int,
+        countries: Iterable[dict],
+        landmarks: Iterable[dict],
+        previous: Optional["CatalogSnapshot"] = None,
+        tombstones: Iterable[dict] = (),
+    ) -> "CatalogSnapshot":
+        countries = tuple(countries)
+        landmarks = tuple(landmarks)
+
+        by_country = {}
+        for landmark in landmarks:
+            by_country.setdefault(landmark.get("country_id"), []).append(landmark)
+
+        return cls(
+            version=version,
+            countries=countries,
+            landmarks=landmarks,
+            countries_by_id=MappingProxyType({c["country_id"]: c for c in countries}),
+            landmarks_by_id=MappingProxyType({l["landmark_id"]: l for l in landmarks}),
+            landmarks_by_country=MappingProxyType({k: tuple(v) for k, v in by_country.items()}),
+            summary=summarize_catalog(countries, landmarks),
+            tombstones=tuple(tombstones),
+            _previous_autocomplete=previous.__dict__.get("autocomplete_index") if previous else None,
+        )
+
+    def with_landmark(self, landmark: dict, version: int) -> "CatalogSnapshot":
+        """Copy-on-write: a new snapshot with one landmark added or replaced"""
+        return self.with_landmarks([landmark], version)
+
+    def with_landmarks(self, changed: Iterable[dict], version: int) -> "CatalogSnapshot":
+        """Copy-on-write: a new snapshot with landmarks added or replaced"""
+        changed = {landmark["landmark_id"]: landmark for landmark in changed}
+        landmarks = [changed.pop(l["landmark_id"], l) for l in self.landmarks]
+        landmarks.extend(changed.values())
+        return CatalogSnapshot.build(version, self.countries, landmarks, previous=self, tombstones=self.tombstones)
+
+    def changes_since(self, since_version: Optional[int]) -> dict:
+        """Delta-sync bundle: what changed after `since_version`, or everything.
+
+        A full bundle is returned on first launch (no version) and whenever the
+        client's version is not one this catalog could have produced.
+        """
+        full = not since_version or since_version < 0 or since_version > self.version
+        if full:
+            countries, landmarks, deleted = self.countries, self.landmarks, ()
+        else:
+            countries = [c for c in self.countries if c.get("updated_version", 0) > since_version]
+            landmarks = [l for l in self.landmarks if l.get("updated_version", 0) > since_version]
+            deleted = [t for t in self.tombstones if t["version"] > since_version]
+        return {
+            "version": self.version,
+            "full": full,
+            "countries": [_public(c) for c in countries],
+            "landmarks": [_public(l) for l in landmarks],
+            "deleted_country_ids": sorted(
+                t["id"] for t in deleted if t["kind"] == "country" and t["id"] not in self.countries_by_id
+            ),
+            "deleted_landmark_ids": sorted(
+                t["id"] for t in deleted if t["kind"] == "landmark" and t["id"] not in self.landmarks_by_id
+            ),
+        }
+
+    @cached_property
+    def _orderings(self) -> dict:
+        return {}
+
+    def ordered_landmarks(self, sort_by: Optional[str], country_id: Optional[str] = None) -> Tuple[dict, ...]:
+        """Landmarks (optionally one country's) in list order: category first, then `sort_by`.
+
+        Each ordering is sorted once per version and reused by every request.
+        """
+        if sort_by not in LANDMARK_SORTS:
+            sort_by = DEFAULT_LANDMARK_SORT
+        cache_key = (sort_by, country_id)
+        ordering = self._orderings.get(cache_key)
+        if ordering is None:
+            landmarks = self.landmarks_by_country.get(country_id, ()) if country_id else self.landmarks
+            key, descending = LANDMARK_SORTS[sort_by]
+            # Two stable sorts: secondary key first, then category rank
+            ordering = sorted(landmarks, key=key, reverse=descending)
+            ordering.sort(key=category_rank)
+            ordering = tuple(ordering)
+            self._orderings[cache_key] = ordering
+        return ordering
+
+    @cached_property
+    def countries_by_continent(self) -> Mapping[str, Tuple[str, ...]]:
+        """{continent: country ids}"""
+        by_continent = {}
+        for country in self.countries:
+            by_continent.setdefault(country.get("continent"), []).append(country["country_id"])
+        return MappingProxyType({k: tuple(v) for k, v in by_continent.items()})
+
+    @cached_property
+    def landmarks_by_ordinal(self) -> Mapping[int, dict]:
+        """{ordinal: landmark} for landmarks that have been given one"""
+        return MappingProxyType({l["ordinal"]: l for l in self.landmarks if l.get("ordinal") is not None})
+
+    @cached_property
+    def country_ordinal_masks(self) -> Mapping[str, int]:
+        """{country_id: int with the bits of the country's landmark ordinals set}"""
+        masks = {}
+        for ordinal, landmark in self.landmarks_by_ordinal.items():
+            masks[landmark.get("country_id")] = masks.get(landmark.get("country_id"), 0) | (1 << ordinal)
+        return MappingProxyType(masks)
+
+    @cached_property
+    def search_index(self) -> SearchIndex:
+        """Full-text index, built on first search against this version"""
+        return SearchIndex(self.landmarks)
+
+    @cached_property
+    def geo_index(self) -> GeoIndex:
+        """Spatial grid over landmark coordinates, built on first nearby query"""
+        return GeoIndex(self.landmarks)
+
+    @cached_property
+    def map_clusters(self) -> MapClusters:
+        """Per-zoom map clusters, built on first map request"""
+        return MapClusters(self.landmarks)
+
+    @cached_property
+    def autocomplete_index(self) -> PrefixIndex:
+        """Typeahead index, derived incrementally from the previous version's"""
+        base = self._previous_autocomplete
+        object.__setattr__(self, "_previous_autocomplete", None)
+        if base is not None:
+            return base.updated(self.landmarks, self.countries)
+        return PrefixIndex(self.landmarks, self.countries)
+
+
+async def get_catalog_version(db) -> int:
+    meta = await db.catalog_meta.find_one({"_id": CATALOG_META_ID}, {"version": 1})
+    return meta.get("version", 0) if meta else 0
+
+
+def _bump_update(extra: Optional[dict] = None) -> dict:
+    update = {"$inc": {"version": 1}, "$set": {"updated_at": datetime.now(timezone.utc)}}
+    for operator, fields in (extra or {}).items():
+        update.setdefault(operator, {}).update(fields)
+    return update
+
+
+async def bump_catalog_version(db, extra: Optional[dict] = None) -> int:
+    """Mark the catalog as changed. Returns the new version."""
+    meta = await db.catalog_meta.find_one_and_update(
+        {"_id": CATALOG_META_ID},
+        _bump_update(extra),
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return meta["version"]
+
+
+def bump_catalog_version_sync(db, extra: Optional[dict] = None) -> int:
+    """`bump_catalog_version` for scripts using a synchronous pymongo client"""
+    meta = db.catalog_meta.find_one_and_update(
+        {"_id": CATALOG_META_ID},
+        _bump_update(extra),
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return meta["version"]
+
+
+def _ordinal_ops(landmark_ids: Iterable[str], first: int) -> list:
+    # A landmark that got an ordinal meanwhile keeps it; the reserved slot stays unused
+    return [
+        UpdateOne({"landmark_id": landmark_id, "ordinal": {"$exists": False}}, {"$set": {"ordinal": first + i}})
+        for i, landmark_id in enumerate(landmark_ids)
+    ]
+
+
+async def reserve_landmark_ordinals(db, count: int) -> int:
+    """Reserve `count` consecutive ordinals. Returns the first one."""
+    meta = await db.catalog_meta.find_one_and_update(
+        {"_id": CATALOG_META_ID},
+        {"$inc": {"landmark_ordinals": count}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return meta["landmark_ordinals"] - count
+
+
+async def assign_landmark_ordinals(db) -> int:
+    """Give every landmark without an ordinal the next free one. Returns how many."""
+    missing = await db.landmarks.find({"ordinal": {"$exists": False}}, {"_id": 0, "landmark_id": 1}).to_list(None)
+    landmark_ids = sorted(l["landmark_id"] for l in missing)
+    if landmark_ids:
+        first = await reserve_landmark_ordinals(db, len(landmark_ids))
+        await db.landmarks.bulk_write(_ordinal_ops(landmark_ids, first), ordered=False)
+    return len(landmark_ids)
+
+
+def assign_landmark_ordinals_sync(db) -> int:
+    """`assign_landmark_ordinals` for scripts using a synchronous pymongo client"""
+    missing = db.landmarks.find({"ordinal": {"$exists": False}}, {"_id": 0, "landmark_id": 1})
+    landmark_ids = sorted(l["landmark_id"] for l in missing)
+    if landmark_ids:
+        meta = db.catalog_meta.find_one_and_update(
+            {"_id": CATALOG_META_ID},
+            {"$inc": {"landmark_ordinals": len(landmark_ids)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        first = meta["landmark_ordinals"] - len(landmark_ids)
+        db.landmarks.bulk_write(_ordinal_ops(landmark_ids, first), ordered=False)
+    return len(landmark_ids)
+
+
+def _plan_publish(meta: dict, docs_by_kind: dict) -> dict:
+    """Which documents need a new updated_version, and which were deleted"""
+    plan = {"stamps": {}, "deleted": {}, "ids": {}}
+    for kind, (_, id_field) in CATALOG_COLLECTIONS.items():
+        docs = docs_by_kind[kind]
+        plan["stamps"][kind] = [
+            (doc[id_field], digest)
+            for doc in docs
+            for digest in (content_hash(doc),)
+            if doc.get("content_hash") != digest or "updated_version" not in doc
+        ]
+        ids = [doc[id_field] for doc in docs]
+        plan["deleted"][kind] = sorted(set(meta.get(f"{kind}_ids") or []) - set(ids))
+        plan["ids"][kind] = ids
+    return plan
+
+
+def _publish_ops(plan: dict, version: int) -> dict:
+    """collection name -> bulk write operations stamping `version`"""
+    ops = {}
+    for kind, (collection, id_field) in CATALOG_COLLECTIONS.items():
+        ops[collection] = [
+            UpdateOne({id_field: doc_id}, {"$set": {"updated_version": version, "content_hash": digest}})
+            for doc_id, digest in plan["stamps"][kind]
+        ]
+    ops["catalog_changes"] = [
+        UpdateOne(
+            {"kind": kind, "id": doc_id},
+            {"$set": {"version": version, "deleted": True}},
+            upsert=True,
+        )
+        for kind, doc_ids in plan["deleted"].items()
+        for doc_id in doc_ids
+    ]
+    return {collection: collection_ops for collection, collection_ops in ops.items() if collection_ops}
+
+
+def _known_ids(plan: dict) -> dict:
+    return {"$set": {f"{kind}_ids": ids for kind, ids in plan["ids"].items()}}
+
+
+# Publishing stamps documents with the version it expects to get, bumps, and
+# re-stamps if another writer bumped in between. A worker only reloads after
+# a bump, so it never sees changed content without the matching stamp.
+
+async def publish_catalog_changes(db) -> int:
+    """Stamp added/changed documents, record deletions, bump the version.
+
+    Call once after a batch of catalog writes. Returns the new version.
+    """
+    await assign_landmark_ordinals(db)
+    meta = await db.catalog_meta.find_one({"_id": CATALOG_META_ID}) or {}
+    docs_by_kind = {
+        kind: await db[collection].find({}, {"_id": 0}).to_list(None)
+        for kind, (collection, _) in CATALOG_COLLECTIONS.items()
+    }
+    plan = _plan_publish(meta, docs_by_kind)
+
+    predicted = meta.get("version", 0) + 1
+    for collection, ops in _publish_ops(plan, predicted).items():
+        await db[collection].bulk_write(ops, ordered=False)
+    version = await bump_catalog_version(db, _known_ids(plan))
+    if version != predicted:
+        for collection, ops in _publish_ops(plan, version).items():
+            await db[collection].bulk_write(ops, ordered=False)
+    return version
+
+
+def publish_catalog_changes_sync(db) -> int:
+    """`publish_catalog_changes` for scripts using a synchronous pymongo client"""
+    assign_landmark_ordinals_sync(db)
+    meta = db.catalog_meta.find_one({"_id": CATALOG_META_ID}) or {}
+    docs_by_kind = {
+        kind: list(db[collection].find({}, {"_id": 0}))
+        for kind, (collection, _) in CATALOG_COLLECTIONS.items()
+    }
+    plan = _plan_publish(meta, docs_by_kind)
+
+    predicted = meta.get("version", 0) + 1
+    for collection, ops in _publish_ops(plan, predicted).items():
+        db[collection].bulk_write(ops, ordered=False)
+    version = bump_catalog_version_sync(db, _known_ids(plan))
+    if version != predicted:
+        for collection, ops in _publish_ops(plan, version).items():
+            db[collection].bulk_write(ops, ordered=False)
+    return version
+
+
+class CatalogStore:
+    """Holds the current snapshot for this process and swaps it on change.
+
+    Readers grab `store.snapshot` once per request and use that object
+    throughout, so a concurrent swap never mixes two versions in one response.
+    """
+
+    def __init__(self):
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._reload_lock = asyncio.Lock()
+
+    @property
+    def snapshot(self) -> Optional[CatalogSnapshot]:
+        return self._snapshot
+
+    async def get(self, db) -> CatalogSnapshot:
+        """Current snapshot, loading it on first use"""
+        if self._snapshot is None:
+            await self.reload(db)
+        return self._snapshot
+
+    async def reload(self, db) -> CatalogSnapshot:
+        async with self._reload_lock:
+            # Read the version before the data: if a writer bumps it while we
+            # load, the next poll sees the newer version and reloads again.
+            version = await get_catalog_version(db)
+            countries = await db.countries.find({}, {"_id": 0}).to_list(None)
+            landmarks = await db.landmarks.find({}, {"_id": 0}).to_list(None)
+            tombstones = await db.catalog_changes.find({"deleted": True}, {"_id": 0}).to_list(None)
+            self._snapshot = CatalogSnapshot.build(
+                version, countries, landmarks, previous=self._snapshot, tombstones=tombstones
+            )
+            logger.info(
+                f"Catalog snapshot v{version} loaded: {len(countries)} countries, {len(landmarks)} landmarks"
+            )
+            return self._snapshot
+
+    async def load(self, db, snapshot_path=None) -> CatalogSnapshot:
+        """Startup load: from the compiled snapshot file when it holds the
+        current version, otherwise from MongoDB (and then recompile the file
+        so the next start is fast).
+        """
+        if snapshot_path is None:
+            return await self.reload(db)
+
+        version = await get_catalog_version(db)
+        try:
+            contents = await asyncio.to_thread(read_catalog_file, snapshot_path, version)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring catalog snapshot file {snapshot_path}: {e}")
+            contents = None
+
+        if contents is None:
+            snapshot = await self.reload(db)
+            try:
+                await asyncio.to_thread(
+                    write_catalog_file, snapshot_path, snapshot.version,
+                    snapshot.countries, snapshot.landmarks, snapshot.tombstones,
+                )
+            except OSError as e:
+                logger.warning(f"Could not write catalog snapshot file {snapshot_path}: {e}")
+            return snapshot
+
+        async with self._reload_lock:
+            self._snapshot = CatalogSnapshot.build(
+                contents["version"], contents["countries"], contents["landmarks"],
+                previous=self._snapshot, tombstones=contents["tombstones"],
+            )
+            logger.info(
+                f"Catalog snapshot v{version} loaded from {snapshot_path}: "
+                f"{len(contents['countries'])} countries, {len(contents['landmarks'])} landmarks"
+            )
+            return self._snapshot
+
+    async def refresh_if_stale(self, db) -> CatalogSnapshot:
+        version = await get_catalog_version(db)
+        if self._snapshot is None or self._snapshot.version != version:
+            return await self.reload(db)
+        return self._snapshot
+
+    async def apply_landmark(self, db, landmark: dict) -> CatalogSnapshot:
+        """Publish a landmark write made by this process"""
+        return await self.apply_landmarks(db, [landmark])
+
+    async def apply_landmarks(self, db, landmarks: Iterable[dict]) -> CatalogSnapshot:
+        """Publish landmark writes made by this process as one catalog version.
+
+        Stamps the landmarks, bumps the shared version and patches the local
+        snapshot in place of a full reload, unless another writer got in
+        between, in which case we reload so their change is not lost.
+        """
+        landmarks = [{k: v for k, v in landmark.items() if k != "_id"} for landmark in landmarks]
+        if not landmarks:
+            return await self.get(db)
+        current = self._snapshot
+        for landmark in landmarks:
+            landmark["content_hash"] = content_hash(landmark)
+            known = current.landmarks_by_id.get(landmark["landmark_id"]) if current else None
+            if landmark.get("ordinal") is None and known and known.get("ordinal") is not None:
+                landmark["ordinal"] = known["ordinal"]
+        new = [landmark for landmark in landmarks if landmark.get("ordinal") is None]
+        if new:
+            first = await reserve_landmark_ordinals(db, len(new))
+            for i, landmark in enumerate(new):
+                landmark["ordinal"] = first + i
+            await db.landmarks.bulk_write(_ordinal_ops([l["landmark_id"] for l in new], first), ordered=False)
+
+        async def stamp(version):
+            for landmark in landmarks:
+                landmark["updated_version"] = version
+            await db.landmarks.bulk_write([
+                UpdateOne(
+                    {"landmark_id": landmark["landmark_id"]},
+                    {"$set": {"updated_version": version, "content_hash": landmark["content_hash"]}}
+                )
+                for landmark in landmarks
+            ], ordered=False)
+
+        predicted = (current.version if current else await get_catalog_version(db)) + 1
+        await stamp(predicted)
+        version = await bump_catalog_version(
+            db, {"$addToSet": {"landmark_ids": {"$each": [l["landmark_id"] for l in landmarks]}}}
+        )
+        if version != predicted:
+            await stamp(version)
+
+        if current is not None and version == current.version + 1:
+            self._snapshot = current.with_landmarks(landmarks, version)
+            return self._snapshot
+        return await self.reload(db)
+
+    async def watch(self, db, interval: float):
+        """Poll the catalog version forever, reloading when it changes"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh_if_stale(db)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Catalog refresh failed: {e}")
+
+
+catalog_store = CatalogStore()
@@ -0,0 +1,324 @@
+"""
+Bulk catalog edits.
+
+A batch is a list of patches:
+
+    {"op": "update", "kind": "landmark", "id": "japan_tokyo_tower", "fields": {"images": [...]}}
+    {"op": "upsert", "kind": "landmark", "id": "peru_nazca_lines", "fields": {"name": ..., ...}}
+    {"op": "delete", "kind": "country", "id": "atlantis"}
+
+The whole batch is validated against the current catalog (plus the batch's
+own upserts and deletes) before anything is written, and the catalog as it
+would be after the batch is run through `catalog_validation`: a batch that
+adds an error-level issue (a duplicate name, swapped coordinates, ...) is
+rejected, new warnings are returned with the result. It is then applied with
+one ordered `bulk_write` per collection, and published as exactly one catalog
+version, so every cache, ETag and aggregate keyed on the version is
+invalidated once per batch.
+
+An upsert sets every writable field of the document (clearing the writable
+fields it leaves out) and keeps everything else stored on it: upvotes,
+ordinal, created_at, image placeholders, created_by, ...
+
+If a write fails part-way, what reached the database is still published (so
+the catalog matches it) and `CatalogBatchPartiallyApplied` reports which
+operations were applied; nothing is published when nothing was written.
+
+Used by `POST /api/admin/catalog/bulk` and from the command line:
+
+    python catalog_bulk.py patches.json [--dry-run]
+
+(`patches.json` holds a list of patches or {"patches": [...]}.)
+"""
+
+import argparse
+import asyncio
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import DeleteOne, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from catalog import CATALOG_COLLECTIONS, CatalogSnapshot, catalog_store, publish_catalog_changes
+from catalog_validation import ERROR, new_issues, validate_catalog
+
+OPS = ("update", "upsert", "delete")
+LANDMARK_CATEGORIES = ("official", "premium", "user_suggested")
+MAX_BATCH_SIZE = 5000
+
+# Writable fields and their checks; the id field is set from the patch id
+LANDMARK_FIELDS = {
+    "name": lambda v: isinstance(v, str) and v.strip() != "",
+    "alternate_names": lambda v: isinstance(v, list) and all(isinstance(n, str) for n in v),
+    "country_id": lambda v: isinstance(v, str) and v != "",
+    "description": lambda v: isinstance(v, str),
+    "category": lambda v: v in LANDMARK_CATEGORIES,
+    "image_url": lambda v: v is None or (isinstance(v, str) and v.startswith(("http://", "https://"))),
+    "images": lambda v: isinstance(v, list) and all(isinstance(u, str) and u.startswith(("http://", "https://")) for u in v),
+    "facts": lambda v: isinstance(v, list) and all(isinstance(f, dict) and {"text", "icon"} <= set(f) for f in v),
+    "best_time_to_visit": lambda v: v is None or isinstance(v, str),
+    "duration": lambda v: v is None or isinstance(v, str),
+    "difficulty": lambda v: v is None or isinstance(v, str),
+    "latitude": lambda v: v is None or (isinstance(v, (int, float)) and not isinstance(v, bool) and -90 <= v <= 90),
+    "longitude": lambda v: v is None or (isinstance(v, (int, float)) and not isinstance(v, bool) and -180 <= v <= 180),
+    "points": lambda v: isinstance(v, int) and not isinstance(v, bool) and 0 <= v <= 1000,
+}
+LANDMARK_REQUIRED = ("name", "country_id", "description", "category")
+
+COUNTRY_FIELDS = {
+    "name": lambda v: isinstance(v, str) and v.strip() != "",
+    "continent": lambda v: isinstance(v, str) and v.strip() != "",
+    "image_url": lambda v: v is None or (isinstance(v, str) and v.startswith(("http://", "https://"))),
+}
+COUNTRY_REQUIRED = ("name", "continent")
+
+FIELDS = {"landmark": (LANDMARK_FIELDS, LANDMARK_REQUIRED), "country": (COUNTRY_FIELDS, COUNTRY_REQUIRED)}
+
+
+class CatalogBatchError(ValueError):
+    def __init__(self, errors: List[str]):
+        super().__init__(f"{len(errors)} invalid patch(es)")
+        self.errors = errors
+
+
+class CatalogBatchPartiallyApplied(RuntimeError):
+    """A write failed part-way; `applied` is {collection: operations written} (None: unknown)"""
+
+    def __init__(self, applied: Dict[str, Optional[int]], operations: Dict[str, int], version: int):
+        super().__init__(f"catalog batch only partially applied: {applied} of {operations} (published as version {version})")
+        self.applied = applied
+        self.operations = operations
+        self.version = version
+
+
+def _check_fields(kind: str, fields: dict, require_all: bool) -> List[str]:
+    allowed, required = FIELDS[kind]
+    errors = [f"unknown field '{name}'" for name in fields if name not in allowed]
+    errors += [f"invalid value for '{name}'" for name, value in fields.items() if name in allowed and not allowed[name](value)]
+    if require_all:
+        errors += [f"missing required field '{name}'" for name in required if name not in fields]
+    return errors
+
+
+def validate_patches(patches: List[dict], snapshot: CatalogSnapshot) -> List[str]:
+    """Every problem with the batch, as 'patch N (kind id): message'. Empty when valid."""
+    if not patches:
+        return ["batch is empty"]
+    if len(patches) > MAX_BATCH_SIZE:
+        return [f"batch has {len(patches)} patches, the limit is {MAX_BATCH_SIZE}"]
+
+    # State of the catalog after the batch, for cross-document checks
+    countries = {c["country_id"]: c for c in snapshot.countries}
+    landmarks = {l["landmark_id"]: l for l in snapshot.landmarks}
+    state = {"country": countries, "landmark": landmarks}
+
+    errors = []
+    seen = set()
+    for index, patch in enumerate(patches):
+        op, kind, doc_id = patch.get("op"), patch.get("kind"), patch.get("id")
+        fields = patch.get("fields") or {}
+        where = f"patch {index} ({kind} {doc_id})"
+
+        if op not in OPS:
+            errors.append(f"{where}: op must be one of {', '.join(OPS)}")
+            continue
+        if kind not in FIELDS:
+            errors.append(f"{where}: kind must be 'landmark' or 'country'")
+            continue
+        if not isinstance(doc_id, str) or not doc_id:
+            errors.append(f"{where}: id is required")
+            continue
+        if (kind, doc_id) in seen:
+            errors.append(f"{where}: {kind} is patched more than once in this batch")
+            continue
+        seen.add((kind, doc_id))
+
+        if op == "delete":
+            if doc_id not in state[kind]:
+                errors.append(f"{where}: does not exist")
+            state[kind].pop(doc_id, None)
+            continue
+        if op == "update":
+            if doc_id not in state[kind]:
+                errors.append(f"{where}: does not exist (use op 'upsert' to create it)")
+                continue
+            if not fields:
+                errors.append(f"{where}: nothing to update")
+                continue
+
+        errors += [f"{where}: {message}" for message in _check_fields(kind, fields, require_all=(op == "upsert"))]
+        current = state[kind].get(doc_id, {}) if op == "update" else {}
+        state[kind][doc_id] = {**current, **fields}
+
+    # Every landmark must point to a country that exists after the batch
+    for index, patch in enumerate(patches):
+        if patch.get("kind") == "landmark" and patch.get("op") in ("update", "upsert"):
+            landmark = landmarks.get(patch.get("id"))
+            if landmark and landmark.get("country_id") not in countries:
+                errors.append(f"patch {index} (landmark {patch['id']}): unknown country '{landmark.get('country_id')}'")
+    deleted_countries = {
+        p["id"] for p in patches if p.get("kind") == "country" and p.get("op") == "delete"
+    }
+    for landmark_id, landmark in landmarks.items():
+        if landmark.get("country_id") in deleted_countries:
+            errors.append(f"landmark {landmark_id}: its country '{landmark['country_id']}' is deleted by this batch")
+    return errors
+
+
+def preview_catalog(patches: List[dict], snapshot: CatalogSnapshot):
+    """(countries, landmarks) as they will be after a validated batch"""
+    state = {
+        "country": {c["country_id"]: c for c in snapshot.countries},
+        "landmark": {l["landmark_id"]: l for l in snapshot.landmarks},
+    }
+    for patch in patches:
+        docs, doc_id = state[patch["kind"]], patch["id"]
+        if patch["op"] == "delete":
+            docs.pop(doc_id, None)
+        elif patch["op"] == "update":
+            docs[doc_id] = {**docs[doc_id], **patch["fields"]}
+        else:
+            _, id_field = CATALOG_COLLECTIONS[patch["kind"]]
+            allowed, _ = FIELDS[patch["kind"]]
+            kept = {k: v for k, v in docs.get(doc_id, {}).items() if k not in allowed}
+            docs[doc_id] = dict(kept, **patch["fields"], **{id_field: doc_id})
+            if patch["kind"] == "landmark":
+                docs[doc_id].setdefault("points", 25 if patch["fields"]["category"] == "premium" else 10)
+    return list(state["country"].values()), list(state["landmark"].values())
+
+
+def build_operations(patches: List[dict], snapshot: CatalogSnapshot) -> Dict[str, list]:
+    """{collection: bulk write operations} for a validated batch, countries first"""
+    countries = {c["country_id"]: c for c in snapshot.countries}
+    for patch in patches:
+        if patch["kind"] == "country" and patch["op"] != "delete":
+            countries[patch["id"]] = {**countries.get(patch["id"], {}), **patch["fields"]}
+
+    now = datetime.now(timezone.utc)
+    operations = {collection: [] for collection, _ in CATALOG_COLLECTIONS.values()}
+    for kind in ("country", "landmark"):
+        collection, id_field = CATALOG_COLLECTIONS[kind]
+        for patch in (p for p in patches if p["kind"] == kind):
+            doc_id, fields = patch["id"], dict(patch.get("fields") or {})
+            if patch["op"] == "delete":
+                operations[collection].append(DeleteOne({id_field: doc_id}))
+                continue
+            if kind == "landmark" and "country_id" in fields:
+                # Denormalized country fields follow the country
+                country = countries[fields["country_id"]]
+                fields.update(country_name=country["name"], continent=country["continent"])
+            if patch["op"] == "update":
+                operations[collection].append(UpdateOne({id_field: doc_id}, {"$set": fields}))
+                continue
+            # Writable fields come from the patch; everything else stored on the
+            # document (upvotes, ordinal, created_at, placeholders, ...) is kept
+            allowed, _ = FIELDS[kind]
+            if kind == "landmark":
+                fields.setdefault("points", 25 if fields["category"] == "premium" else 10)
+            on_insert = {"created_at": now}
+            if kind == "landmark":
+                on_insert["upvotes"] = 0
+            update = {"$set": fields, "$setOnInsert": on_insert}
+            cleared = {name: "" for name in allowed if name not in fields}
+            if cleared:
+                update["$unset"] = cleared
+            operations[collection].append(UpdateOne({id_field: doc_id}, update, upsert=True))
+
+    # Landmarks of a country whose name or continent changed
+    for patch in patches:
+        if patch["kind"] == "country" and patch["op"] == "update" and {"name", "continent"} & set(patch["fields"]):
+            country = countries[patch["id"]]
+            operations["landmarks"].append(UpdateMany(
+                {"country_id": patch["id"]},
+                {"$set": {"country_name": country["name"], "continent": country["continent"]}}
+            ))
+    return {collection: ops for collection, ops in operations.items() if ops}
+
+
+async def apply_patches(db, patches: List[dict], dry_run: bool = False) -> dict:
+    """Validate and apply a batch. Raises CatalogBatchError when invalid."""
+    snapshot = await catalog_store.reload(db)
+    errors = validate_patches(patches, snapshot)
+    if errors:
+        raise CatalogBatchError(errors)
+
+    # Only issues the batch introduces count against it
+    issues = new_issues(
+        validate_catalog(snapshot.countries, snapshot.landmarks),
+        validate_catalog(*preview_catalog(patches, snapshot)),
+    )
+    errors = [issue["message"] for issue in issues if issue["severity"] == ERROR]
+    if errors:
+        raise CatalogBatchError(errors)
+    warnings = [issue["message"] for issue in issues if issue["severity"] != ERROR]
+
+    operations = build_operations(patches, snapshot)
+    summary = {collection: len(ops) for collection, ops in operations.items()}
+    if dry_run:
+        return {"dry_run": True, "operations": summary, "warnings": warnings, "version": snapshot.version}
+
+    applied: Dict[str, Optional[int]] = {}
+    try:
+        for collection, ops in operations.items():
+            try:
+                await db[collection].bulk_write(ops, ordered=True)
+            except BulkWriteError as e:
+                # Ordered: the operations before the first failed one were written
+                applied[collection] = e.details["writeErrors"][0]["index"]
+                raise
+            except Exception:
+                applied[collection] = None
+                raise
+            applied[collection] = len(ops)
+    except Exception as e:
+        if not any(count != 0 for count in applied.values()):
+            raise
+        # Publish what did reach the database, so the catalog matches it, and say so
+        version = await publish_catalog_changes(db)
+        await catalog_store.reload(db)
+        raise CatalogBatchPartiallyApplied(applied, summary, version) from e
+
+    version = await publish_catalog_changes(db)
+    await catalog_store.reload(db)
+    return {"dry_run": False, "operations": summary, "warnings": warnings, "version": version}
+
+
+def load_patches(path: str) -> List[dict]:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return data["patches"] if isinstance(data, dict) else data
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Apply a batch of catalog patches")
+    parser.add_argument("patches", help="JSON file with a list of patches")
+    parser.add_argument("--dry-run", action="store_true", help="validate only")
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).parent / ".env")
+    client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+    db = client[os.environ["DB_NAME"]]
+    try:
+        result = await apply_patches(db, load_patches(args.patches), dry_run=args.dry_run)
+    except CatalogBatchError as e:
+        print(f"❌ {e}:")
+        for error in e.errors:
+            print(f"  - {error}")
+        raise SystemExit(1)
+    except CatalogBatchPartiallyApplied as e:
+        print(f"❌ {e}")
+        raise SystemExit(1)
+    finally:
+        client.close()
+    for warning in result["warnings"]:
+        print(f"  ⚠️  {warning}")
+    print(f"✅ {'Validated' if result['dry_run'] else 'Applied'}: {result['operations']} (catalog version {result['version']})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
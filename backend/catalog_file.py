@@ -0,0 +1,138 @@
+"""
+Compiled catalog snapshot file.
+
+A single JSON file holding one catalog version (countries, landmarks and
+deletion tombstones), which the API reads at startup instead of fetching
+every document from MongoDB (see `CatalogStore.load`). Each worker decodes
+it into its own snapshot: the file saves the round trips and the BSON
+decoding, not memory (the snapshot's indexes need every document as a dict
+anyway).
+
+    {"format": "wlcat/3", "version": 7,
+     "countries": [...], "landmarks": [...], "tombstones": [...]}
+
+Each section's records are sorted by id; datetimes are {"$date": iso}.
+Loading the whole file is a single `json.loads`.
+
+    python catalog_file.py build [--output PATH]   # compile from MongoDB
+    python catalog_file.py info [PATH]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+FORMAT = "wlcat/3"
+SECTIONS = ("countries", "landmarks", "tombstones")
+SECTION_KEYS = {"countries": "country_id", "landmarks": "landmark_id"}
+
+DEFAULT_PATH = Path(__file__).parent / "catalog_snapshot.json"
+
+
+class CatalogFileError(ValueError):
+    pass
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _decode_object(obj: dict):
+    if len(obj) == 1 and "$date" in obj:
+        return datetime.fromisoformat(obj["$date"])
+    return obj
+
+
+def _record_id(section: str, record: dict) -> str:
+    if section == "tombstones":
+        return f"{record['kind']}:{record['id']}"
+    return record[SECTION_KEYS[section]]
+
+
+def write_catalog_file(path, version: int, countries: List[dict], landmarks: List[dict], tombstones: List[dict] = ()):
+    """Compile a catalog version into `path` (atomically replaced)"""
+    contents = {"format": FORMAT, "version": version}
+    sections = {"countries": countries, "landmarks": landmarks, "tombstones": tombstones}
+    for section in SECTIONS:
+        contents[section] = sorted(
+            ({k: v for k, v in record.items() if k != "_id"} for record in sections[section]),
+            key=lambda r: _record_id(section, r),
+        )
+
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(contents, f, ensure_ascii=False, separators=(",", ":"), default=_encode_value)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _load(path) -> Dict[str, object]:
+    try:
+        contents = json.loads(Path(path).read_bytes(), object_hook=_decode_object)
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise CatalogFileError(f"{path} is not a catalog snapshot file: {e}") from None
+    if not isinstance(contents, dict) or contents.get("format") != FORMAT:
+        raise CatalogFileError(f"{path} is not a catalog snapshot file")
+    return contents
+
+
+def read_catalog_file(path, expected_version: Optional[int] = None) -> Optional[Dict[str, object]]:
+    """{version, countries, landmarks, tombstones} from a compiled file.
+
+    None when the file does not exist or holds a different version.
+    """
+    if not Path(path).exists():
+        return None
+    contents = _load(path)
+    if expected_version is not None and contents["version"] != expected_version:
+        return None
+    return {section: contents[section] for section in ("version", *SECTIONS)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile or inspect the catalog snapshot file")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="compile the current catalog from MongoDB")
+    build.add_argument("--output", default=os.environ.get("CATALOG_SNAPSHOT_FILE", DEFAULT_PATH))
+    info = commands.add_parser("info", help="show what a compiled file holds")
+    info.add_argument("path", nargs="?", default=os.environ.get("CATALOG_SNAPSHOT_FILE", DEFAULT_PATH))
+    args = parser.parse_args()
+
+    if args.command == "info":
+        contents = _load(args.path)
+        counts = ", ".join(f"{len(contents[s])} {s}" for s in SECTIONS)
+        print(f"{args.path}: catalog v{contents['version']}, {counts}, {os.path.getsize(args.path):,} bytes")
+        return
+
+    from catalog import CATALOG_META_ID  # catalog imports this module
+
+    load_dotenv(Path(__file__).parent / ".env")
+    client = MongoClient(os.environ["MONGO_URL"])
+    db = client[os.environ["DB_NAME"]]
+    meta = db.catalog_meta.find_one({"_id": CATALOG_META_ID}) or {}
+    write_catalog_file(
+        args.output,
+        meta.get("version", 0),
+        list(db.countries.find({}, {"_id": 0})),
+        list(db.landmarks.find({}, {"_id": 0})),
+        list(db.catalog_changes.find({"deleted": True}, {"_id": 0})),
+    )
+    client.close()
+    print(f"✅ Compiled catalog v{meta.get('version', 0)} to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+Full-text search over the landmark catalog.
+
+An in-process inverted index built from a catalog snapshot (see
+`CatalogSnapshot.search_index`). User input is tokenized as plain text, never
+interpreted as a pattern. Matching is accent- and case-insensitive
+("sacre coeur" finds "Sacré-Cœur"), every query term must match, and the last
+term also matches as a prefix so results show up while the user is typing.
+
+Ranking is BM25-style with per-field weights: a hit in the landmark name counts
+more than a hit in the country name, which counts more than the description.
+
+`PrefixIndex` backs the typeahead endpoint: a sorted prefix array over landmark
+names, alternate names and country names.
+"""
+
+import heapq
+import math
+import re
+import unicodedata
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+# Field weights: name > country > description
+FIELD_WEIGHTS = {
+    "name": 5.0,
+    "country_name": 2.5,
+    "description": 1.0,
+}
+
+# Score multiplier for a prefix match on the last query term
+PREFIX_MATCH_WEIGHT = 0.6
+
+# BM25 saturation constant
+K1 = 1.2
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Letters NFKD does not decompose into base letter + combining mark
+_FOLD_MAP = str.maketrans({"œ": "oe", "æ": "ae", "ø": "o", "ß": "ss", "đ": "d", "ł": "l", "ı": "i"})
+
+
+def fold(text: str) -> str:
+    """Lowercase and strip accents: 'Sacré-Cœur' -> 'sacre-coeur'"""
+    if text.isascii():
+        return text.casefold()
+    text = unicodedata.normalize("NFKD", text.casefold().translate(_FOLD_MAP))
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(fold(text or ""))
+
+
+class SearchIndex:
+    """Inverted index: token -> [(document position, weighted term frequency)]"""
+
+    def __init__(self, landmarks: Sequence[dict]):
+        self.landmarks = tuple(landmarks)
+
+        postings: Dict[str, Dict[int, float]] = {}
+        for position, landmark in enumerate(self.landmarks):
+            for field, weight in FIELD_WEIGHTS.items():
+                for token in tokenize(landmark.get(field)):
+                    doc_weights = postings.setdefault(token, {})
+                    doc_weights[position] = doc_weights.get(position, 0.0) + weight
+
+        self._postings = {token: tuple(docs.items()) for token, docs in postings.items()}
+        self._vocabulary = sorted(self._postings)
+
+        total = len(self.landmarks)
+        self._idf = {
+            token: math.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5))
+            for token, docs in self._postings.items()
+        }
+
+    def _prefix_terms(self, prefix: str) -> Iterable[str]:
+        start = bisect_left(self._vocabulary, prefix)
+        for token in self._vocabulary[start:]:
+            if not token.startswith(prefix):
+                break
+            yield token
+
+    def _term_scores(self, term: str, allow_prefix: bool) -> Dict[int, float]:
+        scores: Dict[int, float] = {}
+        candidates = self._prefix_terms(term) if allow_prefix else (term,)
+        for token in candidates:
+            docs = self._postings.get(token)
+            if not docs:
+                continue
+            factor = 1.0 if token == term else PREFIX_MATCH_WEIGHT
+            idf = self._idf[token]
+            for position, tf in docs:
+                score = factor * idf * tf * (K1 + 1) / (tf + K1)
+                if score > scores.get(position, 0.0):
+                    scores[position] = score
+        return scores
+
+    def search(self, query: str, limit: int = None) -> List[Tuple[dict, float]]:
+        """Landmarks matching every term of `query`, best first"""
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        totals: Dict[int, float] = None
+        for i, term in enumerate(terms):
+            scores = self._term_scores(term, allow_prefix=(i == len(terms) - 1))
+            if totals is None:
+                totals = scores
+            else:
+                totals = {pos: total + scores[pos] for pos, total in totals.items() if pos in scores}
+            if not totals:
+                return []
+
+        ranked = sorted(totals.items(), key=lambda item: (-item[1], item[0]))
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [(self.landmarks[position], score) for position, score in ranked]
+
+    def matching_ids(self, query: str) -> set:
+        return {landmark["landmark_id"] for landmark, _ in self.search(query)}
+
+
+def _suggestion_rank(suggestion: dict):
+    return (-suggestion["upvotes"], -suggestion["points"], suggestion["label"])
+
+
+class PrefixIndex:
+    """Sorted prefix array for typeahead over landmark and country names.
+
+    Each landmark is reachable from its full name, from every word inside it
+    ("tower" -> "Eiffel Tower") and from any `alternate_names`. Suggestions for
+    a prefix are the top-k entries under it, ranked by upvotes, then points.
+
+    `updated()` derives the index for a new catalog version from this one,
+    re-keying only the landmarks that were added, changed or removed.
+    """
+
+    def __init__(self, landmarks: Sequence[dict], countries: Sequence[dict], _base: "PrefixIndex" = None):
+        self._landmarks = {l["landmark_id"]: l for l in landmarks}
+
+        if _base is None:
+            landmark_keys = sorted(
+                (key, landmark_id)
+                for landmark_id, landmark in self._landmarks.items()
+                for key in self._keys_for(landmark)
+            )
+        else:
+            # Only landmarks whose searchable names changed need new keys;
+            # rank (upvotes/points) is read from the current document anyway.
+            stale = {
+                landmark_id for landmark_id, landmark in _base._landmarks.items()
+                if landmark_id not in self._landmarks
+                or self._key_source(self._landmarks[landmark_id]) != self._key_source(landmark)
+            }
+            landmark_keys = [entry for entry in _base._landmark_keys if entry[1] not in stale]
+            for landmark_id, landmark in self._landmarks.items():
+                if landmark_id in stale or landmark_id not in _base._landmarks:
+                    for key in self._keys_for(landmark):
+                        insort(landmark_keys, (key, landmark_id))
+        self._landmark_keys = landmark_keys
+
+        # Country entries are few and their rank depends on every landmark in
+        # the country, so they are always rebuilt.
+        country_totals: Dict[str, List[int]] = {}
+        for landmark in self._landmarks.values():
+            totals = country_totals.setdefault(landmark.get("country_id"), [0, 0])
+            totals[0] += landmark.get("upvotes", 0) or 0
+            totals[1] += landmark.get("points", 0) or 0
+        self._countries = {}
+        country_keys = []
+        for country in countries:
+            upvotes, points = country_totals.get(country["country_id"], (0, 0))
+            self._countries[country["country_id"]] = {
+                "type": "country",
+                "id": country["country_id"],
+                "label": country["name"],
+                "country_id": country["country_id"],
+                "country_name": country["name"],
+                "upvotes": upvotes,
+                "points": points,
+            }
+            for key in self._word_suffixes(country["name"]):
+                country_keys.append((key, country["country_id"]))
+        self._country_keys = sorted(country_keys)
+
+    @staticmethod
+    def _word_suffixes(text: str) -> Iterable[str]:
+        tokens = tokenize(text)
+        return (" ".join(tokens[i:]) for i in range(len(tokens)))
+
+    @staticmethod
+    def _key_source(landmark: dict) -> tuple:
+        return landmark.get("name"), tuple(landmark.get("alternate_names") or ())
+
+    @classmethod
+    def _keys_for(cls, landmark: dict) -> set:
+        keys = set(cls._word_suffixes(landmark.get("name", "")))
+        for alternate in landmark.get("alternate_names") or []:
+            keys.update(cls._word_suffixes(alternate))
+        return keys
+
+    def updated(self, landmarks: Sequence[dict], countries: Sequence[dict]) -> "PrefixIndex":
+        return PrefixIndex(landmarks, countries, _base=self)
+
+    @staticmethod
+    def _ids_with_prefix(keys: List[Tuple[str, str]], prefix: str) -> set:
+        ids = set()
+        for key, entry_id in keys[bisect_left(keys, (prefix,)):]:
+            if not key.startswith(prefix):
+                break
+            ids.add(entry_id)
+        return ids
+
+    def _landmark_suggestion(self, landmark: dict) -> dict:
+        return {
+            "type": "landmark",
+            "id": landmark["landmark_id"],
+            "label": landmark.get("name", ""),
+            "country_id": landmark.get("country_id"),
+            "country_name": landmark.get("country_name"),
+            "category": landmark.get("category"),
+            "image_url": landmark.get("image_url"),
+            "upvotes": landmark.get("upvotes", 0) or 0,
+            "points": landmark.get("points", 0) or 0,
+        }
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[dict]:
+        prefix = " ".join(tokenize(prefix))
+        if not prefix or limit <= 0:
+            return []
+
+        suggestions = [self._countries[i] for i in self._ids_with_prefix(self._country_keys, prefix)]
+        suggestions.extend(
+            self._landmark_suggestion(self._landmarks[i])
+            for i in self._ids_with_prefix(self._landmark_keys, prefix)
+        )
+        return heapq.nsmallest(limit, suggestions, key=_suggestion_rank)
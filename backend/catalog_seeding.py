@@ -0,0 +1,91 @@
+"""
+Diff-based catalog seeding.
+
+`sync_catalog` makes the stored catalog match a seed's countries and
+landmarks without clearing anything. It hashes each seed document's fields,
+compares the hash with the same fields of the stored document, and writes only
+the documents that are new or changed, as one `bulk_write` of upserts per
+collection. Unchanged documents are not touched, and the catalog is published
+only when something changed. That makes reseeding idempotent and safe on a
+live database: the catalog never goes empty and clients keep their caches.
+
+Runtime state is never overwritten by a seed: `upvotes` and `created_at`
+are only set when a document is first inserted, and fields that the seed does
+not set (e.g. `image_placeholders`) are left alone.
+
+Documents that are stored but not in the seed are kept, unless
+`prune=True`. Pruning only ever deletes seeded landmarks (`created_by` None),
+never ones users created.
+"""
+
+import hashlib
+import json
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from pymongo import DeleteOne, UpdateOne
+
+from catalog import CATALOG_COLLECTIONS, publish_catalog_changes
+
+# Set on insert only, never updated by a reseed
+INSERT_ONLY_FIELDS = ("created_at", "upvotes")
+
+
+def seed_hash(doc: dict, fields) -> str:
+    content = {field: doc.get(field) for field in sorted(fields)}
+    return hashlib.sha1(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def plan_sync(kind: str, desired: List[dict], stored: List[dict], prune: bool = False) -> Dict[str, object]:
+    """Operations that turn `stored` into `desired`, and how many of each kind"""
+    _, id_field = CATALOG_COLLECTIONS[kind]
+    stored_by_id = {doc[id_field]: doc for doc in stored}
+    now = datetime.now(timezone.utc)
+
+    operations = []
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0, "deleted": 0}
+    seeded_ids = set()
+    for doc in desired:
+        doc_id = doc[id_field]
+        if doc_id in seeded_ids:
+            raise ValueError(f"{kind} {doc_id} appears more than once in the seed")
+        seeded_ids.add(doc_id)
+        owned = {k: v for k, v in doc.items() if k not in INSERT_ONLY_FIELDS and k != "_id"}
+        existing = stored_by_id.get(doc_id)
+        if existing is not None and seed_hash(existing, owned) == seed_hash(owned, owned):
+            counts["unchanged"] += 1
+            continue
+
+        on_insert = {"created_at": doc.get("created_at", now)}
+        if kind == "landmark":
+            on_insert["upvotes"] = doc.get("upvotes", 0)
+        operations.append(UpdateOne({id_field: doc_id}, {"$set": owned, "$setOnInsert": on_insert}, upsert=True))
+        counts["inserted" if existing is None else "updated"] += 1
+
+    if prune:
+        for doc_id, doc in stored_by_id.items():
+            if doc_id in seeded_ids or (kind == "landmark" and doc.get("created_by")):
+                continue
+            operations.append(DeleteOne({id_field: doc_id}))
+            counts["deleted"] += 1
+    return {"operations": operations, "counts": counts}
+
+
+async def sync_catalog(db, countries: List[dict], landmarks: List[dict], prune: bool = False) -> Dict[str, dict]:
+    """Apply only the differences between the seed and the stored catalog.
+
+    Returns per-kind counts; publishes one catalog version if anything changed.
+    """
+    results = {}
+    changed = False
+    for kind, desired in (("country", countries), ("landmark", landmarks)):
+        collection, _ = CATALOG_COLLECTIONS[kind]
+        stored = await db[collection].find({}, {"_id": 0}).to_list(None)
+        plan = plan_sync(kind, desired, stored, prune=prune)
+        if plan["operations"]:
+            await db[collection].bulk_write(plan["operations"], ordered=False)
+            changed = True
+        results[kind] = plan["counts"]
+
+    results["version"] = await publish_catalog_changes(db) if changed else None
+    return results
@@ -0,0 +1,333 @@
+"""
+Catalog validation.
+
+One pass over the countries and landmarks that reports every consistency
+problem as an issue:
+
+    {"check": "orphan_country", "severity": "error", "ids": ["peru_nazca"], "message": "..."}
+
+Checks:
+
+    duplicate_name      same name twice in one country (error), near-identical
+                        names in one country or the same name in several
+                        countries (warning). Names are compared by character
+                        trigram Jaccard similarity, blocked by country; candidate
+                        pairs come from a trigram index with prefix filtering, so
+                        only pairs that can reach NAME_SIMILARITY are scored.
+    invalid_coordinates latitude/longitude out of range or only one of them set
+    swapped_coordinates latitude and longitude the wrong way round
+    out_of_country      far from the rest of its country's landmarks
+    too_close           another landmark within TOO_CLOSE_KM (fine lat/lng grid)
+    orphan_country      country_id that is not in the catalog
+    points              points that break the category's rule
+    reused_image        the same image used by more than one landmark
+
+Everything runs in memory in well under a second for 10k landmarks, which is
+what lets `catalog_bulk.apply_patches` run it on every batch: a batch is
+rejected when it adds an error-level issue the catalog did not already have.
+
+    python catalog_validation.py [--warnings]
+"""
+
+import argparse
+import math
+import os
+import statistics
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+from catalog_search import tokenize
+from geo_index import KM_PER_DEGREE_LAT, haversine_km, valid_coordinates
+
+ERROR = "error"
+WARNING = "warning"
+
+# Trigram Jaccard similarity from which two names count as near-duplicates
+NAME_SIMILARITY = 0.75
+# Words that do not tell two landmark names apart
+NAME_STOPWORDS = {"the", "of", "and"}
+
+# Landmarks closer than this are probably the same place entered twice
+TOO_CLOSE_KM = 0.1
+
+# A landmark is out of its country when it is further than both of these from
+# the median position of the country's landmarks
+OUT_OF_COUNTRY_MIN_KM = 2000
+OUT_OF_COUNTRY_SPREAD = 5  # times the country's median distance to that position
+MIN_COUNTRY_POINTS = 3
+
+# Points per category; None means any value in POINTS_RANGE
+CATEGORY_POINTS = {"official": 10, "premium": 25, "user_suggested": None}
+POINTS_RANGE = (0, 1000)
+
+
+def _issue(check: str, severity: str, ids: Iterable[str], message: str) -> dict:
+    return {"check": check, "severity": severity, "ids": sorted(ids), "message": message}
+
+
+def issue_key(issue: dict) -> Tuple[str, Tuple[str, ...]]:
+    return issue["check"], tuple(issue["ids"])
+
+
+def new_issues(before: Sequence[dict], after: Sequence[dict]) -> List[dict]:
+    """Issues in `after` that were not already in `before`"""
+    known = {issue_key(issue) for issue in before}
+    return [issue for issue in after if issue_key(issue) not in known]
+
+
+# ----- Names -----
+
+def name_key(name: str) -> str:
+    """'The Eiffel Tower' -> 'eiffel tower'"""
+    return " ".join(token for token in tokenize(name) if token not in NAME_STOPWORDS)
+
+
+def _trigrams(key: str) -> frozenset:
+    padded = f" {key} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def similar_name_pairs(keys: Sequence[str], threshold: float = NAME_SIMILARITY) -> List[Tuple[int, int, float]]:
+    """(i, j, similarity) for every pair of name keys with trigram Jaccard >= threshold.
+
+    Prefix filtering: with each name's trigrams ordered rarest first, two sets
+    can only reach the threshold if they share a trigram within the first
+    `len - ceil(threshold * len) + 1` of either, so only those are indexed.
+    """
+    grams = [_trigrams(key) for key in keys]
+    frequency = Counter(gram for name_grams in grams for gram in name_grams)
+    ordered = [sorted(name_grams, key=lambda g: (frequency[g], g)) for name_grams in grams]
+
+    index: Dict[str, List[int]] = defaultdict(list)
+    pairs = []
+    for i, name_grams in enumerate(ordered):
+        size = len(name_grams)
+        prefix = name_grams[:size - math.ceil(threshold * size) + 1]
+        candidates = set()
+        for gram in prefix:
+            candidates.update(index[gram])
+        for j in candidates:
+            # Sizes alone rule out most candidates before intersecting
+            other = len(ordered[j])
+            if min(size, other) < threshold * max(size, other):
+                continue
+            shared = len(grams[i] & grams[j])
+            similarity = shared / (size + other - shared)
+            if similarity >= threshold:
+                pairs.append((j, i, similarity))
+        for gram in prefix:
+            index[gram].append(i)
+    return pairs
+
+
+def check_names(landmarks: Sequence[dict]) -> List[dict]:
+    """Near-duplicates within a country; the same name in different countries"""
+    issues = []
+    by_country = defaultdict(list)
+    by_name = defaultdict(dict)  # name key -> {country_id: landmark}
+    for landmark in landmarks:
+        key = name_key(landmark.get("name") or "")
+        by_country[landmark.get("country_id")].append((key, landmark))
+        by_name[key].setdefault(landmark.get("country_id"), landmark)
+
+    for country_id, group in by_country.items():
+        keys = [key for key, _ in group]
+        for i, j, similarity in similar_name_pairs(keys):
+            (key_a, a), (key_b, b) = group[i], group[j]
+            ids = (a["landmark_id"], b["landmark_id"])
+            if key_a == key_b:
+                issues.append(_issue("duplicate_name", ERROR, ids, f"'{a.get('name')}' is in {country_id} twice"))
+            else:
+                issues.append(_issue(
+                    "duplicate_name", WARNING, ids,
+                    f"'{a.get('name')}' and '{b.get('name')}' in {country_id} look like the same landmark ({similarity:.0%} similar)",
+                ))
+
+    for key, in_countries in by_name.items():
+        if key and len(in_countries) > 1:
+            first = next(iter(in_countries.values()))
+            issues.append(_issue(
+                "duplicate_name", WARNING, (l["landmark_id"] for l in in_countries.values()),
+                f"'{first.get('name')}' is in {', '.join(sorted(in_countries))}",
+            ))
+    return issues
+
+
+# ----- Coordinates -----
+
+def _country_centers(landmarks: Sequence[dict]) -> Dict[str, Tuple[float, float, float]]:
+    """{country_id: (median lat, median lng, median distance to it in km)}"""
+    points = defaultdict(list)
+    for landmark in landmarks:
+        lat, lng = landmark.get("latitude"), landmark.get("longitude")
+        if valid_coordinates(lat, lng):
+            points[landmark.get("country_id")].append((lat, lng))
+
+    centers = {}
+    for country_id, coordinates in points.items():
+        if len(coordinates) < MIN_COUNTRY_POINTS:
+            continue
+        lat = statistics.median(c[0] for c in coordinates)
+        lng = statistics.median(c[1] for c in coordinates)
+        spread = statistics.median(haversine_km(lat, lng, *c) for c in coordinates)
+        centers[country_id] = (lat, lng, spread)
+    return centers
+
+
+def _too_close_pairs(points: Sequence[Tuple[float, float, dict]], radius_km: float) -> List[Tuple[dict, dict, float]]:
+    """Pairs of points within radius_km, from a grid of radius-sized cells"""
+    cell_degrees = radius_km / KM_PER_DEGREE_LAT
+    cells: Dict[Tuple[int, int], List[Tuple[float, float, dict]]] = defaultdict(list)
+    for point in points:
+        cells[(math.floor(point[0] / cell_degrees), math.floor(point[1] / cell_degrees))].append(point)
+
+    pairs = []
+    for (row, col), cell in cells.items():
+        # A degree of longitude is shorter than one of latitude away from the equator
+        max_abs_lat = min(89.9, (abs(row) + 2) * cell_degrees)
+        span = math.ceil(1 / math.cos(math.radians(max_abs_lat)))
+        for d_row in (-1, 0, 1):
+            for d_col in range(-span, span + 1):
+                other = cells.get((row + d_row, col + d_col))
+                if not other or (d_row, d_col) < (0, 0):
+                    continue
+                for a_index, (lat_a, lng_a, a) in enumerate(cell):
+                    for lat_b, lng_b, b in (other[a_index + 1:] if (d_row, d_col) == (0, 0) else other):
+                        distance = haversine_km(lat_a, lng_a, lat_b, lng_b)
+                        if distance <= radius_km:
+                            pairs.append((a, b, distance))
+    return pairs
+
+
+def check_coordinates(landmarks: Sequence[dict]) -> List[dict]:
+    issues = []
+    centers = _country_centers(landmarks)
+    points = []
+    for landmark in landmarks:
+        landmark_id, name = landmark["landmark_id"], landmark.get("name")
+        lat, lng = landmark.get("latitude"), landmark.get("longitude")
+        if lat is None and lng is None:
+            continue
+        if not valid_coordinates(lat, lng):
+            if valid_coordinates(lng, lat):
+                issues.append(_issue("swapped_coordinates", ERROR, [landmark_id],
+                                     f"{name}: latitude {lat} is out of range, latitude and longitude look swapped"))
+            else:
+                issues.append(_issue("invalid_coordinates", ERROR, [landmark_id],
+                                     f"{name}: invalid coordinates ({lat}, {lng})"))
+            continue
+        points.append((lat, lng, landmark))
+
+        center = centers.get(landmark.get("country_id"))
+        if not center:
+            continue
+        center_lat, center_lng, spread = center
+        limit = max(OUT_OF_COUNTRY_MIN_KM, OUT_OF_COUNTRY_SPREAD * spread)
+        distance = haversine_km(center_lat, center_lng, lat, lng)
+        if distance <= limit:
+            continue
+        if valid_coordinates(lng, lat) and haversine_km(center_lat, center_lng, lng, lat) <= limit:
+            issues.append(_issue("swapped_coordinates", ERROR, [landmark_id],
+                                 f"{name}: ({lat}, {lng}) is outside {landmark.get('country_id')}, ({lng}, {lat}) is not"))
+        else:
+            issues.append(_issue("out_of_country", WARNING, [landmark_id],
+                                 f"{name}: {distance:,.0f} km from the other landmarks of {landmark.get('country_id')}"))
+
+    for a, b, distance in _too_close_pairs(points, TOO_CLOSE_KM):
+        issues.append(_issue("too_close", WARNING, (a["landmark_id"], b["landmark_id"]),
+                             f"{a.get('name')} and {b.get('name')} are {distance * 1000:.0f} m apart"))
+    return issues
+
+
+# ----- Catalog references and rules -----
+
+def check_countries(countries: Sequence[dict], landmarks: Sequence[dict]) -> List[dict]:
+    country_ids = {country["country_id"] for country in countries}
+    return [
+        _issue("orphan_country", ERROR, [landmark["landmark_id"]],
+               f"{landmark.get('name')}: unknown country '{landmark.get('country_id')}'")
+        for landmark in landmarks
+        if landmark.get("country_id") not in country_ids
+    ]
+
+
+def check_points(landmarks: Sequence[dict]) -> List[dict]:
+    issues = []
+    low, high = POINTS_RANGE
+    for landmark in landmarks:
+        if "points" not in landmark:
+            continue  # the API falls back to the category default
+        points, category = landmark["points"], landmark.get("category")
+        expected = CATEGORY_POINTS.get(category)
+        if not isinstance(points, int) or isinstance(points, bool) or not low <= points <= high:
+            message = f"points must be a whole number from {low} to {high}, not {points!r}"
+        elif expected is not None and points != expected:
+            message = f"{category} landmarks are worth {expected} points, not {points}"
+        else:
+            continue
+        issues.append(_issue("points", ERROR, [landmark["landmark_id"]], f"{landmark.get('name')}: {message}"))
+    return issues
+
+
+def image_key(url: str) -> str:
+    """The image a URL points to, ignoring size/format query parameters"""
+    address = url.strip().split("#", 1)[0].split("?", 1)[0]
+    _, _, address = address.partition("://")
+    host, _, path = address.partition("/")
+    return f"{host.lower()}/{path}"
+
+
+def check_images(landmarks: Sequence[dict]) -> List[dict]:
+    users = defaultdict(dict)  # image -> {landmark_id: name}
+    for landmark in landmarks:
+        for url in [landmark.get("image_url")] + list(landmark.get("images") or []):
+            if url:
+                users[image_key(url)][landmark["landmark_id"]] = landmark.get("name")
+    return [
+        _issue("reused_image", WARNING, landmark_names,
+               f"{image} is used by {len(landmark_names)} landmarks: {', '.join(sorted(landmark_names.values()))}")
+        for image, landmark_names in users.items()
+        if len(landmark_names) > 1
+    ]
+
+
+def validate_catalog(countries: Sequence[dict], landmarks: Sequence[dict]) -> List[dict]:
+    """Every issue in the catalog, errors first"""
+    issues = (
+        check_countries(countries, landmarks)
+        + check_points(landmarks)
+        + check_names(landmarks)
+        + check_coordinates(landmarks)
+        + check_images(landmarks)
+    )
+    return sorted(issues, key=lambda issue: issue["severity"] != ERROR)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate the landmark catalog")
+    parser.add_argument("--warnings", action="store_true", help="list warnings too, not just their count")
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).parent / ".env")
+    client = MongoClient(os.environ["MONGO_URL"])
+    db = client[os.environ["DB_NAME"]]
+    countries = list(db.countries.find({}, {"_id": 0}))
+    landmarks = list(db.landmarks.find({}, {"_id": 0}))
+    client.close()
+
+    issues = validate_catalog(countries, landmarks)
+    errors = [issue for issue in issues if issue["severity"] == ERROR]
+    warnings = [issue for issue in issues if issue["severity"] == WARNING]
+    for issue in errors + (warnings if args.warnings else []):
+        print(f"  {'❌' if issue['severity'] == ERROR else '⚠️ '} [{issue['check']}] {issue['message']}")
+    print(f"{len(landmarks)} landmarks, {len(countries)} countries: {len(errors)} errors, {len(warnings)} warnings")
+    if errors:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
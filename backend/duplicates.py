@@ -0,0 +1,110 @@
+"""
+Duplicates that block a unique index.
+
+Before the unique indexes in `server.ensure_indexes`, writes checked for a
+document and then inserted one, so two concurrent requests could both insert:
+a badge awarded twice (`achievements`), a country visit created twice
+(`country_visits`), an upvote recorded twice (`landmark_upvotes`). MongoDB
+refuses to build a unique index over such duplicates.
+
+`ensure_indexes` runs the matching function below when building one of these
+indexes fails, then tries again. Each keeps the earliest document of every
+duplicate group and is idempotent: once the groups are gone it only reads.
+Run them all by hand with:
+
+    python duplicates.py
+"""
+
+import asyncio
+import os
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+
+async def _duplicate_groups(collection, keys, time_field: str) -> List[List[dict]]:
+    """Documents sharing the unique key, earliest first, one list per key"""
+    groups = await collection.aggregate([
+        {"$group": {"_id": {key: f"${key}" for key in keys}, "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ], allowDiskUse=True).to_list(None)
+    duplicates = []
+    for group in groups:
+        docs = await collection.find({"_id": {"$in": group["ids"]}}).to_list(None)
+        docs.sort(key=lambda d: (d.get(time_field) is None, d.get(time_field) or 0))
+        duplicates.append(docs)
+    return duplicates
+
+
+async def _keep_earliest(collection, keys, time_field: str) -> int:
+    removed = 0
+    for docs in await _duplicate_groups(collection, keys, time_field):
+        extra = [d["_id"] for d in docs[1:]]
+        await collection.delete_many({"_id": {"$in": extra}})
+        removed += len(extra)
+    return removed
+
+
+async def remove_duplicate_achievements(db) -> int:
+    """Keep each user's first award of a badge. Returns how many were removed."""
+    return await _keep_earliest(db.achievements, ("user_id", "badge_type"), "earned_at")
+
+
+async def remove_duplicate_upvotes(db) -> int:
+    """Keep one upvote per user and landmark (counts: upvotes.reconcile_upvote_counts)"""
+    return await _keep_earliest(db.landmark_upvotes, ("landmark_id", "user_id"), "created_at")
+
+
+async def merge_duplicate_country_visits(db) -> int:
+    """Fold each user's duplicate visits of a country into the earliest one.
+
+    The kept visit gets every photo and diary of the group, and feed
+    activities of the removed ones point to it. Returns how many were removed.
+    """
+    removed = 0
+    for docs in await _duplicate_groups(db.country_visits, ("user_id", "country_id"), "created_at"):
+        kept, extra = docs[0], docs[1:]
+        photos = []
+        for doc in docs:
+            photos += [photo for photo in doc.get("photos") or [] if photo not in photos]
+        diaries = []
+        for doc in docs:
+            if doc.get("diary") and doc["diary"] not in diaries:
+                diaries.append(doc["diary"])
+        await db.country_visits.update_one({"_id": kept["_id"]}, {"$set": {
+            "photos": photos,
+            "diary": "\n\n".join(diaries) or kept.get("diary"),
+            "has_photos": bool(photos),
+            "leaderboard_points_earned": kept.get("points_earned", 50) if photos else 0,
+        }})
+        extra_ids = [d["country_visit_id"] for d in extra if d.get("country_visit_id")]
+        if extra_ids and kept.get("country_visit_id"):
+            await db.activities.update_many(
+                {"country_visit_id": {"$in": extra_ids}}, {"$set": {"country_visit_id": kept["country_visit_id"]}}
+            )
+        await db.country_visits.delete_many({"_id": {"$in": [d["_id"] for d in extra]}})
+        removed += len(extra)
+    return removed
+
+
+# By collection: run when its unique index cannot be built
+DEDUPLICATORS: Dict[str, Callable[..., Awaitable[int]]] = {
+    "achievements": remove_duplicate_achievements,
+    "country_visits": merge_duplicate_country_visits,
+    "landmark_upvotes": remove_duplicate_upvotes,
+}
+
+
+async def main():
+    load_dotenv(Path(__file__).parent / ".env")
+    client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+    db = client[os.environ["DB_NAME"]]
+    for name, deduplicate in DEDUPLICATORS.items():
+        print(f"{name}: removed {await deduplicate(db)} duplicates")
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -8,6 +8,8 @@ Script to:
 
 from pymongo import MongoClient
 from datetime import datetime, timezone
+from catalog import publish_catalog_changes_sync
+from catalog_validation import validate_catalog
 
 client = MongoClient("mongodb://localhost:27017")
 db = client["test_database"]
@@ -214,19 +216,14 @@ def add_premium_to_missing_countries():
     print(f"  Total premium landmarks added: {added}")
 
 def verify_no_duplicates():
-    """Check for any duplicate landmarks"""
-    pipeline = [
-        {"$group": {"_id": {"$toLower": "$name"}, "count": {"$sum": 1}, "countries": {"$addToSet": "$country_name"}, "ids": {"$addToSet": "$landmark_id"}}},
-        {"$match": {"count": {"$gt": 1}}},
-        {"$sort": {"count": -1}}
-    ]
-    dupes = list(db.landmarks.aggregate(pipeline))
-    if dupes:
-        print(f"\n  WARNING: Found {len(dupes)} duplicate landmark names:")
-        for d in dupes:
-            print(f"    '{d['_id']}' in {d['countries']} (IDs: {d['ids']})")
+    """Check for duplicate landmarks (and every other catalog issue)"""
+    issues = validate_catalog(list(db.countries.find({}, {"_id": 0})), list(db.landmarks.find({}, {"_id": 0})))
+    if issues:
+        print(f"\n  WARNING: Found {len(issues)} catalog issues:")
+        for issue in issues:
+            print(f"    [{issue['severity']}] {issue['message']}")
     else:
-        print("\n  No duplicate landmarks found!")
+        print("\n  No catalog issues found!")
 
 def print_final_stats():
     """Print final counts"""
@@ -274,8 +271,11 @@ if __name__ == "__main__":
     print("\n4. Adding premium landmarks to countries missing them...")
     add_premium_to_missing_countries()
     
-    print("\n5. Verifying no duplicates...")
+    print("\n5. Publishing catalog changes...")
+    print(f"  Catalog published at version {publish_catalog_changes_sync(db)}")
+    
+    print("\n6. Verifying no duplicates...")
     verify_no_duplicates()
     
-    print("\n6. Final statistics...")
+    print("\n7. Final statistics...")
     print_final_stats()
@@ -0,0 +1,96 @@
+"""
+Spatial index over landmark coordinates.
+
+A fixed lat/lng grid (CELL_DEGREES per cell) built from a catalog snapshot
+(see `CatalogSnapshot.geo_index`). A radius query only visits the cells that
+overlap the query's bounding box, then ranks the candidates by haversine
+distance, so "near me" never scans the whole catalog.
+"""
+
+import heapq
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_KM / 180
+
+CELL_DEGREES = 1.0
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def valid_coordinates(lat, lng) -> bool:
+    return (
+        isinstance(lat, (int, float)) and isinstance(lng, (int, float))
+        and -90 <= lat <= 90 and -180 <= lng <= 180
+    )
+
+
+def _cell(lat: float, lng: float) -> Tuple[int, int]:
+    return math.floor(lat / CELL_DEGREES), math.floor(lng / CELL_DEGREES)
+
+
+class GeoIndex:
+    def __init__(self, landmarks: Sequence[dict]):
+        self._cells: Dict[Tuple[int, int], List[Tuple[float, float, dict]]] = {}
+        self.size = 0
+        for landmark in landmarks:
+            lat, lng = landmark.get("latitude"), landmark.get("longitude")
+            if not valid_coordinates(lat, lng):
+                continue
+            self._cells.setdefault(_cell(lat, lng), []).append((lat, lng, landmark))
+            self.size += 1
+
+    def _candidate_cells(self, lat: float, lng: float, radius_km: float):
+        lat_span = radius_km / KM_PER_DEGREE_LAT
+        row_min = math.floor(max(-90.0, lat - lat_span) / CELL_DEGREES)
+        row_max = math.floor(min(90.0, lat + lat_span) / CELL_DEGREES)
+
+        # Longitude degrees shrink towards the poles; near them (or for huge
+        # radii) every column is a candidate.
+        max_abs_lat = min(90.0, abs(lat) + lat_span)
+        cos_lat = math.cos(math.radians(max_abs_lat))
+        columns_total = math.ceil(360 / CELL_DEGREES)
+        if cos_lat < 1e-6 or radius_km / (KM_PER_DEGREE_LAT * cos_lat) >= 180:
+            columns = range(-columns_total // 2, columns_total // 2)
+        else:
+            lng_span = radius_km / (KM_PER_DEGREE_LAT * cos_lat)
+            col_min = math.floor((lng - lng_span) / CELL_DEGREES)
+            col_max = math.floor((lng + lng_span) / CELL_DEGREES)
+            # Wrap columns across the antimeridian
+            columns = {
+                (col + columns_total // 2) % columns_total - columns_total // 2
+                for col in range(col_min, col_max + 1)
+            }
+
+        for row in range(row_min, row_max + 1):
+            for col in columns:
+                cell = self._cells.get((row, col))
+                if cell:
+                    yield cell
+
+    def nearby(
+        self,
+        lat: float,
+        lng: float,
+        radius_km: float,
+        limit: int = 20,
+        exclude_id: Optional[str] = None,
+    ) -> List[Tuple[dict, float]]:
+        """Landmarks within `radius_km` of (lat, lng), closest first"""
+        matches = []
+        for cell in self._candidate_cells(lat, lng, radius_km):
+            for point_lat, point_lng, landmark in cell:
+                if exclude_id is not None and landmark["landmark_id"] == exclude_id:
+                    continue
+                distance = haversine_km(lat, lng, point_lat, point_lng)
+                if distance <= radius_km:
+                    matches.append((distance, landmark["landmark_id"], landmark))
+        closest = heapq.nsmallest(limit, matches, key=lambda m: (m[0], m[1]))
+        return [(landmark, distance) for distance, _, landmark in closest]
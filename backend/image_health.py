@@ -0,0 +1,173 @@
+"""
+Health check for landmark image URLs.
+
+Probes every `image_url` and `images[]` entry of the catalog and reports the
+ones that are broken (HTTP error, not an image, unreachable), plus the content
+type and size of each image. Probes run concurrently through one pooled
+`httpx.AsyncClient`, at most CONCURRENCY at a time. A HEAD request is tried
+first; servers that refuse HEAD (or answer it without a content type) get a
+GET whose body is never read.
+
+Results are cached by URL in the `image_checks` collection with the time of
+the check. A rerun only probes URLs that are new or whose result is stale:
+working images are rechecked after OK_MAX_AGE, broken ones after
+BROKEN_MAX_AGE (so fixes show up quickly). `--all` probes everything.
+
+    python image_health.py [--all] [--concurrency N]
+"""
+
+import argparse
+import asyncio
+import os
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import httpx
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+CONCURRENCY = 20
+PROBE_TIMEOUT = 15
+OK_MAX_AGE = timedelta(days=7)
+BROKEN_MAX_AGE = timedelta(hours=1)
+USER_AGENT = "WanderlistImageCheck/1.0"
+
+# HEAD answers that mean "try GET instead"
+HEAD_NOT_SUPPORTED = {403, 405, 501}
+
+
+def _size(response: httpx.Response) -> Optional[int]:
+    content_range = response.headers.get("content-range", "")
+    if response.status_code == 206 and "/" in content_range:
+        total = content_range.rsplit("/", 1)[1]
+        return int(total) if total.isdigit() else None
+    length = response.headers.get("content-length", "")
+    return int(length) if length.isdigit() else None
+
+
+def _result(url: str, response: Optional[httpx.Response], error: Optional[str] = None) -> dict:
+    now = datetime.now(timezone.utc)
+    if response is None:
+        return {"url": url, "ok": False, "status": None, "content_type": None, "size": None,
+                "error": error, "checked_at": now}
+    content_type = response.headers.get("content-type", "").split(";")[0].strip().lower() or None
+    ok = response.is_success and bool(content_type and content_type.startswith("image/"))
+    result = {
+        "url": url,
+        "ok": ok,
+        "status": response.status_code,
+        "content_type": content_type,
+        "size": _size(response),
+        "error": None if ok else (f"HTTP {response.status_code}" if not response.is_success else f"not an image ({content_type})"),
+        "checked_at": now,
+    }
+    if str(response.url) != url:
+        result["final_url"] = str(response.url)
+    return result
+
+
+async def probe_image(http: httpx.AsyncClient, url: str) -> dict:
+    """{url, ok, status, content_type, size, error, checked_at} for one URL"""
+    try:
+        response = await http.head(url)
+        if response.status_code in HEAD_NOT_SUPPORTED or not response.headers.get("content-type"):
+            # Only the headers are needed; the stream is closed before the body is read
+            async with http.stream("GET", url, headers={"Range": "bytes=0-0"}) as response:
+                pass
+    except httpx.HTTPError as e:
+        return _result(url, None, f"{type(e).__name__}: {e}" if str(e) else type(e).__name__)
+    return _result(url, response)
+
+
+async def probe_images(urls: Iterable[str], concurrency: int = CONCURRENCY, timeout: float = PROBE_TIMEOUT) -> List[dict]:
+    """Probe every URL, at most `concurrency` at a time, in the order given"""
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits, follow_redirects=True,
+                                 headers={"User-Agent": USER_AGENT}) as http:
+        async def bounded(url):
+            async with semaphore:
+                return await probe_image(http, url)
+
+        return await asyncio.gather(*(bounded(url) for url in dict.fromkeys(urls)))
+
+
+def is_stale(check: dict, now: datetime) -> bool:
+    checked_at = check.get("checked_at")
+    if checked_at is None:
+        return True
+    if checked_at.tzinfo is None:
+        checked_at = checked_at.replace(tzinfo=timezone.utc)
+    return now - checked_at > (OK_MAX_AGE if check.get("ok") else BROKEN_MAX_AGE)
+
+
+def image_users(landmarks: Iterable[dict]) -> Dict[str, List[str]]:
+    """{image url: landmark ids using it}"""
+    users = defaultdict(list)
+    for landmark in landmarks:
+        for url in dict.fromkeys([landmark.get("image_url")] + list(landmark.get("images") or [])):
+            if url:
+                users[url].append(landmark["landmark_id"])
+    return dict(users)
+
+
+async def check_catalog_images(db, refresh: bool = False, concurrency: int = CONCURRENCY) -> dict:
+    """Probe new and stale catalog image URLs and report on all of them"""
+    landmarks = await db.landmarks.find({}, {"_id": 0, "landmark_id": 1, "image_url": 1, "images": 1}).to_list(None)
+    users = image_users(landmarks)
+
+    now = datetime.now(timezone.utc)
+    cached = {} if refresh else {
+        check["url"]: check
+        for check in await db.image_checks.find({"url": {"$in": list(users)}}, {"_id": 0}).to_list(None)
+    }
+    stale = [url for url in users if url not in cached or is_stale(cached[url], now)]
+    probed = await probe_images(stale, concurrency=concurrency)
+    if probed:
+        await db.image_checks.bulk_write(
+            [UpdateOne({"url": check["url"]}, {"$set": check}, upsert=True) for check in probed],
+            ordered=False,
+        )
+
+    checks = {**cached, **{check["url"]: check for check in probed}}
+    results = [checks[url] for url in users]
+    broken = [dict(check, landmark_ids=users[check["url"]]) for check in results if not check["ok"]]
+    return {
+        "urls": len(users),
+        "probed": len(probed),
+        "cached": len(users) - len(probed),
+        "broken": broken,
+        "content_types": dict(Counter(check["content_type"] for check in results if check["ok"])),
+        "total_bytes": sum(check["size"] or 0 for check in results if check["ok"]),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Check that every landmark image URL works")
+    parser.add_argument("--all", action="store_true", help="probe every URL, ignoring cached results")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).parent / ".env")
+    client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+    db = client[os.environ["DB_NAME"]]
+    await db.image_checks.create_index("url", unique=True)
+    try:
+        report = await check_catalog_images(db, refresh=args.all, concurrency=args.concurrency)
+    finally:
+        client.close()
+
+    for check in report["broken"]:
+        print(f"  ✗ {check['url']}: {check['error']} (used by {', '.join(check['landmark_ids'])})")
+    types = ", ".join(f"{count} {content_type}" for content_type, count in sorted(report["content_types"].items()))
+    print(f"{report['urls']} image URLs ({report['probed']} probed, {report['cached']} cached): "
+          f"{len(report['broken'])} broken; {types}; {report['total_bytes'] / 1024 / 1024:.1f} MB")
+    if report["broken"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,228 @@
+"""
+Image placeholders for landmark images.
+
+Batch job that fetches every catalog image once, and stores on each landmark
+an `image_placeholders` list of {url, width, height, blurhash, lqip}. The list
+follows the order of `image_url` and then `images`. `lqip` is a tiny inline
+JPEG data URI and is only kept for the card image (`image_url`), because every
+other image gets a ~30 byte BlurHash. The catalog endpoints return the list
+with the landmark, so the app can lay out and paint a card before the real
+image arrives.
+
+Fetching and decoding run in a process pool. Results are cached by URL in the
+`image_placeholders` collection, so later runs only fetch new images
+(`--refresh` recomputes everything).
+
+    python image_placeholders.py [--refresh] [--workers N]
+"""
+
+import argparse
+import base64
+import io
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import httpx
+from dotenv import load_dotenv
+from PIL import Image
+from pymongo import MongoClient, UpdateOne
+
+from catalog import publish_catalog_changes_sync
+
+BLURHASH_COMPONENTS = (4, 3)
+# Images are downscaled to this size before BlurHash encoding
+BLURHASH_SAMPLE_SIZE = 32
+LQIP_WIDTH = 16
+LQIP_QUALITY = 40
+
+FETCH_TIMEOUT = 20
+MAX_IMAGE_BYTES = 20 * 1024 * 1024
+USER_AGENT = "WanderlistPlaceholderBot/1.0"
+
+_BASE83 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+
+
+# ----- BlurHash (https://blurha.sh) -----
+
+def _encode83(value: int, length: int) -> str:
+    return "".join(_BASE83[(value // 83 ** (length - i - 1)) % 83] for i in range(length))
+
+
+def _srgb_to_linear(value: int) -> float:
+    v = value / 255
+    return v / 12.92 if v <= 0.04045 else ((v + 0.055) / 1.055) ** 2.4
+
+
+def _linear_to_srgb(value: float) -> int:
+    v = max(0.0, min(1.0, value))
+    if v <= 0.0031308:
+        return int(v * 12.92 * 255 + 0.5)
+    return int((1.055 * v ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def _sign_pow(value: float, exp: float) -> float:
+    return math.copysign(abs(value) ** exp, value)
+
+
+def blurhash_encode(image: Image.Image, x_components: int = 4, y_components: int = 3) -> str:
+    image = image.convert("RGB")
+    image.thumbnail((BLURHASH_SAMPLE_SIZE, BLURHASH_SAMPLE_SIZE))
+    width, height = image.size
+    data = image.tobytes()
+    linear = [_srgb_to_linear(v) for v in range(256)]
+    pixels = [(linear[data[k]], linear[data[k + 1]], linear[data[k + 2]]) for k in range(0, len(data), 3)]
+
+    factors = []
+    for j in range(y_components):
+        cos_y = [math.cos(math.pi * j * y / height) for y in range(height)]
+        for i in range(x_components):
+            cos_x = [math.cos(math.pi * i * x / width) for x in range(width)]
+            r = g = b = 0.0
+            for y in range(height):
+                row = y * width
+                for x in range(width):
+                    basis = cos_x[x] * cos_y[y]
+                    pr, pg, pb = pixels[row + x]
+                    r += basis * pr
+                    g += basis * pg
+                    b += basis * pb
+            scale = (1 if i == 0 and j == 0 else 2) / (width * height)
+            factors.append((r * scale, g * scale, b * scale))
+
+    dc, ac = factors[0], factors[1:]
+    result = _encode83((x_components - 1) + (y_components - 1) * 9, 1)
+    if ac:
+        actual_max = max(abs(c) for factor in ac for c in factor)
+        quantised_max = max(0, min(82, int(actual_max * 166 - 0.5)))
+        maximum = (quantised_max + 1) / 166
+        result += _encode83(quantised_max, 1)
+    else:
+        maximum = 1.0
+        result += _encode83(0, 1)
+
+    result += _encode83((_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2]), 4)
+    for factor in ac:
+        r, g, b = (max(0, min(18, int(_sign_pow(c / maximum, 0.5) * 9 + 9.5))) for c in factor)
+        result += _encode83(r * 19 * 19 + g * 19 + b, 2)
+    return result
+
+
+def lqip_data_uri(image: Image.Image) -> str:
+    """Tiny blurred-up-on-display JPEG as a data URI"""
+    image = image.convert("RGB")
+    height = max(1, round(image.height * LQIP_WIDTH / image.width))
+    thumb = image.resize((LQIP_WIDTH, height), Image.BILINEAR)
+    buffer = io.BytesIO()
+    thumb.save(buffer, format="JPEG", quality=LQIP_QUALITY, optimize=True)
+    return "data:image/jpeg;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+# ----- Computing -----
+
+def compute_placeholder(url: str) -> Optional[dict]:
+    """Fetch one image and compute its placeholder (runs in a worker process)"""
+    try:
+        with httpx.Client(timeout=FETCH_TIMEOUT, follow_redirects=True, headers={"User-Agent": USER_AGENT}) as http:
+            response = http.get(url)
+            response.raise_for_status()
+        if len(response.content) > MAX_IMAGE_BYTES:
+            return None
+        with Image.open(io.BytesIO(response.content)) as image:
+            width, height = image.size
+            # Let the JPEG decoder downscale while decoding; we only need a few pixels
+            image.draft("RGB", (BLURHASH_SAMPLE_SIZE * 2, BLURHASH_SAMPLE_SIZE * 2))
+            small = image.convert("RGB")
+        return {
+            "url": url,
+            "width": width,
+            "height": height,
+            "blurhash": blurhash_encode(small.copy(), *BLURHASH_COMPONENTS),
+            "lqip": lqip_data_uri(small),
+        }
+    except Exception as e:
+        print(f"  ✗ {url}: {e}")
+        return None
+
+
+def compute_placeholders(urls: Iterable[str], workers: Optional[int] = None) -> Dict[str, dict]:
+    """{url: placeholder} for every URL that could be fetched and decoded"""
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(compute_placeholder, urls, chunksize=4)
+        return {p["url"]: p for p in results if p}
+
+
+def landmark_image_urls(landmark: dict) -> List[str]:
+    urls = [landmark.get("image_url")] + list(landmark.get("images") or [])
+    return list(dict.fromkeys(url for url in urls if url))
+
+
+def landmark_placeholders(landmark: dict, placeholders: Dict[str, dict]) -> List[dict]:
+    """The landmark's `image_placeholders` list, in image order"""
+    result = []
+    for url in landmark_image_urls(landmark):
+        placeholder = placeholders.get(url)
+        if not placeholder:
+            continue
+        entry = {k: placeholder[k] for k in ("url", "width", "height", "blurhash")}
+        if url == landmark.get("image_url"):
+            entry["lqip"] = placeholder["lqip"]
+        result.append(entry)
+    return result
+
+
+def update_placeholders(db, refresh: bool = False, workers: Optional[int] = None) -> int:
+    """Compute missing placeholders and store them on the landmarks. Returns landmarks updated."""
+    db.image_placeholders.create_index("url", unique=True)
+    landmarks = list(db.landmarks.find({}, {"_id": 0, "landmark_id": 1, "image_url": 1, "images": 1, "image_placeholders": 1}))
+    urls = {url for landmark in landmarks for url in landmark_image_urls(landmark)}
+
+    cached = {} if refresh else {
+        p["url"]: p for p in db.image_placeholders.find({"url": {"$in": list(urls)}}, {"_id": 0})
+    }
+    missing = sorted(urls - set(cached))
+    print(f"{len(urls)} image URLs, {len(cached)} cached, {len(missing)} to fetch")
+
+    computed = compute_placeholders(missing, workers)
+    if computed:
+        now = datetime.now(timezone.utc)
+        db.image_placeholders.bulk_write([
+            UpdateOne({"url": url}, {"$set": dict(placeholder, computed_at=now)}, upsert=True)
+            for url, placeholder in computed.items()
+        ], ordered=False)
+    print(f"Computed {len(computed)} placeholders ({len(missing) - len(computed)} failed)")
+
+    placeholders = {**cached, **computed}
+    updates = []
+    for landmark in landmarks:
+        entries = landmark_placeholders(landmark, placeholders)
+        if entries != (landmark.get("image_placeholders") or []):
+            updates.append(UpdateOne({"landmark_id": landmark["landmark_id"]}, {"$set": {"image_placeholders": entries}}))
+    if updates:
+        db.landmarks.bulk_write(updates, ordered=False)
+        print(f"Catalog published at version {publish_catalog_changes_sync(db)}")
+    return len(updates)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute BlurHash/LQIP placeholders for landmark images")
+    parser.add_argument("--refresh", action="store_true", help="recompute cached placeholders")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).parent / ".env")
+    client = MongoClient(os.environ["MONGO_URL"])
+    db = client[os.environ["DB_NAME"]]
+    updated = update_placeholders(db, refresh=args.refresh, workers=args.workers)
+    print(f"Updated placeholders on {updated} landmarks")
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Durable background jobs, queued in MongoDB.
+
+`jobs` holds one document per job:
+
+    job_id       "job_<hex>"
+    kind         which handler runs it
+    key          unique; enqueueing an existing key is a no-op
+    payload      the handler's input
+    status       queued | running | done | failed
+    attempts     claims so far
+    run_at       when it is next due
+    lease_until  while running: when another worker may take it over
+    result       the handler's return value (done) / error (failed)
+
+Every API process runs a small worker pool (`JobQueue.run`, started with the
+app). A worker claims a due job with a single `find_one_and_update` (queued
+and due, or running with an expired lease), so one job runs on one worker at a
+time. A worker that dies mid-job loses its lease and the job runs again
+elsewhere: delivery is at-least-once and handlers must be idempotent.
+
+A request can queue its job before its own writes, delayed, and `release` it
+once they are done: if the request dies in between, the job still runs when
+the delay is up (with the payload it was queued with). Failures
+are retried with exponential backoff up to MAX_ATTEMPTS and then left as
+`failed` for inspection. That includes a job whose worker keeps dying (its
+lease expires MAX_ATTEMPTS times): it is marked failed rather than taken over
+again. Finished jobs expire after JOB_RETENTION.
+"""
+
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+LEASE = timedelta(seconds=60)
+RETRY_BASE = timedelta(seconds=5)
+JOB_RETENTION = timedelta(days=7)
+
+Handler = Callable[[dict], Awaitable[Optional[dict]]]
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Backoff before the next attempt: 5s, 10s, 20s, ..."""
+    return RETRY_BASE * (2 ** max(attempts - 1, 0))
+
+
+class JobQueue:
+    """Handlers by kind, and the worker loop that runs them"""
+
+    def __init__(self):
+        self.handlers: Dict[str, Handler] = {}
+        self._wake = asyncio.Event()
+
+    def handler(self, kind: str):
+        """Register the coroutine running jobs of `kind`. It gets the job document."""
+        def register(fn: Handler) -> Handler:
+            self.handlers[kind] = fn
+            return fn
+        return register
+
+    async def enqueue(
+        self, db, kind: str, payload: dict, key: Optional[str] = None, delay: timedelta = timedelta(0)
+    ) -> str:
+        """Queue a job, due after `delay`. Returns its key; a job with the same key is only queued once."""
+        now = datetime.now(timezone.utc)
+        job_id = f"job_{uuid.uuid4().hex[:12]}"
+        job = {
+            "job_id": job_id,
+            "kind": kind,
+            "key": key or job_id,
+            "payload": payload,
+            "status": "queued",
+            "attempts": 0,
+            "run_at": now + delay,
+            "created_at": now,
+            "updated_at": now,
+        }
+        try:
+            await db.jobs.insert_one(job)
+        except DuplicateKeyError:
+            pass
+        # Workers in this process start right away instead of at their next poll
+        self._wake.set()
+        return job["key"]
+
+    async def release(self, db, key: str, payload: Optional[dict] = None) -> bool:
+        """Make a delayed job due now, adding `payload` to its payload. False if it already ran."""
+        now = datetime.now(timezone.utc)
+        update = {"run_at": now, "updated_at": now}
+        update.update({f"payload.{field}": value for field, value in (payload or {}).items()})
+        result = await db.jobs.update_one({"key": key, "status": "queued", "attempts": 0}, {"$set": update})
+        self._wake.set()
+        return bool(result.matched_count)
+
+    async def claim(self, db, worker: str) -> Optional[dict]:
+        """Lease the oldest due job, or None"""
+        now = datetime.now(timezone.utc)
+        return await db.jobs.find_one_and_update(
+            {"$or": [
+                {"status": "queued", "run_at": {"$lte": now}},
+                {"status": "running", "lease_until": {"$lt": now}, "attempts": {"$lt": MAX_ATTEMPTS}},
+            ]},
+            {
+                "$set": {"status": "running", "worker": worker, "lease_until": now + LEASE, "updated_at": now},
+                "$inc": {"attempts": 1},
+            },
+            sort=[("run_at", 1)],
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def fail_abandoned(self, db) -> int:
+        """Mark failed the jobs whose lease expired on their last attempt. Returns how many."""
+        now = datetime.now(timezone.utc)
+        result = await db.jobs.update_many(
+            {"status": "running", "lease_until": {"$lt": now}, "attempts": {"$gte": MAX_ATTEMPTS}},
+            {"$set": {
+                "status": "failed",
+                "error": f"lease expired on all {MAX_ATTEMPTS} attempts",
+                "finished_at": now,
+                "updated_at": now,
+            }},
+        )
+        if result.modified_count:
+            logger.error(f"{result.modified_count} job(s) failed: lease expired on all {MAX_ATTEMPTS} attempts")
+        return result.modified_count
+
+    async def run_one(self, db, worker: str) -> bool:
+        """Claim and run one job. Returns False when none was due."""
+        job = await self.claim(db, worker)
+        if job is None:
+            # Idle: settle jobs that crashed their worker on every attempt
+            await self.fail_abandoned(db)
+            return False
+        handler = self.handlers.get(job["kind"])
+        now = datetime.now(timezone.utc)
+        try:
+            if handler is None:
+                raise LookupError(f"no handler for job kind '{job['kind']}'")
+            result = await handler(job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            final = handler is None or job["attempts"] >= MAX_ATTEMPTS
+            logger.error(f"Job {job['job_id']} ({job['kind']}) attempt {job['attempts']} failed: {e}")
+            update = {"status": "failed" if final else "queued", "error": str(e), "updated_at": now}
+            if final:
+                update["finished_at"] = now
+            else:
+                update["run_at"] = now + retry_delay(job["attempts"])
+            await db.jobs.update_one({"job_id": job["job_id"], "worker": worker}, {"$set": update})
+            return True
+        await db.jobs.update_one(
+            {"job_id": job["job_id"], "worker": worker},
+            {"$set": {"status": "done", "result": result, "finished_at": now, "updated_at": now}},
+        )
+        return True
+
+    async def drain(self, db, worker: str = "drain") -> int:
+        """Run due jobs until none is left. Returns how many ran."""
+        ran = 0
+        while await self.run_one(db, worker):
+            ran += 1
+        return ran
+
+    async def _work(self, db, worker: str, poll_interval: float):
+        while True:
+            try:
+                if await self.run_one(db, worker):
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job worker {worker} failed: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def run(self, db, concurrency: int, poll_interval: float):
+        """Run `concurrency` workers forever"""
+        prefix = f"worker_{uuid.uuid4().hex[:6]}"
+        await asyncio.gather(*(self._work(db, f"{prefix}_{i}", poll_interval) for i in range(concurrency)))
+
+
+async def job_status(db, key: str) -> Optional[dict]:
+    """A job's status, attempts, result/error and owner (payload.user_id), by key"""
+    return await db.jobs.find_one(
+        {"key": key}, {"_id": 0, "status": 1, "attempts": 1, "result": 1, "error": 1, "payload.user_id": 1}
+    )
+
+
+job_queue = JobQueue()
@@ -0,0 +1,199 @@
+"""
+Who has visited a landmark.
+
+`landmark_visitors` holds one document per (landmark_id, user_id), enforced by
+a unique index, written by `add_visit`. The insert of that document tells us
+a visit is the user's first of the landmark, which is when the landmark's
+`visitor_count` in `landmark_stats` goes up, so the count is maintained at
+write time and never counted from `visits`.
+
+The same index answers "which of my friends visited this?" with one `$in`
+lookup over the caller's friend ids, whatever the number of friends.
+
+`shared` is true once any of the user's visits there was not private; only
+shared visitors are listed to friends.
+
+Visits from before this collection existed have no document until the
+backfill has run (`ensure_landmark_visitors`, once, at startup). Until then
+a new document alone does not prove a first visit: `record_visitor` also
+looks for the user's visits there from before the backfill started, and such
+a landmark only adds the missing visitor. Workers that did not run it follow
+it (`watch_landmark_visitors`): they stop checking once it is done, and take
+it over if it is still running after BACKFILL_TIMEOUT (its worker died).
+Backfill (or repair) from the existing visits by hand with:
+
+    python landmark_visitors.py
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# Friends listed on the landmark detail page
+MAX_FRIENDS_LISTED = 20
+
+MIGRATION_ID = "landmark_visitors"
+# A backfill still running after this is taken to have died with its worker
+BACKFILL_TIMEOUT = timedelta(hours=1)
+
+# Visits created before this may have no visitor document; None once backfilled
+_legacy_before: Optional[datetime] = None
+
+
+async def record_visitor(
+    db, landmark_id: str, user_id: str, visibility: str, visited_at: datetime
+) -> Tuple[bool, bool]:
+    """Record a visit (already inserted in visits) in landmark_visitors.
+
+    Returns (new_visitor, first_visit): whether the user now counts as a
+    visitor of the landmark for the first time, and whether this is their
+    first visit of it.
+    """
+    try:
+        result = await db.landmark_visitors.update_one(
+            {"landmark_id": landmark_id, "user_id": user_id},
+            {
+                "$setOnInsert": {"first_visited_at": visited_at},
+                "$max": {"shared": visibility != "private"},
+            },
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        # A concurrent first visit by the same user inserted it
+        return False, False
+    if result.upserted_id is None:
+        return False, False
+    if _legacy_before is None:
+        return True, True
+    # Not backfilled yet: a visit from before makes this a new visitor but not a first visit
+    legacy = await db.visits.count_documents(
+        {"user_id": user_id, "landmark_id": landmark_id, "created_at": {"$lt": _legacy_before}}, limit=1
+    )
+    return True, legacy == 0
+
+
+async def friends_who_visited(db, landmark_id: str, friend_ids: List[str]) -> List[str]:
+    """User ids of the given friends who visited the landmark (and did not keep it private)"""
+    if not friend_ids:
+        return []
+    visitors = await db.landmark_visitors.find(
+        {"landmark_id": landmark_id, "user_id": {"$in": friend_ids}, "shared": True},
+        {"user_id": 1, "_id": 0},
+    ).sort("first_visited_at", -1).to_list(None)
+    return [v["user_id"] for v in visitors]
+
+
+async def rebuild_landmark_visitors(db) -> int:
+    """Rebuild landmark_visitors and visitor counts from visits. Returns the number of landmarks."""
+    await db.visits.aggregate([
+        {"$group": {
+            "_id": {"landmark_id": "$landmark_id", "user_id": "$user_id"},
+            "first_visited_at": {"$min": "$visited_at"},
+            "shared": {"$max": {"$ne": ["$visibility", "private"]}},
+        }},
+        {"$project": {
+            "_id": 0,
+            "landmark_id": "$_id.landmark_id",
+            "user_id": "$_id.user_id",
+            "first_visited_at": 1,
+            "shared": 1,
+        }},
+        {"$merge": {
+            "into": "landmark_visitors",
+            "on": ["landmark_id", "user_id"],
+            "whenMatched": "replace",
+            "whenNotMatched": "insert",
+        }},
+    ]).to_list(None)
+
+    counts = await db.landmark_visitors.aggregate([
+        {"$group": {"_id": "$landmark_id", "visitors": {"$sum": 1}}},
+    ]).to_list(None)
+    if counts:
+        await db.landmark_stats.bulk_write([
+            UpdateOne({"landmark_id": c["_id"]}, {"$set": {"visitor_count": c["visitors"]}}, upsert=True)
+            for c in counts
+        ], ordered=False)
+    return len(counts)
+
+
+async def _mark_backfilled(db):
+    global _legacy_before
+    await db.migrations.update_one(
+        {"_id": MIGRATION_ID},
+        {"$set": {"status": "done", "finished_at": datetime.now(timezone.utc)}},
+        upsert=True,
+    )
+    _legacy_before = None
+
+
+async def _claim_backfill(db, started_at: datetime) -> bool:
+    """Claim the backfill: the first claim, or one whose worker died running it"""
+    try:
+        await db.migrations.insert_one({"_id": MIGRATION_ID, "status": "running", "started_at": started_at})
+        return True
+    except DuplicateKeyError:
+        pass
+    stale = await db.migrations.find_one_and_update(
+        {"_id": MIGRATION_ID, "status": "running", "started_at": {"$lt": started_at - BACKFILL_TIMEOUT}},
+        {"$set": {"started_at": started_at}},
+        return_document=ReturnDocument.AFTER,
+    )
+    return stale is not None
+
+
+async def ensure_landmark_visitors(db) -> bool:
+    """Backfill landmark_visitors once per database. Returns True if this call ran it.
+
+    The first worker to start claims a `migrations` document and runs it; the
+    others skip it, and until it is done `record_visitor` checks for visits
+    from before it started.
+    """
+    global _legacy_before
+    started_at = datetime.now(timezone.utc)
+    if not await _claim_backfill(db, started_at):
+        marker = await db.migrations.find_one({"_id": MIGRATION_ID})
+        _legacy_before = None if marker.get("status") == "done" else marker.get("started_at", started_at)
+        return False
+    _legacy_before = started_at
+    await rebuild_landmark_visitors(db)
+    await _mark_backfilled(db)
+    return True
+
+
+async def watch_landmark_visitors(db, interval: float):
+    """Until the backfill is done: follow it, and take it over if its worker died"""
+    while _legacy_before is not None:
+        await asyncio.sleep(interval)
+        try:
+            if await ensure_landmark_visitors(db):
+                logger.info("Took over the landmark_visitors backfill")
+        except Exception as e:
+            logger.error(f"landmark_visitors backfill check failed: {e}")
+
+
+async def main():
+    load_dotenv(Path(__file__).parent / ".env")
+    client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+    db = client[os.environ["DB_NAME"]]
+
+    await db.landmark_visitors.create_index([("landmark_id", 1), ("user_id", 1)], unique=True)
+    started = datetime.now(timezone.utc)
+    landmarks = await rebuild_landmark_visitors(db)
+    await _mark_backfilled(db)
+    print(f"Rebuilt visitors for {landmarks} landmarks in {(datetime.now(timezone.utc) - started).total_seconds():.1f}s")
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
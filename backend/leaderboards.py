@@ -0,0 +1,228 @@
+"""
+Country and continent leaderboards ("top explorers of Japan").
+
+`leaderboard_rollups` holds one counter document per (scope, user), where the
+scope is "country:<country_id>" or "continent:<continent>":
+
+    points      points earned there: landmark and country visits, and the
+                bonuses of the visits made there (the same total as the
+                user's points)
+    landmarks   distinct landmarks visited there
+    countries   countries visited there (country_visits)
+
+The counters are incremented on the write paths (`add_visit`, creating and
+deleting country visits), so a leaderboard read is an index walk over
+(scope, counter) for the top N and one counted range for the caller's rank;
+`visits` is never aggregated per request.
+
+Backfill (or repair) from visits and country_visits with:
+
+    python leaderboards.py
+"""
+
+import asyncio
+import os
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReplaceOne, UpdateOne
+
+from visit_progress import (
+    CONTINENT_COMPLETION_BONUS, COUNTRY_COMPLETION_BONUS, FIRST_IN_CONTINENT_BONUS, FIRST_IN_COUNTRY_BONUS
+)
+
+SCOPE_TYPES = ("country", "continent")
+CATEGORIES = ("points", "landmarks", "countries")
+
+
+def scope_key(scope_type: str, scope_id: str) -> str:
+    return f"{scope_type}:{scope_id}"
+
+
+def _scopes(country_id: Optional[str], continent: Optional[str]) -> List[str]:
+    scopes = []
+    if country_id:
+        scopes.append(scope_key("country", country_id))
+    if continent:
+        scopes.append(scope_key("continent", continent))
+    return scopes
+
+
+async def record_rollup(db, user_id: str, country_id: Optional[str], continent: Optional[str],
+                        points: int = 0, landmarks: int = 0, countries: int = 0):
+    """Add to the user's counters in the country's and continent's scopes"""
+    increments = {k: v for k, v in (("points", points), ("landmarks", landmarks), ("countries", countries)) if v}
+    scopes = _scopes(country_id, continent)
+    if not increments or not scopes:
+        return
+    now = datetime.now(timezone.utc)
+    await db.leaderboard_rollups.bulk_write([
+        UpdateOne({"scope": scope, "user_id": user_id}, {"$inc": increments, "$set": {"updated_at": now}}, upsert=True)
+        for scope in scopes
+    ], ordered=False)
+
+
+async def scoped_leaderboard(db, scope: str, category: str, user_id: str, limit: int = 50,
+                             user_ids: Optional[List[str]] = None) -> dict:
+    """Top `limit` users of a scope by a counter, and the caller's own rank.
+
+    Ties share a rank (1, 2, 2, 4). `user_ids` restricts the board (friends only).
+    """
+    query = {"scope": scope, category: {"$gt": 0}}
+    if user_ids is not None:
+        query["user_id"] = {"$in": user_ids}
+    top = await db.leaderboard_rollups.find(query, {"_id": 0, "user_id": 1, category: 1}).sort(
+        [(category, -1), ("user_id", 1)]
+    ).limit(limit).to_list(limit)
+
+    users = {
+        u["user_id"]: u for u in await db.users.find(
+            {"user_id": {"$in": [entry["user_id"] for entry in top]}},
+            {"_id": 0, "user_id": 1, "name": 1, "picture": 1, "username": 1},
+        ).to_list(None)
+    }
+    leaderboard = []
+    for index, entry in enumerate(top):
+        user = users.get(entry["user_id"])
+        if not user:
+            continue
+        tied = leaderboard and leaderboard[-1]["value"] == entry[category]
+        leaderboard.append({
+            "user_id": user["user_id"],
+            "name": user.get("name"),
+            "picture": user.get("picture"),
+            "username": user.get("username"),
+            "value": entry[category],
+            "rank": leaderboard[-1]["rank"] if tied else index + 1,
+        })
+
+    mine = await db.leaderboard_rollups.find_one({"scope": scope, "user_id": user_id}, {"_id": 0, category: 1})
+    user_value = (mine or {}).get(category, 0)
+    user_rank = None
+    if user_value > 0:
+        user_rank = await db.leaderboard_rollups.count_documents({**query, category: {"$gt": user_value}}) + 1
+    return {
+        "leaderboard": leaderboard,
+        "user_rank": user_rank,
+        "user_value": user_value,
+        "total_users": await db.leaderboard_rollups.count_documents(query),
+    }
+
+
+def _first(group: dict):
+    # Order of first visits; groups without a time come last
+    return (group.get("first_at") is None, group.get("first_at") or 0)
+
+
+def build_rollups(visits: List[dict], country_visits: List[dict], landmarks: Dict[str, dict]) -> Dict[tuple, dict]:
+    """{(scope, user_id): counters} from per-(user, landmark) visit groups and country visits.
+
+    Bonuses are credited as add_visit credits them: to the scopes of the
+    visit that earned them, told apart by each group's `first_at`. Country
+    totals come from `landmarks`, the whole catalog.
+    """
+    rollups = defaultdict(lambda: {"points": 0, "landmarks": 0, "countries": 0})
+
+    def credit(user_id, landmark, points):
+        for scope in _scopes(landmark.get("country_id"), landmark.get("continent")):
+            rollups[(scope, user_id)]["points"] += points
+
+    totals = defaultdict(int)
+    countries_by_continent = defaultdict(set)
+    for landmark in landmarks.values():
+        totals[landmark.get("country_id")] += 1
+        countries_by_continent[landmark.get("continent")].add(landmark.get("country_id"))
+
+    by_user = defaultdict(list)
+    for group in visits:
+        landmark = landmarks.get(group["landmark_id"])
+        if not landmark:
+            continue
+        by_user[group["user_id"]].append((group, landmark))
+        for scope in _scopes(landmark.get("country_id"), landmark.get("continent")):
+            counters = rollups[(scope, group["user_id"])]
+            counters["points"] += group["points"]
+            counters["landmarks"] += 1
+
+    # Country bonus: carried by the auto-created country visit, else earned alongside a manual one
+    auto_countries = {(cv["user_id"], cv.get("country_id")) for cv in country_visits if cv.get("first_landmark_id")}
+    for user_id, groups in by_user.items():
+        by_country, by_continent = defaultdict(list), defaultdict(list)
+        for group, landmark in sorted(groups, key=lambda g: _first(g[0])):
+            by_country[landmark.get("country_id")].append((group, landmark))
+            by_continent[landmark.get("continent")].append((group, landmark))
+        for country_id, visited in by_country.items():
+            if (user_id, country_id) not in auto_countries:
+                credit(user_id, visited[0][1], FIRST_IN_COUNTRY_BONUS)
+        completed = {}  # country_id -> the visit that completed it
+        for country_id, visited in by_country.items():
+            if len(visited) == totals[country_id]:
+                completed[country_id] = visited[-1]
+                credit(user_id, visited[-1][1], COUNTRY_COMPLETION_BONUS)
+        for continent, visited in by_continent.items():
+            if not continent:
+                continue
+            credit(user_id, visited[0][1], FIRST_IN_CONTINENT_BONUS)
+            if countries_by_continent[continent] <= set(completed):
+                last = max((completed[c] for c in countries_by_continent[continent]), key=lambda g: _first(g[0]))
+                credit(user_id, last[1], CONTINENT_COMPLETION_BONUS)
+
+    for country_visit in country_visits:
+        for scope in _scopes(country_visit.get("country_id"), country_visit.get("continent")):
+            counters = rollups[(scope, country_visit["user_id"])]
+            counters["points"] += country_visit.get("points_earned") or 0
+            counters["countries"] += 1
+    return rollups
+
+
+async def rebuild_leaderboard_rollups(db) -> int:
+    """Recompute every rollup from visits and country_visits. Returns the number of rollups."""
+    started = datetime.now(timezone.utc)
+    landmarks = {
+        l["landmark_id"]: l
+        for l in await db.landmarks.find({}, {"_id": 0, "landmark_id": 1, "country_id": 1, "continent": 1}).to_list(None)
+    }
+    visits = await db.visits.aggregate([
+        {"$group": {
+            "_id": {"user_id": "$user_id", "landmark_id": "$landmark_id"},
+            "points": {"$sum": {"$ifNull": ["$points_earned", 0]}},
+            "first_at": {"$min": "$created_at"},
+        }},
+        {"$project": {
+            "_id": 0, "user_id": "$_id.user_id", "landmark_id": "$_id.landmark_id", "points": 1, "first_at": 1,
+        }},
+    ]).to_list(None)
+    country_visits = await db.country_visits.find(
+        {}, {"_id": 0, "user_id": 1, "country_id": 1, "continent": 1, "points_earned": 1, "first_landmark_id": 1}
+    ).to_list(None)
+
+    rollups = build_rollups(visits, country_visits, landmarks)
+    if rollups:
+        await db.leaderboard_rollups.bulk_write([
+            ReplaceOne({"scope": scope, "user_id": user_id},
+                       {"scope": scope, "user_id": user_id, **counters, "updated_at": started}, upsert=True)
+            for (scope, user_id), counters in rollups.items()
+        ], ordered=False)
+    # Rollups nothing counts towards any more
+    await db.leaderboard_rollups.delete_many({"updated_at": {"$lt": started}})
+    return len(rollups)
+
+
+async def main():
+    load_dotenv(Path(__file__).parent / ".env")
+    client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+    db = client[os.environ["DB_NAME"]]
+
+    await db.leaderboard_rollups.create_index([("scope", 1), ("user_id", 1)], unique=True)
+    started = datetime.now(timezone.utc)
+    rollups = await rebuild_leaderboard_rollups(db)
+    print(f"Rebuilt {rollups} leaderboard rollups in {(datetime.now(timezone.utc) - started).total_seconds():.1f}s")
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,110 @@
+"""
+Server-side map clustering.
+
+Landmarks are projected to Web Mercator and bucketed into a square pixel grid
+at every zoom level from 0 to MAX_ZOOM, once per catalog version (see
+`CatalogSnapshot.map_clusters`). A map request then only filters the
+precomputed clusters of one zoom level by the viewport, so the phone never
+has to download and cluster the full landmark list itself.
+"""
+
+import math
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from geo_index import valid_coordinates
+
+TILE_SIZE = 256
+# Cluster radius on screen, in pixels
+CLUSTER_PIXELS = 60
+MIN_ZOOM = 0
+MAX_ZOOM = 16
+
+_MAX_MERCATOR_LAT = 85.05112878
+
+
+def _project(lat: float, lng: float) -> Tuple[float, float]:
+    """(lat, lng) -> Web Mercator world coordinates in [0, 1)"""
+    lat = max(-_MAX_MERCATOR_LAT, min(_MAX_MERCATOR_LAT, lat))
+    x = (lng + 180) / 360
+    sin_lat = math.sin(math.radians(lat))
+    y = 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return min(max(x, 0.0), 1 - 1e-12), min(max(y, 0.0), 1 - 1e-12)
+
+
+def parse_bbox(bbox: str) -> Tuple[float, float, float, float]:
+    """'min_lng,min_lat,max_lng,max_lat' -> floats. Raises ValueError."""
+    parts = [float(p) for p in bbox.split(",")]
+    if len(parts) != 4:
+        raise ValueError("bbox must have 4 comma-separated numbers")
+    min_lng, min_lat, max_lng, max_lat = parts
+    if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lng <= 180 and -180 <= max_lng <= 180):
+        raise ValueError("bbox is out of range")
+    return min_lng, min_lat, max_lng, max_lat
+
+
+def _in_bbox(lat: float, lng: float, bbox: Tuple[float, float, float, float]) -> bool:
+    min_lng, min_lat, max_lng, max_lat = bbox
+    if not min_lat <= lat <= max_lat:
+        return False
+    if min_lng <= max_lng:
+        return min_lng <= lng <= max_lng
+    # Viewport crosses the antimeridian
+    return lng >= min_lng or lng <= max_lng
+
+
+class MapClusters:
+    def __init__(self, landmarks: Sequence[dict]):
+        points = [
+            (landmark, _project(landmark["latitude"], landmark["longitude"]))
+            for landmark in landmarks
+            if valid_coordinates(landmark.get("latitude"), landmark.get("longitude"))
+        ]
+
+        self._levels: Dict[int, List[dict]] = {}
+        for zoom in range(MIN_ZOOM, MAX_ZOOM + 1):
+            cells_per_side = max(1, int(TILE_SIZE * (2 ** zoom) / CLUSTER_PIXELS))
+            cells: Dict[Tuple[int, int], List[dict]] = {}
+            for landmark, (x, y) in points:
+                cells.setdefault((int(x * cells_per_side), int(y * cells_per_side)), []).append(landmark)
+            self._levels[zoom] = [self._cluster(zoom, cell, members) for cell, members in cells.items()]
+
+    @staticmethod
+    def _cluster(zoom: int, cell: Tuple[int, int], members: List[dict]) -> dict:
+        cluster = {
+            "cluster_id": f"{zoom}/{cell[0]}/{cell[1]}",
+            "latitude": sum(m["latitude"] for m in members) / len(members),
+            "longitude": sum(m["longitude"] for m in members) / len(members),
+            "count": len(members),
+            "landmark_ids": tuple(m["landmark_id"] for m in members),
+        }
+        if len(members) == 1:
+            landmark = members[0]
+            cluster.update({
+                "latitude": landmark["latitude"],
+                "longitude": landmark["longitude"],
+                "landmark_id": landmark["landmark_id"],
+                "name": landmark.get("name"),
+                "category": landmark.get("category"),
+                "country_id": landmark.get("country_id"),
+            })
+        return cluster
+
+    def clusters(
+        self,
+        zoom: int,
+        bbox: Optional[Tuple[float, float, float, float]] = None,
+        visited_ids: Optional[Iterable[str]] = None,
+    ) -> List[dict]:
+        """Clusters of one zoom level inside `bbox`, optionally with per-cluster visited counts"""
+        zoom = max(MIN_ZOOM, min(MAX_ZOOM, zoom))
+        visited = set(visited_ids) if visited_ids is not None else None
+
+        results = []
+        for cluster in self._levels[zoom]:
+            if bbox is not None and not _in_bbox(cluster["latitude"], cluster["longitude"], bbox):
+                continue
+            result = {k: v for k, v in cluster.items() if k != "landmark_ids"}
+            if visited is not None:
+                result["visited_count"] = sum(1 for i in cluster["landmark_ids"] if i in visited)
+            results.append(result)
+        return results
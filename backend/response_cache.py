@@ -0,0 +1,129 @@
+"""
+Pre-serialized, pre-compressed catalog responses.
+
+The big catalog payloads (/landmarks with facts and images, /countries) are
+identical for every caller of the same variant until the catalog version
+moves. `PayloadCache` serializes each variant to JSON once per version and
+keeps gzip (and brotli, when the optional `brotli` package is installed)
+encodings next to it, so a request only negotiates Accept-Encoding and sends
+bytes that already exist.
+"""
+
+import asyncio
+import gzip
+import json
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 9
+# Not worth compressing below this size
+MIN_COMPRESS_BYTES = 1000
+
+
+def _compress(encoding: str, body: bytes) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def accepted_encodings(accept_encoding: str) -> Dict[str, float]:
+    """Parse Accept-Encoding into {coding: q}"""
+    encodings = {}
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        encodings[coding.strip().lower()] = q
+    return encodings
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Best of br / gzip the client accepts, or None for identity"""
+    accepted = accepted_encodings(accept_encoding)
+    options = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best, best_q = None, 0.0
+    for coding in options:
+        q = accepted.get(coding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class EncodedPayload:
+    def __init__(self, body: bytes):
+        self.body = body
+        self._encoded: Dict[str, bytes] = {}
+        self._lock = asyncio.Lock()
+
+    async def encoded(self, encoding: str) -> bytes:
+        if encoding not in self._encoded:
+            async with self._lock:
+                if encoding not in self._encoded:
+                    # Compress off the event loop; happens once per version
+                    self._encoded[encoding] = await asyncio.to_thread(_compress, encoding, self.body)
+        return self._encoded[encoding]
+
+
+class PayloadCache:
+    """LRU of encoded payloads for the current catalog version"""
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+        self._version = None
+        self._entries: "OrderedDict[str, EncodedPayload]" = OrderedDict()
+
+    def _payload(self, version: int, key: str, build: Callable[[], Any]) -> EncodedPayload:
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+        payload = self._entries.get(key)
+        if payload is None:
+            content = jsonable_encoder(build())
+            # Same bytes FastAPI's JSONResponse would render
+            body = json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+            payload = EncodedPayload(body)
+            self._entries[key] = payload
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        else:
+            self._entries.move_to_end(key)
+        return payload
+
+    async def respond(
+        self,
+        request: Request,
+        version: int,
+        key: str,
+        build: Callable[[], Any],
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Response:
+        """JSON response for `key` at `version`, built by `build()` only on a cache miss"""
+        payload = self._payload(version, key, build)
+        headers = dict(headers or {})
+        headers["Vary"] = "Accept-Encoding"
+
+        body = payload.body
+        encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+        if encoding and len(body) >= MIN_COMPRESS_BYTES:
+            body = await payload.encoded(encoding)
+            headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type="application/json", headers=headers)
+
+
+catalog_payloads = PayloadCache()
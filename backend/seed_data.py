@@ -1,10 +1,13 @@
 import asyncio
+import sys
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 from dotenv import load_dotenv
 from pathlib import Path
 from datetime import datetime, timezone
 from premium_landmarks import PREMIUM_LANDMARKS
+from catalog import publish_catalog_changes
+from catalog_seeding import sync_catalog
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -2173,19 +2176,8 @@ LANDMARKS_DATA = {
     ],
 }
 
-async def seed_database():
-    print("Starting database seeding...")
-    
-    # Clear existing data
-    await db.countries.delete_many({})
-    await db.landmarks.delete_many({})
-    print("Cleared existing data")
-    
-    # Insert countries
-    await db.countries.insert_many(COUNTRIES_DATA)
-    print(f"Inserted {len(COUNTRIES_DATA)} countries")
-    
-    # Insert landmarks
+def build_catalog():
+    """Country and landmark documents defined by this seed"""
     all_landmarks = []
     for country_data in COUNTRIES_DATA:
         country_id = country_data["country_id"]
@@ -2226,10 +2218,7 @@ async def seed_database():
             official_names_by_country[country] = set()
         official_names_by_country[country].add(name_normalized)
     
-    await db.landmarks.insert_many(all_landmarks)
-    print(f"Inserted {len(all_landmarks)} official landmarks")
-    
-    # Insert premium landmarks (skip any that duplicate official landmarks)
+    # Premium landmarks (skip any that duplicate official landmarks)
     premium_landmark_docs = []
     skipped_duplicates = []
     for country_id, premium_landmarks in PREMIUM_LANDMARKS.items():
@@ -2275,8 +2264,8 @@ async def seed_database():
                 "best_time_to_visit": "Year-round",
                 "duration": "Half day",
                 "difficulty": "Moderate",
-                "latitude": None,
-                "longitude": None,
+                # No coordinates here: left out, so a reseed never overwrites
+                # ones added by admin edits or geocoding
                 "points": landmark["points"],
                 "upvotes": 0,
                 "created_by": None,
@@ -2289,10 +2278,40 @@ async def seed_database():
         for dup in skipped_duplicates:
             print(f"  - {dup}")
     
-    await db.landmarks.insert_many(premium_landmark_docs)
-    print(f"Inserted {len(premium_landmark_docs)} premium landmarks")
+    print(f"Built {len(all_landmarks)} official and {len(premium_landmark_docs)} premium landmarks")
+    return [dict(c) for c in COUNTRIES_DATA], all_landmarks + premium_landmark_docs
+
+async def seed_database(reset: bool = False):
+    """
+    Seed the catalog. By default only new or changed documents are written
+    (safe on a live database); reset=True clears and reinserts everything.
+    """
+    print("Starting database seeding...")
+    countries, landmarks = build_catalog()
+    
+    if reset:
+        # Clear existing data
+        await db.countries.delete_many({})
+        await db.landmarks.delete_many({})
+        print("Cleared existing data")
+        
+        await db.countries.insert_many(countries)
+        await db.landmarks.insert_many(landmarks)
+        print(f"Inserted {len(countries)} countries and {len(landmarks)} landmarks")
+        
+        # Stamp changes for delta sync and tell running API workers to reload
+        version = await publish_catalog_changes(db)
+    else:
+        result = await sync_catalog(db, countries, landmarks)
+        for kind in ("country", "landmark"):
+            print(f"{kind.capitalize()}: {result[kind]}")
+        version = result["version"]
     
+    if version is None:
+        print("Catalog already up to date")
+    else:
+        print(f"Catalog published at version {version}")
     print("Database seeding completed!")
 
 if __name__ == "__main__":
-    asyncio.run(seed_database())
+    asyncio.run(seed_database(reset="--reset" in sys.argv))
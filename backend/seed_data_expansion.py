@@ -1,10 +1,13 @@
 import asyncio
+import sys
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 from dotenv import load_dotenv
 from pathlib import Path
 from datetime import datetime, timezone
 from premium_landmarks import PREMIUM_LANDMARKS
+from catalog import publish_catalog_changes
+from catalog_seeding import sync_catalog
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -1042,103 +1045,119 @@ for country in COUNTRIES_DATA:
     country["image_url"] = COUNTRY_IMAGES[country["country_id"]]
 
 
-async def seed_database():
-    """Seed database with 48 countries and their landmarks"""
+def build_catalog():
+    """Country and landmark documents defined by this seed"""
+    landmark_docs = []
+    
+    for country_id, landmarks in LANDMARKS_DATA.items():
+        # Get country info for required fields
+        country_info = next(c for c in COUNTRIES_DATA if c["country_id"] == country_id)
+        
+        # Only use first 10 landmarks as official (free)
+        for idx, landmark in enumerate(landmarks[:10]):  # Changed to only use first 10
+            landmark_docs.append({
+                "landmark_id": f"{country_id}_{landmark['name'].lower().replace(' ', '_').replace('&', 'and')}",
+                "country_id": country_id,
+                "country_name": country_info["name"],
+                "continent": country_info["continent"],
+                "name": landmark["name"],
+                "description": landmark["description"],
+                "image_url": landmark["image_url"],
+                "images": [landmark["image_url"]],
+                "difficulty": landmark["difficulty"],
+                "category": "official",
+                "points": 10,
+                "upvotes": 0,
+                "created_by": None,
+                "created_at": datetime.now(timezone.utc),
+                "best_time_to_visit": "Year-round",
+                "duration": "2-3 hours"
+                # No facts or coordinates here: left out, so a reseed never
+                # overwrites ones added by admin edits or geocoding
+            })
+    
+    # Premium landmarks from PREMIUM_LANDMARKS dictionary
+    for country_id, premium_landmarks in PREMIUM_LANDMARKS.items():
+        country_info = next((c for c in COUNTRIES_DATA if c["country_id"] == country_id), None)
+        if not country_info:
+            print(f"  ⚠️  Skipping {country_id} - country not found")
+            continue
+        
+        for landmark in premium_landmarks:
+            landmark_docs.append({
+                "landmark_id": f"{country_id}_{landmark['name'].lower().replace(' ', '_').replace('&', 'and').replace('(', '').replace(')', '')}",
+                "country_id": country_id,
+                "country_name": country_info["name"],
+                "continent": country_info["continent"],
+                "name": landmark["name"],
+                "description": landmark["description"],
+                "image_url": landmark["image_url"],
+                "images": [landmark["image_url"]],
+                "difficulty": "Easy",  # Default difficulty for premium landmarks
+                "category": "premium",
+                "points": landmark.get("points", 25),
+                "upvotes": 0,
+                "created_by": None,
+                "created_at": datetime.now(timezone.utc),
+                "best_time_to_visit": "Year-round",
+                "duration": "2-3 hours"
+                # No facts or coordinates here: left out, so a reseed never
+                # overwrites ones added by admin edits or geocoding
+            })
+    
+    # A few landmarks appear in both lists (same landmark_id); keep the first
+    unique_docs = {}
+    for doc in landmark_docs:
+        unique_docs.setdefault(doc["landmark_id"], doc)
+    if len(unique_docs) < len(landmark_docs):
+        print(f"  ⚠️  Skipping {len(landmark_docs) - len(unique_docs)} landmarks with duplicate ids")
+    
+    return [dict(c) for c in COUNTRIES_DATA], list(unique_docs.values())
+
+
+async def seed_database(reset: bool = False):
+    """
+    Seed database with 48 countries and their landmarks. By default only new
+    or changed documents are written (safe on a live database); reset=True
+    clears and reinserts everything.
+    """
     try:
         print("🌍 Starting global content expansion...")
         print(f"📊 Target: {len(COUNTRIES_DATA)} countries, ~{len(COUNTRIES_DATA) * 10} landmarks\n")
+        countries, landmarks = build_catalog()
         
-        # Clear existing data
-        print("🗑️  Clearing existing data...")
-        await db.countries.delete_many({})
-        await db.landmarks.delete_many({})
-        print("✅ Old data cleared\n")
-        
-        # Insert countries
-        print("📍 Inserting countries...")
-        await db.countries.insert_many(COUNTRIES_DATA)
-        print(f"✅ {len(COUNTRIES_DATA)} countries added\n")
-        
-        # Insert landmarks with category distribution
-        print("🏛️  Inserting landmarks...")
-        total_landmarks = 0
-        official_count = 0
-        premium_count = 0
-        
-        for country_id, landmarks in LANDMARKS_DATA.items():
-            # Get country info for required fields
-            country_info = next(c for c in COUNTRIES_DATA if c["country_id"] == country_id)
+        if reset:
+            # Clear existing data
+            print("🗑️  Clearing existing data...")
+            await db.countries.delete_many({})
+            await db.landmarks.delete_many({})
+            print("✅ Old data cleared\n")
             
-            # Only use first 10 landmarks as official (free)
-            for idx, landmark in enumerate(landmarks[:10]):  # Changed to only use first 10
-                landmark_doc = {
-                    "landmark_id": f"{country_id}_{landmark['name'].lower().replace(' ', '_').replace('&', 'and')}",
-                    "country_id": country_id,
-                    "country_name": country_info["name"],
-                    "continent": country_info["continent"],
-                    "name": landmark["name"],
-                    "description": landmark["description"],
-                    "image_url": landmark["image_url"],
-                    "images": [landmark["image_url"]],
-                    "difficulty": landmark["difficulty"],
-                    "category": "official",
-                    "points": 10,
-                    "upvotes": 0,
-                    "created_by": None,
-                    "created_at": datetime.now(timezone.utc),
-                    "facts": [],
-                    "best_time_to_visit": "Year-round",
-                    "duration": "2-3 hours",
-                    "latitude": None,
-                    "longitude": None
-                }
-                await db.landmarks.insert_one(landmark_doc)
-                total_landmarks += 1
-                official_count += 1
+            print("📍 Inserting countries and landmarks...")
+            await db.countries.insert_many(countries)
+            await db.landmarks.insert_many(landmarks)
             
-            print(f"  ✓ {country_id}: {len(landmarks[:10])} free landmarks")
+            # Stamp changes for delta sync and tell running API workers to reload
+            version = await publish_catalog_changes(db)
+        else:
+            print("🔍 Applying changes only...")
+            result = await sync_catalog(db, countries, landmarks)
+            for kind in ("country", "landmark"):
+                counts = result[kind]
+                print(f"  ✓ {kind}: {counts['inserted']} new, {counts['updated']} changed, {counts['unchanged']} unchanged")
+            version = result["version"]
         
-        # Now add premium landmarks from PREMIUM_LANDMARKS dictionary
-        print("\n💎 Inserting premium landmarks...")
-        for country_id, premium_landmarks in PREMIUM_LANDMARKS.items():
-            country_info = next((c for c in COUNTRIES_DATA if c["country_id"] == country_id), None)
-            if not country_info:
-                print(f"  ⚠️  Skipping {country_id} - country not found")
-                continue
-            
-            for landmark in premium_landmarks:
-                landmark_doc = {
-                    "landmark_id": f"{country_id}_{landmark['name'].lower().replace(' ', '_').replace('&', 'and').replace('(', '').replace(')', '')}",
-                    "country_id": country_id,
-                    "country_name": country_info["name"],
-                    "continent": country_info["continent"],
-                    "name": landmark["name"],
-                    "description": landmark["description"],
-                    "image_url": landmark["image_url"],
-                    "images": [landmark["image_url"]],
-                    "difficulty": "Easy",  # Default difficulty for premium landmarks
-                    "category": "premium",
-                    "points": landmark.get("points", 25),
-                    "upvotes": 0,
-                    "created_by": None,
-                    "created_at": datetime.now(timezone.utc),
-                    "facts": [],
-                    "best_time_to_visit": "Year-round",
-                    "duration": "2-3 hours",
-                    "latitude": None,
-                    "longitude": None
-                }
-                await db.landmarks.insert_one(landmark_doc)
-                total_landmarks += 1
-                premium_count += 1
-            
-            print(f"  ✓ {country_id}: {len(premium_landmarks)} premium landmarks")
+        if version is None:
+            print("✅ Catalog already up to date")
+        else:
+            print(f"🔄 Catalog published at version {version}")
         
+        official_count = sum(1 for l in landmarks if l["category"] == "official")
         print(f"\n🎉 SUCCESS! Database seeded with:")
-        print(f"   • {len(COUNTRIES_DATA)} countries")
-        print(f"   • {total_landmarks} total landmarks")
+        print(f"   • {len(countries)} countries")
+        print(f"   • {len(landmarks)} total landmarks")
         print(f"   • {official_count} free landmarks")
-        print(f"   • {premium_count} premium landmarks")
+        print(f"   • {len(landmarks) - official_count} premium landmarks")
         
         # Print continent distribution
         print(f"\n🌐 Continental Distribution:")
@@ -1155,4 +1174,4 @@ async def seed_database():
 
 
 if __name__ == "__main__":
-    asyncio.run(seed_database())
+    asyncio.run(seed_database(reset="--reset" in sys.argv))
@@ -1,8 +1,11 @@
 from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request, Response, Cookie, Body
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 import os
+import hashlib
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
@@ -12,6 +15,27 @@ from datetime import datetime, timezone, timedelta
 import httpx
 from passlib.context import CryptContext
 from jose import JWTError, jwt
+import asyncio
+
+from catalog import catalog_store
+from catalog_bulk import CatalogBatchError, CatalogBatchPartiallyApplied, apply_patches
+from catalog_validation import validate_catalog
+from response_cache import catalog_payloads
+from upvotes import live_upvotes, reconcile_upvote_counts, sync_upvotes, toggle_upvote, upvote_counter
+from duplicates import DEDUPLICATORS
+from landmark_visitors import (
+    MAX_FRIENDS_LISTED, ensure_landmark_visitors, friends_who_visited, record_visitor, watch_landmark_visitors
+)
+from visit_progress import (
+    CONTINENT_COMPLETION_BONUS, COUNTED_FIELD, COUNTRY_COMPLETION_BONUS, FIRST_IN_CONTINENT_BONUS,
+    FIRST_IN_COUNTRY_BONUS, get_user_progress, record_country_visit, record_visit_progress
+)
+from visited_set import VisitedSet
+from jobs import JOB_RETENTION, job_queue, job_status
+from streaks import advance_streak
+from leaderboards import CATEGORIES as SCOPED_CATEGORIES, SCOPE_TYPES, record_rollup, scope_key, scoped_leaderboard
+from trending import UPVOTE_WEIGHT, VISIT_WEIGHT, record_trending_event, top_trending
+from map_clusters import MAX_ZOOM as MAP_MAX_ZOOM, MIN_ZOOM as MAP_MIN_ZOOM, parse_bbox
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -21,6 +45,28 @@ mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
+# How often each worker checks whether the catalog version moved
+CATALOG_POLL_SECONDS = float(os.environ.get("CATALOG_POLL_SECONDS", "5"))
+
+# Compiled catalog file loaded at startup when it matches the catalog version
+# (see catalog_file.py); set CATALOG_SNAPSHOT_FILE="" to always load from MongoDB
+CATALOG_SNAPSHOT_FILE = os.environ.get("CATALOG_SNAPSHOT_FILE", str(ROOT_DIR / "catalog_snapshot.json")) or None
+
+# How often buffered upvote count changes are written to the live counts, and
+# how often the live counts are published to the catalog (upvotes.py)
+UPVOTE_FLUSH_SECONDS = float(os.environ.get("UPVOTE_FLUSH_SECONDS", "2"))
+UPVOTE_PUBLISH_SECONDS = float(os.environ.get("UPVOTE_PUBLISH_SECONDS", "3600"))
+
+# How often workers check on another worker's landmark_visitors backfill
+VISITORS_BACKFILL_POLL_SECONDS = float(os.environ.get("VISITORS_BACKFILL_POLL_SECONDS", "60"))
+
+# Background job workers per process, and how often idle workers poll (jobs.py)
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "4"))
+JOB_POLL_SECONDS = float(os.environ.get("JOB_POLL_SECONDS", "1"))
+
+# Largest search radius accepted by the nearby-landmarks endpoints
+MAX_NEARBY_RADIUS_KM = 2000
+
 # Security
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 SECRET_KEY = os.environ.get("JWT_SECRET_KEY", "your-secret-key-change-in-production")
@@ -50,6 +96,7 @@ class User(BaseModel):
     current_streak: int = 0  # Current consecutive days streak
     longest_streak: int = 0  # Longest streak ever achieved
     last_visit_date: Optional[str] = None  # Last date user made a visit (YYYY-MM-DD)
+    visits_version: int = 0  # Bumped on every visit write; part of per-user catalog ETags
     role: str = "user"  # "user", "moderator", "admin"
     is_banned: bool = False  # Whether user is banned
     banned_at: Optional[datetime] = None
@@ -136,9 +183,17 @@ class LandmarkFact(BaseModel):
     text: str
     icon: str
 
+class ImagePlaceholder(BaseModel):
+    url: str
+    width: int
+    height: int
+    blurhash: str
+    lqip: Optional[str] = None  # Tiny JPEG data URI, only for the card image (image_url)
+
 class Landmark(BaseModel):
     landmark_id: str
     name: str
+    alternate_names: Optional[List[str]] = []  # Other names the landmark is known by (used by autocomplete)
     country_id: str
     country_name: str
     continent: str
@@ -147,6 +202,7 @@ class Landmark(BaseModel):
     image_url: Optional[str] = None
     images: Optional[List[str]] = []  # Array of image URLs for gallery
     facts: Optional[List[LandmarkFact]] = []  # Historical/cultural facts
+    image_placeholders: Optional[List[ImagePlaceholder]] = []  # Precomputed by image_placeholders.py
     best_time_to_visit: Optional[str] = "Year-round"
     duration: Optional[str] = "2-3 hours"
     difficulty: Optional[str] = "Easy"
@@ -158,6 +214,17 @@ class Landmark(BaseModel):
     created_at: datetime
     is_locked: bool = False  # True if premium landmark and user doesn't have access
 
+class FriendVisitor(BaseModel):
+    user_id: str
+    name: str
+    username: Optional[str] = None
+    picture: Optional[str] = None
+
+class LandmarkVisitors(BaseModel):
+    visitor_count: int = 0  # Distinct users who visited
+    friends_visited_count: int = 0
+    friends_visited: List[FriendVisitor] = []  # Most recent first, up to MAX_FRIENDS_LISTED
+
 class LandmarkCreate(BaseModel):
     name: str
     country_id: str
@@ -1101,116 +1168,92 @@ async def get_temp_token(email: str = "mobile@test.com"):
 
 # ============= COUNTRY & LANDMARK ENDPOINTS =============
 
+def catalog_etag(*parts) -> str:
+    """Strong ETag for a catalog response; parts must include the catalog version"""
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode()).hexdigest()[:24]
+    return f'"{digest}"'
+
+def not_modified(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """
+    Set ETag on the response and, if the client already holds this
+    representation (If-None-Match), return the 304 to send instead.
+    """
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        client_tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        if etag in client_tags or "*" in client_tags:
+            return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
 @api_router.get("/continent-stats")
-async def get_continent_stats(current_user: User = Depends(get_current_user)):
+async def get_continent_stats(request: Request, response: Response, current_user: User = Depends(get_current_user)):
     """
     Get dynamic statistics for all continents.
     Returns landmark counts, total points, and country counts for each continent.
     This endpoint provides real-time data to keep continent cards in sync with database.
     """
-    # Aggregate landmark stats by continent
-    pipeline = [
-        {
-            "$group": {
-                "_id": "$continent",
-                "total_landmarks": {"$sum": 1},
-                "total_points": {"$sum": "$points"},
-                "countries": {"$addToSet": "$country_name"}
-            }
-        },
-        {
-            "$project": {
-                "_id": 0,
-                "continent": "$_id",
-                "landmarks": "$total_landmarks",
-                "points": "$total_points",
-                "countries": {"$size": "$countries"}
-            }
-        },
-        {"$sort": {"continent": 1}}
-    ]
+    catalog = await catalog_store.get(db)
     
-    stats = await db.landmarks.aggregate(pipeline).to_list(10)
+    # Depends on the catalog and on this user's visits
+    etag = catalog_etag("continent-stats", catalog.version, current_user.user_id, current_user.visits_version)
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
     
-    # Get user's visited landmarks by continent for progress
-    user_visits = await db.visits.find(
-        {"user_id": current_user.user_id},
-        {"landmark_id": 1}
-    ).to_list(10000)
-    visited_landmark_ids = [v["landmark_id"] for v in user_visits]
-    
-    # Get visited landmarks by continent AND count visited countries
-    visited_by_continent = {}
-    if visited_landmark_ids:
-        # Get visited landmarks with their country info
-        visited_landmarks = await db.landmarks.find(
-            {"landmark_id": {"$in": visited_landmark_ids}},
-            {"continent": 1, "country_name": 1, "points": 1}
-        ).to_list(10000)
-        
-        # Group by continent
-        for landmark in visited_landmarks:
-            continent = landmark.get("continent")
-            if continent not in visited_by_continent:
-                visited_by_continent[continent] = {
-                    "visited_count": 0,
-                    "visited_points": 0,
-                    "visited_countries": set()
-                }
-            visited_by_continent[continent]["visited_count"] += 1
-            visited_by_continent[continent]["visited_points"] += landmark.get("points", 0)
-            visited_by_continent[continent]["visited_countries"].add(landmark.get("country_name"))
+    # Per-continent totals are precomputed once per catalog version
+    stats = catalog.summary.continents
+    
+    # Visited landmarks, points and countries per continent from the user's progress document
+    progress = await get_user_progress(db, current_user.user_id)
+    visited_by_country = progress.get("countries") or {}
     
-    # Combine stats with user progress
     result = []
     for stat in stats:
         continent = stat["continent"]
-        visited_data = visited_by_continent.get(continent, {})
-        visited_landmarks_count = visited_data.get("visited_count", 0) if visited_data else 0
-        visited_countries_count = len(visited_data.get("visited_countries", set())) if visited_data else 0
+        visited_countries_count = sum(
+            1 for country_id in catalog.countries_by_continent.get(continent, ())
+            if visited_by_country.get(country_id)
+        )
         
         result.append({
             "continent": continent,
             "total_landmarks": stat["landmarks"],
             "total_points": stat["points"],
             "countries": stat["countries"],
-            "visited_landmarks": visited_landmarks_count,
+            "visited_landmarks": (progress.get("continents") or {}).get(continent, 0),
             "visited_countries": visited_countries_count,
-            "visited_points": visited_data.get("visited_points", 0) if visited_data else 0,
+            "visited_points": (progress.get("continent_points") or {}).get(continent, 0),
             "progress_percent": round((visited_countries_count / stat["countries"]) * 100, 1) if stat["countries"] > 0 else 0
         })
     
     return {
         "continents": result,
-        "grand_total": {
-            "landmarks": sum(s["landmarks"] for s in stats),
-            "points": sum(s["points"] for s in stats),
-            "countries": sum(s["countries"] for s in stats)
-        }
+        "grand_total": dict(catalog.summary.grand_total)
     }
 
 @api_router.get("/countries", response_model=List[Country])
-async def get_countries(current_user: User = Depends(get_current_user)):
-    countries = await db.countries.find({}, {"_id": 0}).to_list(1000)
-    
-    # Count ALL landmarks for each country and calculate total available points
-    for country in countries:
-        # Get all landmarks for this country
-        landmarks = await db.landmarks.find(
-            {"country_id": country["country_id"]}, 
-            {"category": 1, "points": 1}
-        ).to_list(1000)
-        
-        country["landmark_count"] = len(landmarks)
-        
-        # Calculate total available points (official=10pts, premium=25pts)
-        total_points = sum(lm.get("points", 10) for lm in landmarks)
-        country["total_points"] = total_points
-    
-    return [Country(**c) for c in countries]
+async def get_countries(request: Request, response: Response, current_user: User = Depends(get_current_user)):
+    catalog = await catalog_store.get(db)
+    
+    etag = catalog_etag("countries", catalog.version)
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+    
+    # landmark_count / total_points are precomputed once per catalog version,
+    # and the serialized/compressed body is cached per version as well
+    return await catalog_payloads.respond(
+        request, catalog.version, etag,
+        lambda: [Country(**c) for c in catalog.summary.countries],
+        headers=response.headers
+    )
 
 @api_router.get("/landmarks", response_model=List[Landmark])
 async def get_landmarks(
+    request: Request,
+    response: Response,
     country_id: Optional[str] = None,
     continent: Optional[str] = None,
     category: Optional[str] = None,
@@ -1219,6 +1262,7 @@ async def get_landmarks(
     sort_by: Optional[str] = "upvotes_desc",  # upvotes_desc, points_desc, points_asc, name_asc, name_desc
     min_points: Optional[int] = None,
     max_points: Optional[int] = None,
+    skip: int = 0,
     limit: int = 1000,
     current_user: User = Depends(get_current_user)
 ):
@@ -1233,108 +1277,210 @@ async def get_landmarks(
     - visited: Filter by visit status ("true"/"false"/None)
     - sort_by: Sort order (upvotes_desc, points_desc, points_asc, name_asc, name_desc)
     - min_points, max_points: Filter by points range
-    - limit: Maximum results
+    - skip, limit: Page through the sorted results
     """
     
-    # Build query
-    query = {}
-    
-    if country_id:
-        query["country_id"] = country_id
-    
-    if continent:
-        query["continent"] = continent
-    
-    if category:
-        query["category"] = category
-    
-    # Text search
-    if search:
-        query["$or"] = [
-            {"name": {"$regex": search, "$options": "i"}},
-            {"description": {"$regex": search, "$options": "i"}},
-            {"country_name": {"$regex": search, "$options": "i"}}
-        ]
-    
-    # Points range filter
-    if min_points is not None or max_points is not None:
-        query["points"] = {}
-        if min_points is not None:
-            query["points"]["$gte"] = min_points
-        if max_points is not None:
-            query["points"]["$lte"] = max_points
+    catalog = await catalog_store.get(db)
+    
+    # The response depends on the catalog, the query, the tier (is_locked) and,
+    # when filtering by visited status, on this user's visits
+    etag_parts = ["landmarks", catalog.version, current_user.subscription_tier, sorted(request.query_params.multi_items())]
+    if visited in ("true", "false"):
+        etag_parts += [current_user.user_id, current_user.visits_version]
+    etag = catalog_etag(*etag_parts)
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+    
+    # Pre-sorted per catalog version (official first, then sort_by); the
+    # country partition is used directly when filtering by country
+    candidates = catalog.ordered_landmarks(sort_by, country_id)
+    
+    # Text search in name, country_name and description (plain text, accent-insensitive)
+    search_matches = catalog.search_index.matching_ids(search) if search else None
+    
+    # Visited / unvisited filter: membership tests against the user's visited
+    # bitset (one progress document read, no visit rows)
+    visited_landmark_ids = None
+    if visited in ("true", "false"):
+        visited_landmark_ids = VisitedSet.from_progress(await get_user_progress(db, current_user.user_id), catalog)
+    
+    def matches(landmark: dict) -> bool:
+        if continent and landmark.get("continent") != continent:
+            return False
+        if category and landmark.get("category") != category:
+            return False
+        if search_matches is not None and landmark["landmark_id"] not in search_matches:
+            return False
+        # Points range filter
+        if min_points is not None or max_points is not None:
+            points = landmark.get("points")
+            if points is None:
+                return False
+            if min_points is not None and points < min_points:
+                return False
+            if max_points is not None and points > max_points:
+                return False
+        if visited_landmark_ids is not None:
+            is_visited = landmark["landmark_id"] in visited_landmark_ids
+            if is_visited != (visited == "true"):
+                return False
+        return True
+    
+    def page() -> List[Landmark]:
+        # Walk the sorted candidates and stop as soon as the page is full
+        results = []
+        skipped = 0
+        for landmark in candidates:
+            if len(results) >= limit:
+                break
+            if not matches(landmark):
+                continue
+            if skipped < skip:
+                skipped += 1
+                continue
+            landmark_dict = dict(landmark)
+            # Add locked status for premium landmarks if user is free tier
+            landmark_dict["is_locked"] = current_user.subscription_tier == "free" and landmark_dict.get("category") == "premium"
+            results.append(Landmark(**landmark_dict))
+        return results
+    
+    if visited_landmark_ids is not None:
+        # Per-user variant: not shared, compressed on the fly by GZipMiddleware
+        return page()
+    
+    # Shared variant: serialized and compressed once per catalog version
+    return await catalog_payloads.respond(request, catalog.version, etag, page, headers=response.headers)
+
+def _nearby_results(catalog, lat: float, lng: float, radius_km: float, limit: int, current_user: User, exclude_id: str = None):
+    results = []
+    for landmark, distance in catalog.geo_index.nearby(lat, lng, radius_km, limit=limit, exclude_id=exclude_id):
+        landmark_dict = dict(landmark)
+        landmark_dict["is_locked"] = current_user.subscription_tier == "free" and landmark_dict.get("category") == "premium"
+        landmark_dict["distance_km"] = round(distance, 2)
+        results.append(landmark_dict)
+    return results
+
+@api_router.get("/landmarks/nearby")
+async def get_nearby_landmarks(
+    lat: float,
+    lng: float,
+    radius_km: float = 50,
+    limit: int = 20,
+    current_user: User = Depends(get_current_user)
+):
+    """Landmarks within radius_km of a point, closest first (each result includes distance_km)"""
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise HTTPException(status_code=400, detail="Invalid coordinates")
+    if radius_km <= 0 or radius_km > MAX_NEARBY_RADIUS_KM:
+        raise HTTPException(status_code=400, detail=f"radius_km must be between 0 and {MAX_NEARBY_RADIUS_KM}")
     
-    # Fetch landmarks
-    landmarks = await db.landmarks.find(query, {"_id": 0}).to_list(limit)
+    catalog = await catalog_store.get(db)
+    return _nearby_results(catalog, lat, lng, radius_km, min(max(limit, 0), 100), current_user)
+
+@api_router.get("/landmarks/trending")
+async def get_trending_landmarks(
+    continent: Optional[str] = None,
+    limit: int = 20,
+    current_user: User = Depends(get_current_user)
+):
+    """Landmarks with the most recent visits and upvotes (decayed, 7-day half-life), best first"""
+    limit = min(max(limit, 1), 100)
+    catalog = await catalog_store.get(db)
     
-    # If filtering by visited status, get user's visits
-    if visited is not None:
-        user_visits = await db.visits.find(
-            {"user_id": current_user.user_id},
-            {"landmark_id": 1, "_id": 0}
-        ).to_list(10000)
-        visited_landmark_ids = {v["landmark_id"] for v in user_visits}
-        
-        if visited == "true":
-            # Only visited landmarks
-            landmarks = [l for l in landmarks if l["landmark_id"] in visited_landmark_ids]
-        elif visited == "false":
-            # Only unvisited landmarks
-            landmarks = [l for l in landmarks if l["landmark_id"] not in visited_landmark_ids]
-    
-    # Add locked status for premium landmarks if user is free tier
     results = []
-    for l in landmarks:
-        landmark_dict = dict(l)
-        if current_user.subscription_tier == "free" and landmark_dict.get("category") == "premium":
-            landmark_dict["is_locked"] = True
-        else:
-            landmark_dict["is_locked"] = False
+    for entry in await top_trending(db, continent, limit):
+        landmark = catalog.landmarks_by_id.get(entry["landmark_id"])
+        if not landmark:
+            continue
+        landmark_dict = dict(landmark)
+        landmark_dict["is_locked"] = current_user.subscription_tier == "free" and landmark_dict.get("category") == "premium"
+        landmark_dict["trending_score"] = round(entry["trending_score"], 3)
         results.append(landmark_dict)
+    return results
+
+@api_router.get("/landmarks/{landmark_id}/nearby")
+async def get_related_landmarks(
+    landmark_id: str,
+    radius_km: float = 100,
+    limit: int = 10,
+    current_user: User = Depends(get_current_user)
+):
+    """Other landmarks close to this one, closest first"""
+    if radius_km <= 0 or radius_km > MAX_NEARBY_RADIUS_KM:
+        raise HTTPException(status_code=400, detail=f"radius_km must be between 0 and {MAX_NEARBY_RADIUS_KM}")
     
-    # Sort results - ALWAYS put official landmarks first, then premium
-    # Category sort: official (0) comes before premium (1)
-    def get_category_order(x):
-        return 0 if x.get("category") == "official" else 1
-    
-    if sort_by == "upvotes_desc":
-        results.sort(key=lambda x: (get_category_order(x), -x.get("upvotes", 0)))
-    elif sort_by == "points_desc":
-        results.sort(key=lambda x: (get_category_order(x), -x.get("points", 0)))
-    elif sort_by == "points_asc":
-        results.sort(key=lambda x: (get_category_order(x), x.get("points", 0)))
-    elif sort_by == "name_asc":
-        results.sort(key=lambda x: (get_category_order(x), x.get("name", "")))
-    elif sort_by == "name_desc":
-        results.sort(key=lambda x: (get_category_order(x), x.get("name", "")[::-1]))
-    else:
-        # Default sort: official first, then by name
-        results.sort(key=lambda x: (get_category_order(x), x.get("name", "")))
+    catalog = await catalog_store.get(db)
+    landmark = catalog.landmarks_by_id.get(landmark_id)
+    if not landmark:
+        raise HTTPException(status_code=404, detail="Landmark not found")
+    if landmark.get("latitude") is None or landmark.get("longitude") is None:
+        return []
     
-    return [Landmark(**r) for r in results]
+    return _nearby_results(
+        catalog, landmark["latitude"], landmark["longitude"], radius_km,
+        min(max(limit, 0), 100), current_user, exclude_id=landmark_id
+    )
 
 @api_router.get("/landmarks/{landmark_id}", response_model=Landmark)
-async def get_landmark(landmark_id: str, current_user: User = Depends(get_current_user)):
-    landmark = await db.landmarks.find_one({"landmark_id": landmark_id}, {"_id": 0})
+async def get_landmark(landmark_id: str, request: Request, response: Response, current_user: User = Depends(get_current_user)):
+    catalog = await catalog_store.get(db)
+    
+    landmark = catalog.landmarks_by_id.get(landmark_id)
     if not landmark:
         raise HTTPException(status_code=404, detail="Landmark not found")
-    return Landmark(**landmark)
+    
+    # Live upvote count, not the catalog's (published periodically); both are
+    # in memory, so a 304 never touches the database
+    upvotes = live_upvotes.get(landmark)
+    etag = catalog_etag("landmark", catalog.version, landmark_id, upvotes)
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+    
+    return await catalog_payloads.respond(
+        request, catalog.version, etag, lambda: Landmark(**{**landmark, "upvotes": upvotes}), headers=response.headers
+    )
+
+@api_router.get("/landmarks/{landmark_id}/visitors", response_model=LandmarkVisitors)
+async def get_landmark_visitors(landmark_id: str, current_user: User = Depends(get_current_user)):
+    """Visitor count of a landmark and which of the caller's friends visited it"""
+    catalog = await catalog_store.get(db)
+    if landmark_id not in catalog.landmarks_by_id:
+        raise HTTPException(status_code=404, detail="Landmark not found")
+    
+    # Visitor count is maintained by add_visit; friend visitors come from the
+    # landmark_visitors (landmark_id, user_id) index, one query for all friends
+    stats = await db.landmark_stats.find_one({"landmark_id": landmark_id}, {"visitor_count": 1, "_id": 0})
+    friend_visitor_ids = await friends_who_visited(db, landmark_id, await get_friend_ids(current_user.user_id))
+    
+    listed_ids = friend_visitor_ids[:MAX_FRIENDS_LISTED]
+    friends = await db.users.find(
+        {"user_id": {"$in": listed_ids}},
+        {"user_id": 1, "name": 1, "username": 1, "picture": 1, "_id": 0}
+    ).to_list(len(listed_ids))
+    friends_by_id = {f["user_id"]: f for f in friends}
+    
+    return LandmarkVisitors(
+        visitor_count=(stats or {}).get("visitor_count", 0),
+        friends_visited_count=len(friend_visitor_ids),
+        friends_visited=[FriendVisitor(**friends_by_id[i]) for i in listed_ids if i in friends_by_id]
+    )
 
 @api_router.get("/landmarks/search/query")
 async def search_landmarks(q: str, limit: int = 50, current_user: User = Depends(get_current_user)):
-    """Search landmarks by name across all countries"""
+    """Search landmarks across all countries, best matches first"""
     if not q or len(q.strip()) < 2:
         return []
     
-    # Search by name (case-insensitive, partial match)
-    landmarks = await db.landmarks.find(
-        {
-            "name": {"$regex": q, "$options": "i"}
-        },
-        {"_id": 0}
-    ).limit(limit).to_list(limit)
-    
-    return landmarks
+    catalog = await catalog_store.get(db)
+    return [landmark for landmark, _ in catalog.search_index.search(q, limit=limit)]
+
+@api_router.get("/landmarks/search/autocomplete")
+async def autocomplete_landmarks(q: str, limit: int = 10, current_user: User = Depends(get_current_user)):
+    """Typeahead suggestions (landmarks and countries) for the search box, most popular first"""
+    catalog = await catalog_store.get(db)
+    return catalog.autocomplete_index.suggest(q, limit=min(max(limit, 0), 50))
 
 @api_router.post("/landmarks", response_model=Landmark)
 async def create_landmark(data: LandmarkCreate, current_user: User = Depends(get_current_user)):
@@ -1363,36 +1509,89 @@ async def create_landmark(data: LandmarkCreate, current_user: User = Depends(get
     }
     
     await db.landmarks.insert_one(landmark)
+    await catalog_store.apply_landmark(db, landmark)
     return Landmark(**landmark)
 
 @api_router.post("/landmarks/{landmark_id}/upvote")
 async def upvote_landmark(landmark_id: str, current_user: User = Depends(get_current_user)):
-    # Check if already upvoted
-    existing = await db.landmark_upvotes.find_one({
-        "landmark_id": landmark_id,
-        "user_id": current_user.user_id
-    })
+    """
+    Toggle the user's upvote. The upvote itself is written atomically; the
+    landmark's live `upvotes` count is buffered and flushed in the background.
+    """
+    catalog = await catalog_store.get(db)
+    landmark = catalog.landmarks_by_id.get(landmark_id)
+    if not landmark:
+        raise HTTPException(status_code=404, detail="Landmark not found")
     
-    if existing:
-        # Remove upvote
-        await db.landmark_upvotes.delete_one({"_id": existing["_id"]})
-        await db.landmarks.update_one(
-            {"landmark_id": landmark_id},
-            {"$inc": {"upvotes": -1}}
-        )
-        return {"upvoted": False}
-    else:
-        # Add upvote
-        await db.landmark_upvotes.insert_one({
-            "landmark_id": landmark_id,
-            "user_id": current_user.user_id,
-            "created_at": datetime.now(timezone.utc)
-        })
-        await db.landmarks.update_one(
-            {"landmark_id": landmark_id},
-            {"$inc": {"upvotes": 1}}
-        )
-        return {"upvoted": True}
+    upvoted, first_time = await toggle_upvote(db, landmark_id, current_user.user_id)
+    upvote_counter.add(landmark_id, 1 if upvoted else -1)
+    # Only a user's first upvote counts towards trending, so toggling can't farm it
+    if first_time:
+        await record_trending_event(db, landmark, UPVOTE_WEIGHT)
+    return {
+        "upvoted": upvoted,
+        "upvotes": live_upvotes.get(landmark) + upvote_counter.pending(landmark_id)
+    }
+
+# ============= CATALOG SYNC ENDPOINTS =============
+
+@api_router.get("/catalog/sync")
+async def sync_catalog(
+    request: Request,
+    response: Response,
+    since_version: Optional[int] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Offline catalog sync. Pass the `version` from the previous sync to get only
+    the countries/landmarks changed since then plus the ids deleted since then;
+    omit it (first launch) to get the full catalog bundle (`full: true`).
+    """
+    catalog = await catalog_store.get(db)
+    since = since_version or 0
+    
+    etag = catalog_etag("catalog-sync", catalog.version, since)
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+    
+    return await catalog_payloads.respond(
+        request, catalog.version, etag,
+        lambda: catalog.changes_since(since),
+        headers=response.headers
+    )
+
+# ============= MAP ENDPOINTS =============
+
+@api_router.get("/map/clusters")
+async def get_map_clusters(
+    zoom: int,
+    bbox: Optional[str] = None,  # "min_lng,min_lat,max_lng,max_lat"
+    include_visited: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Landmark clusters for one map zoom level, precomputed per catalog version.
+    Single-landmark clusters carry landmark_id/name; with include_visited=true
+    each cluster also reports how many of its landmarks the user has visited.
+    """
+    try:
+        viewport = parse_bbox(bbox) if bbox else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid bbox: {e}")
+    
+    catalog = await catalog_store.get(db)
+    
+    visited_ids = None
+    if include_visited:
+        visited_ids = VisitedSet.from_progress(await get_user_progress(db, current_user.user_id), catalog)
+    
+    clusters = catalog.map_clusters.clusters(zoom, viewport, visited_ids)
+    return {
+        "zoom": max(MAP_MIN_ZOOM, min(MAP_MAX_ZOOM, zoom)),
+        "catalog_version": catalog.version,
+        "clusters": clusters
+    }
 
 # ============= VISIT ENDPOINTS =============
 
@@ -1457,9 +1656,16 @@ async def get_visit_details(visit_id: str, current_user: User = Depends(get_curr
         "username": user.get("username") if user else None
     }
 
+# Post-visit side effects queued by add_visit (run_visit_effects). Queued
+# before the visit is written and released once it is: a request that dies
+# in between leaves a job that runs after the grace period anyway.
+VISIT_EFFECTS_JOB = "visit_effects"
+VISIT_EFFECTS_GRACE = timedelta(minutes=5)
+
 @api_router.post("/visits", response_model=Visit)
 async def add_visit(data: VisitCreate, current_user: User = Depends(get_current_user)):
-    landmark = await db.landmarks.find_one({"landmark_id": data.landmark_id}, {"_id": 0})
+    catalog = await catalog_store.get(db)
+    landmark = catalog.landmarks_by_id.get(data.landmark_id)
     if not landmark:
         raise HTTPException(status_code=404, detail="Landmark not found")
     
@@ -1515,148 +1721,68 @@ async def add_visit(data: VisitCreate, current_user: User = Depends(get_current_
         "verified": is_verified,
         "visibility": visibility,  # Privacy setting
         "visited_at": data.visited_at if data.visited_at else datetime.now(timezone.utc),
-        "created_at": datetime.now(timezone.utc)
+        "created_at": datetime.now(timezone.utc),
+        COUNTED_FIELD: True  # Counted below by record_visit_progress, never by a progress backfill
     }
     
-    await db.visits.insert_one(visit)
-    
-    # Update user streak
-    from datetime import date
-    today = date.today().isoformat()  # YYYY-MM-DD format
-    
-    user_doc = await db.users.find_one({"user_id": current_user.user_id})
-    last_visit_date = user_doc.get("last_visit_date")
-    current_streak = user_doc.get("current_streak", 0)
-    longest_streak = user_doc.get("longest_streak", 0)
-    
-    streak_continued = False
-    streak_milestone_reached = False
-    new_milestone = 0
-    
-    if last_visit_date:
-        from datetime import datetime as dt, timedelta
-        last_date_obj = dt.fromisoformat(last_visit_date).date()
-        today_obj = dt.fromisoformat(today).date()
-        days_diff = (today_obj - last_date_obj).days
-        
-        if days_diff == 0:
-            # Same day visit - don't change streak
-            pass
-        elif days_diff == 1:
-            # Consecutive day - increment streak
-            current_streak += 1
-            streak_continued = True
-        else:
-            # Streak broken - reset to 1
-            current_streak = 1
-    else:
-        # First ever visit
-        current_streak = 1
+    # Feed activities and badges run on the job queue: the client does not wait
+    # for them. Results arrive as notifications and through GET /visits/{visit_id}/effects.
+    effects_key = f"{VISIT_EFFECTS_JOB}:{visit_id}"
+    await job_queue.enqueue(db, VISIT_EFFECTS_JOB, {
+        "visit_id": visit_id,
+        "user_id": current_user.user_id,
+        "user_name": current_user.name,
+        "user_picture": current_user.picture,
+        "landmark_id": data.landmark_id,
+        "visited_at": visit["created_at"],
+        "has_diary": bool(data.diary_notes),
+        "has_tips": len(travel_tips) > 0,
+        "photo_count": len(photos),
+        "visibility": visibility,
+    }, key=effects_key, delay=VISIT_EFFECTS_GRACE)
     
-    # Update longest streak if current exceeds it
-    if current_streak > longest_streak:
-        longest_streak = current_streak
+    await db.visits.insert_one(visit)
+    new_visitor, first_visit = await record_visitor(
+        db, data.landmark_id, current_user.user_id, visibility, visit["visited_at"]
+    )
+    # Distinct-landmark counters vs. the catalog's per-country totals (one round trip)
+    progress, outcome = await record_visit_progress(db, current_user.user_id, landmark, first_visit)
     
-    # Check for streak milestones (7, 30, 100 days)
-    streak_milestones = [7, 30, 100]
-    if streak_continued and current_streak in streak_milestones:
-        streak_milestone_reached = True
-        new_milestone = current_streak
+    country_id = landmark.get("country_id")
+    country = catalog.countries_by_id.get(country_id) or {}
+    continent = country.get("continent") or landmark.get("continent")
     
-    # Update user document with new streak data AND award points
     # Points are always awarded to personal total
     # Leaderboard points only awarded if visit has photos (verified)
     landmark_points = landmark.get("points", 10)
     has_photos = bool(data.photo_base64 or len(photos) > 0)
     
-    update_fields = {
-        "current_streak": current_streak,
-        "longest_streak": longest_streak,
-        "last_visit_date": today
-    }
-    
-    # Always increment personal points
-    increment_fields = {"points": landmark_points}
-    
-    # Only increment leaderboard_points if visit has photos
+    # Always increment personal points (visits_version invalidates per-user ETags)
+    increment_fields = {"points": landmark_points, "visits_version": 1}
     if has_photos:
         increment_fields["leaderboard_points"] = landmark_points
     
-    await db.users.update_one(
-        {"user_id": current_user.user_id},
-        {
-            "$set": update_fields,
-            "$inc": increment_fields
-        }
-    )
-    
-    # Create rich activity for social feed (includes diary, tips, photos)
-    activity_id = f"activity_{uuid.uuid4().hex[:12]}"
-    activity = {
-        "activity_id": activity_id,
-        "user_id": current_user.user_id,
-        "user_name": current_user.name,
-        "user_picture": current_user.picture,
-        "activity_type": "visit",
-        "landmark_id": data.landmark_id,
-        "landmark_name": landmark.get("name"),
-        "landmark_image": landmark.get("image_url"),
-        "country_name": landmark.get("country_name"),
-        "points_earned": landmark.get("points", 10),
-        "visit_id": visit_id,  # Link to full visit details
-        "has_diary": bool(data.diary_notes),
-        "has_tips": len(travel_tips) > 0,
-        "has_photos": len(photos) > 0,
-        "photo_count": len(photos),
-        "visibility": data.visibility or current_user.default_privacy or "public",  # Privacy setting
-        "created_at": datetime.now(timezone.utc),
-        "likes_count": 0,
-        "comments_count": 0
-    }
-    
-    await db.activities.insert_one(activity)
-    
-
     # AUTO-REWARD: Award country points on first landmark visit
-    country_id = landmark.get("country_id")
-    if country_id:
-        # Check if this is first visit to this country
-        country_visit_count = await db.visits.count_documents({
-            "user_id": current_user.user_id,
-            "landmark_id": {"$regex": f"^{country_id}_"}
-        })
+    country_bonus_points = FIRST_IN_COUNTRY_BONUS
+    country_visit_created = False
+    if outcome["first_in_country"]:
+        # Country bonus: only award leaderboard points if visit has photos
+        increment_fields["points"] += country_bonus_points
+        if has_photos:
+            increment_fields["leaderboard_points"] += country_bonus_points
         
-        if country_visit_count == 1:  # First landmark in this country
-            # Award country exploration bonus
-            country_bonus_points = 20
-            # Country bonus: only award leaderboard points if visit has photos
-            bonus_increment = {"points": country_bonus_points}
-            if has_photos:
-                bonus_increment["leaderboard_points"] = country_bonus_points
-            
-            await db.users.update_one(
-                {"user_id": current_user.user_id},
-                {"$inc": bonus_increment}
-            )
-            
-            # AUTO-CREATE country visit record (if doesn't exist)
-            existing_country_visit = await db.country_visits.find_one({
-                "user_id": current_user.user_id,
-                "country_id": country_id
-            })
-            
-            if not existing_country_visit:
-                country_doc = await db.countries.find_one({"country_id": country_id})
-                if country_doc:
-                    auto_country_visit_id = f"cv_{uuid.uuid4().hex[:12]}"
-                    auto_country_visit = {
-                        "country_visit_id": auto_country_visit_id,
-                        "user_id": current_user.user_id,
+        # AUTO-CREATE country visit record (if doesn't exist); the unique
+        # (user_id, country_id) index lets exactly one request create it
+        if country:
+            try:
+                result = await db.country_visits.update_one(
+                    {"user_id": current_user.user_id, "country_id": country_id},
+                    {"$setOnInsert": {
+                        "country_visit_id": f"cv_{uuid.uuid4().hex[:12]}",
                         "user_name": current_user.name,
                         "user_picture": current_user.picture,
-                        "country_id": country_id,
-                        "country_name": country_doc.get("name", "Unknown"),
-                        "continent": country_doc.get("continent", "Unknown"),
+                        "country_name": country.get("name", "Unknown"),
+                        "continent": country.get("continent", "Unknown"),
                         "photos": photos if has_photos else [],  # Include photos if present
                         "diary": None,
                         "visibility": "public",
@@ -1667,170 +1793,198 @@ async def add_visit(data: VisitCreate, current_user: User = Depends(get_current_
                         "first_landmark_id": data.landmark_id,
                         "first_landmark_name": landmark.get("name"),
                         "created_at": datetime.now(timezone.utc)
-                    }
-                    await db.country_visits.insert_one(auto_country_visit)
-            
-            # Check continent for auto-reward
-            country_doc = await db.countries.find_one({"country_id": country_id})
-            if country_doc:
-                continent = country_doc.get("continent")
-                # Check if this is first country in this continent
-                continent_country_count = await db.countries.count_documents({
-                    "continent": continent
-                })
-                user_continent_visits = 0
-                continent_countries = await db.countries.find({"continent": continent}).to_list(1000)
-                for cont_country in continent_countries:
-                    count = await db.visits.count_documents({
-                        "user_id": current_user.user_id,
-                        "landmark_id": {"$regex": f"^{cont_country['country_id']}_"}
-                    })
-                    if count > 0:
-                        user_continent_visits += 1
-                
-                if user_continent_visits == 1:  # First country in this continent
-                    continent_bonus_points = 50
-                    await db.users.update_one(
-                        {"user_id": current_user.user_id},
-                        {"$inc": {"points": continent_bonus_points}}
-                    )
-
-    # Track completion bonuses
-    country_completed = False
-    continent_completed = False
-    completed_country_name = None
-    completed_continent = None
-    
-    # Check for country completion bonus
-    country_id = landmark.get("country_id")
-    if country_id:
-        # Get total landmarks in this country
-        total_landmarks_in_country = await db.landmarks.count_documents({"country_id": country_id})
-        # Get user's visits in this country
-        user_visits_in_country = await db.visits.count_documents({
-            "user_id": current_user.user_id,
-            "landmark_id": {"$in": [
-                lm["landmark_id"] for lm in await db.landmarks.find({"country_id": country_id}).to_list(1000)
-            ]}
-        })
+                    }},
+                    upsert=True
+                )
+                country_visit_created = result.upserted_id is not None
+            except DuplicateKeyError:
+                # A concurrent request (or a manual country visit) created it first
+                country_visit_created = False
+            if country_visit_created:
+                await record_country_visit(db, current_user.user_id, country_id)
         
-        # If user just completed the country
-        if user_visits_in_country == total_landmarks_in_country:
-            country_completion_bonus = 50  # Bonus points for completing a country
-            country_completed = True
-            completed_country_name = landmark.get("country_name")
-            
-            # Award bonus points to user
-            await db.users.update_one(
-                {"user_id": current_user.user_id},
-                {"$inc": {"points": country_completion_bonus}}
-            )
-            
-            # Create country completion activity
-            country_completion_activity_id = f"activity_{uuid.uuid4().hex[:12]}"
-            country_completion_activity = {
-                "activity_id": country_completion_activity_id,
-                "user_id": current_user.user_id,
-                "user_name": current_user.name,
-                "user_picture": current_user.picture,
-                "activity_type": "country_complete",
-                "country_id": country_id,
-                "country_name": landmark.get("country_name"),
-                "continent": landmark.get("continent"),
-                "points_earned": country_completion_bonus,
-                "landmarks_count": total_landmarks_in_country,
-                "created_at": datetime.now(timezone.utc),
-                "likes_count": 0,
-                "comments_count": 0
-            }
-            await db.activities.insert_one(country_completion_activity)
-            
-            # Check for continent completion bonus
-            continent = landmark.get("continent")
-            if continent:
-                # Get all countries in this continent
-                countries_in_continent = await db.countries.find({"continent": continent}).to_list(1000)
-                country_ids_in_continent = [c["country_id"] for c in countries_in_continent]
-                
-                # Check if user completed all countries in this continent
-                completed_countries = 0
-                for cid in country_ids_in_continent:
-                    total_landmarks = await db.landmarks.count_documents({"country_id": cid})
-                    user_visits = await db.visits.count_documents({
-                        "user_id": current_user.user_id,
-                        "landmark_id": {"$in": [
-                            lm["landmark_id"] for lm in await db.landmarks.find({"country_id": cid}).to_list(1000)
-                        ]}
-                    })
-                    if user_visits == total_landmarks:
-                        completed_countries += 1
-                
-                # If user just completed the continent
-                if completed_countries == len(country_ids_in_continent):
-                    continent_completion_bonus = 200  # Bonus points for completing a continent
-                    continent_completed = True
-                    completed_continent = continent
-                    
-                    # Award bonus points to user
-                    await db.users.update_one(
-                        {"user_id": current_user.user_id},
-                        {"$inc": {"points": continent_completion_bonus}}
-                    )
-                    
-                    # Create continent completion activity
-                    continent_completion_activity_id = f"activity_{uuid.uuid4().hex[:12]}"
-                    continent_completion_activity = {
-                        "activity_id": continent_completion_activity_id,
-                        "user_id": current_user.user_id,
-                        "user_name": current_user.name,
-                        "user_picture": current_user.picture,
-                        "activity_type": "continent_complete",
-                        "continent": continent,
-                        "points_earned": continent_completion_bonus,
-                        "countries_count": len(country_ids_in_continent),
-                        "created_at": datetime.now(timezone.utc),
-                        "likes_count": 0,
-                        "comments_count": 0
-                    }
-                    await db.activities.insert_one(continent_completion_activity)
-    
-    # Check for milestones and create activity if reached
-    # Milestones adjusted for 520 total landmarks
-    visit_count = await db.visits.count_documents({"user_id": current_user.user_id})
-    if visit_count in [10, 25, 50, 100, 200, 350, 500]:
-        milestone_activity_id = f"activity_{uuid.uuid4().hex[:12]}"
-        milestone_activity = {
-            "activity_id": milestone_activity_id,
-            "user_id": current_user.user_id,
-            "user_name": current_user.name,
-            "user_picture": current_user.picture,
-            "activity_type": "milestone",
-            "milestone_count": visit_count,
-            "created_at": datetime.now(timezone.utc),
-            "likes_count": 0,
-            "comments_count": 0
-        }
-        await db.activities.insert_one(milestone_activity)
+        # First country in this continent
+        if outcome["first_in_continent"]:
+            increment_fields["points"] += FIRST_IN_CONTINENT_BONUS
+    
+    # Completion bonuses
+    country_completed = outcome["country_completed"]
+    continent_completed = outcome["continent_completed"]
+    if country_completed:
+        increment_fields["points"] += COUNTRY_COMPLETION_BONUS
+    if continent_completed:
+        increment_fields["points"] += CONTINENT_COMPLETION_BONUS
     
-    # Check and award badges
-    newly_awarded_badges = await check_and_award_badges(current_user.user_id)
+    # Streak, points and every bonus in one conditional write (retried if a
+    # concurrent visit moved the streak first)
+    user_doc, streak = await advance_streak(db, current_user.user_id, increment_fields)
+    current_streak = streak["current_streak"]
+    new_milestone = streak["milestone"]
     
-    # Create visit response with badge info and completion flags
+    await record_trending_event(
+        db, landmark, VISIT_WEIGHT, visit["visited_at"],
+        counters={"visitor_count": 1} if new_visitor else None
+    )
+    await record_rollup(
+        db, current_user.user_id, country_id, continent,
+        points=increment_fields["points"],  # Same total as the user's points, bonuses included
+        landmarks=1 if first_visit else 0,
+        countries=1 if country_visit_created else 0
+    )
+    
+    # The visit and its points are committed: run its effects now
+    await job_queue.release(db, effects_key, {
+        "visit_count": outcome["visit_count"],
+        "country_completed": country_completed,
+        "continent_completed": continent_completed,
+        "continent": continent,
+    })
+    
+    # Create visit response with completion flags
     visit_response = Visit(**visit)
     visit_dict = visit_response.dict()
-    visit_dict["newly_awarded_badges"] = newly_awarded_badges
     visit_dict["country_completed"] = country_completed
     visit_dict["continent_completed"] = continent_completed
     visit_dict["current_streak"] = current_streak
-    visit_dict["streak_milestone_reached"] = streak_milestone_reached
-    visit_dict["new_milestone"] = new_milestone if streak_milestone_reached else 0
+    visit_dict["streak_milestone_reached"] = bool(new_milestone)
+    visit_dict["new_milestone"] = new_milestone
     if country_completed:
-        visit_dict["completed_country_name"] = completed_country_name
+        visit_dict["completed_country_name"] = landmark.get("country_name")
     if continent_completed:
-        visit_dict["completed_continent"] = completed_continent
+        visit_dict["completed_continent"] = continent
     
     return visit_dict
 
+def _effect_id(prefix: str, visit_id: str, effect: str) -> str:
+    """Same id on every run of a visit's job, so a retry cannot write a document twice"""
+    return f"{prefix}_{uuid.uuid5(uuid.NAMESPACE_URL, f'{visit_id}/{effect}').hex[:12]}"
+
+@job_queue.handler(VISIT_EFFECTS_JOB)
+async def run_visit_effects(job: dict) -> dict:
+    """Feed activities, badges and badge notifications for one visit.
+    
+    Runs at least once: activities and notifications have fixed ids and
+    badges are unique per user and type, so a re-run writes nothing new.
+    """
+    payload = job["payload"]
+    visit_id, user_id = payload["visit_id"], payload["user_id"]
+    if "visit_count" not in payload:
+        # Never released: add_visit failed after queueing it. The visit may not exist,
+        # and what it completed is unknown (no completion or milestone activities)
+        if not await db.visits.find_one({"visit_id": visit_id}, {"_id": 1}):
+            return {"newly_awarded_badges": [], "visit_saved": False}
+    catalog = await catalog_store.get(db)
+    landmark = catalog.landmarks_by_id.get(payload["landmark_id"]) or {}
+    country_id = landmark.get("country_id")
+    continent = payload.get("continent")
+    author = {"user_id": user_id, "user_name": payload["user_name"], "user_picture": payload["user_picture"]}
+    social = {"created_at": payload["visited_at"], "likes_count": 0, "comments_count": 0}
+    
+    # Feed activities: the visit (with diary, tips, photos), completions and milestones
+    activities = [{
+        "activity_id": _effect_id("activity", visit_id, "visit"),
+        **author,
+        "activity_type": "visit",
+        "landmark_id": payload["landmark_id"],
+        "landmark_name": landmark.get("name"),
+        "landmark_image": landmark.get("image_url"),
+        "country_name": landmark.get("country_name"),
+        "points_earned": landmark.get("points", 10),
+        "visit_id": visit_id,  # Link to full visit details
+        "has_diary": payload["has_diary"],
+        "has_tips": payload["has_tips"],
+        "has_photos": payload["photo_count"] > 0,
+        "photo_count": payload["photo_count"],
+        "visibility": payload["visibility"],  # Privacy setting
+        **social
+    }]
+    if payload.get("country_completed"):
+        activities.append({
+            "activity_id": _effect_id("activity", visit_id, "country_complete"),
+            **author,
+            "activity_type": "country_complete",
+            "country_id": country_id,
+            "country_name": landmark.get("country_name"),
+            "continent": landmark.get("continent"),
+            "points_earned": COUNTRY_COMPLETION_BONUS,
+            "landmarks_count": len(catalog.landmarks_by_country.get(country_id, ())),
+            **social
+        })
+    if payload.get("continent_completed"):
+        activities.append({
+            "activity_id": _effect_id("activity", visit_id, "continent_complete"),
+            **author,
+            "activity_type": "continent_complete",
+            "continent": continent,
+            "points_earned": CONTINENT_COMPLETION_BONUS,
+            "countries_count": len(catalog.countries_by_continent.get(continent, ())),
+            **social
+        })
+    # Milestones adjusted for 520 total landmarks
+    if payload.get("visit_count") in [10, 25, 50, 100, 200, 350, 500]:
+        activities.append({
+            "activity_id": _effect_id("activity", visit_id, "milestone"),
+            **author,
+            "activity_type": "milestone",
+            "milestone_count": payload["visit_count"],
+            **social
+        })
+    try:
+        await db.activities.insert_many(activities, ordered=False)
+    except BulkWriteError as e:
+        # Written by an earlier attempt (unique activity_id)
+        if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+            raise
+    
+    await check_and_award_badges(user_id, awarded_by=visit_id)
+    # This visit's badges, including any an earlier attempt awarded before failing
+    # (a badge a concurrent visit won is that visit's to report)
+    earned = await db.achievements.find(
+        {"user_id": user_id, "awarded_by": visit_id},
+        {"_id": 0, "badge_type": 1, "badge_name": 1, "badge_icon": 1}
+    ).to_list(None)
+    for badge in earned:
+        result = await db.notifications.update_one(
+            {"notification_id": _effect_id("notif", user_id, badge["badge_type"])},
+            {"$setOnInsert": {
+                "user_id": user_id,
+                "type": "achievement",
+                "title": f"Achievement Unlocked! {badge['badge_icon']}",
+                "message": f"You earned: {badge['badge_name']}",
+                "related_id": badge["badge_type"],
+                "related_user_id": None,
+                "related_user_name": None,
+                "is_read": False,
+                "created_at": datetime.now(timezone.utc)
+            }},
+            upsert=True
+        )
+        if result.upserted_id is not None:
+            await notify_achievement(user_id, badge["badge_name"], badge["badge_icon"])
+    
+    return {
+        "newly_awarded_badges": sorted(
+            ({"badge_type": badge["badge_type"], "name": badge["badge_name"], "icon": badge["badge_icon"]}
+             for badge in earned),
+            key=lambda badge: badge["badge_type"]
+        ),
+        "country_completed": payload.get("country_completed", False),
+        "continent_completed": payload.get("continent_completed", False),
+    }
+
+@api_router.get("/visits/{visit_id}/effects")
+async def get_visit_effects(visit_id: str, current_user: User = Depends(get_current_user)):
+    """Outcome of a visit's background side effects (feed activities, badges).
+    
+    status is queued/running until they ran, then done (or failed), with the
+    badges this visit awarded ({badge_type, name, icon}); they are also
+    delivered as notifications.
+    """
+    job = await job_status(db, f"{VISIT_EFFECTS_JOB}:{visit_id}")
+    if not job or job.get("payload", {}).get("user_id") != current_user.user_id:
+        raise HTTPException(status_code=404, detail="Visit not found")
+    return {"status": job["status"], "newly_awarded_badges": [], **(job.get("result") or {})}
+
 # ============= ADMIN ENDPOINTS =============
 
 # Admin Models
@@ -1840,6 +1994,16 @@ class AdminUserUpdate(BaseModel):
     is_banned: Optional[bool] = None
     ban_reason: Optional[str] = None
 
+class CatalogPatch(BaseModel):
+    op: str  # "update", "upsert" or "delete"
+    kind: str  # "landmark" or "country"
+    id: str  # landmark_id / country_id
+    fields: Optional[dict] = None
+
+class CatalogBulkRequest(BaseModel):
+    patches: List[CatalogPatch]
+    dry_run: bool = False
+
 class AdminReportUpdate(BaseModel):
     status: str  # "pending", "reviewed", "resolved", "dismissed"
     admin_notes: Optional[str] = None
@@ -1971,13 +2135,8 @@ async def get_admin_user_detail(user_id: str, admin_user: User = Depends(get_adm
     })
     
     # Get countries visited
-    visits = await db.visits.find({"user_id": user_id}, {"landmark_id": 1}).to_list(10000)
-    landmark_ids = [v["landmark_id"] for v in visits]
-    if landmark_ids:
-        countries = await db.landmarks.distinct("country_name", {"landmark_id": {"$in": landmark_ids}})
-        countries_count = len(countries)
-    else:
-        countries_count = 0
+    progress = await get_user_progress(db, user_id)
+    countries_count = sum(1 for visited in (progress.get("countries") or {}).values() if visited)
     
     # Get recent activity
     recent_visits = await db.visits.find(
@@ -2167,6 +2326,67 @@ async def update_admin_report(
     
     return {"message": "Report updated successfully", "status": update_data.status}
 
+@api_router.post("/admin/catalog/bulk")
+async def bulk_edit_catalog(data: CatalogBulkRequest, admin_user: User = Depends(get_admin_user)):
+    """
+    Apply a batch of landmark/country patches (see catalog_bulk.py) in one
+    bulk write per collection and one catalog version. Nothing is written
+    unless every patch is valid; dry_run=true only validates.
+    """
+    patches = [patch.dict() for patch in data.patches]
+    try:
+        result = await apply_patches(db, patches, dry_run=data.dry_run)
+    except CatalogBatchError as e:
+        raise HTTPException(status_code=400, detail={"message": str(e), "errors": e.errors})
+    except CatalogBatchPartiallyApplied as e:
+        await db.admin_logs.insert_one({
+            "log_id": f"log_{uuid.uuid4().hex[:12]}",
+            "admin_id": admin_user.user_id,
+            "admin_name": admin_user.name,
+            "action": "catalog_bulk_edit_partial",
+            "target_id": f"catalog_v{e.version}",
+            "changes": {"patches": len(patches), "operations": e.operations, "applied": e.applied},
+            "created_at": datetime.now(timezone.utc)
+        })
+        raise HTTPException(status_code=500, detail={
+            "message": str(e), "applied": e.applied, "operations": e.operations, "version": e.version
+        })
+    
+    if not data.dry_run:
+        await db.admin_logs.insert_one({
+            "log_id": f"log_{uuid.uuid4().hex[:12]}",
+            "admin_id": admin_user.user_id,
+            "admin_name": admin_user.name,
+            "action": "catalog_bulk_edit",
+            "target_id": f"catalog_v{result['version']}",
+            "changes": {"patches": len(patches), "operations": result["operations"]},
+            "created_at": datetime.now(timezone.utc)
+        })
+    
+    return result
+
+@api_router.get("/admin/catalog/validation")
+async def validate_catalog_contents(admin_user: User = Depends(get_admin_user)):
+    """Every consistency issue in the current catalog (see catalog_validation.py), errors first"""
+    catalog = await catalog_store.get(db)
+    issues = validate_catalog(catalog.countries, catalog.landmarks)
+    return {
+        "version": catalog.version,
+        "errors": sum(1 for issue in issues if issue["severity"] == "error"),
+        "warnings": sum(1 for issue in issues if issue["severity"] == "warning"),
+        "issues": issues,
+    }
+
+@api_router.post("/admin/landmarks/reconcile-upvotes")
+async def reconcile_landmark_upvotes(admin_user: User = Depends(get_super_admin_user)):
+    """
+    Recompute every landmark's upvote count from landmark_upvotes (super admin only).
+    Other workers' unflushed counts are not visible here, so run it when traffic is quiet.
+    """
+    await upvote_counter.flush(db)
+    corrected = await reconcile_upvote_counts(db)
+    return {"message": "Upvote counts reconciled", "corrected": corrected}
+
 @api_router.get("/admin/logs")
 async def get_admin_logs(
     page: int = 1,
@@ -2510,6 +2730,39 @@ async def get_enhanced_leaderboard(
         "total_users": len(leaderboard)
     }
 
+@api_router.get("/leaderboard/{scope_type}/{scope_id}")
+async def get_scoped_leaderboard(
+    scope_type: str,  # "country" or "continent"
+    scope_id: str,  # country_id or continent name
+    category: str = "points",  # "points", "landmarks", "countries" (continent only)
+    friends_only: bool = False,
+    limit: int = 50,
+    current_user: User = Depends(get_current_user)
+):
+    """Top explorers of a country or continent, from the per-user rollup counters"""
+    if scope_type not in SCOPE_TYPES:
+        raise HTTPException(status_code=400, detail="scope_type must be 'country' or 'continent'")
+    if category not in SCOPED_CATEGORIES or (category == "countries" and scope_type == "country"):
+        raise HTTPException(status_code=400, detail="Invalid leaderboard category")
+    
+    catalog = await catalog_store.get(db)
+    if scope_type == "country":
+        country = catalog.countries_by_id.get(scope_id)
+        if not country:
+            raise HTTPException(status_code=404, detail="Country not found")
+        scope_name = country["name"]
+    else:
+        if not any(c.get("continent") == scope_id for c in catalog.countries):
+            raise HTTPException(status_code=404, detail="Continent not found")
+        scope_name = scope_id
+    
+    user_ids = [current_user.user_id] + await get_friend_ids(current_user.user_id) if friends_only else None
+    result = await scoped_leaderboard(
+        db, scope_key(scope_type, scope_id), category, current_user.user_id,
+        limit=max(1, min(limit, 100)), user_ids=user_ids
+    )
+    return {"scope_type": scope_type, "scope_id": scope_id, "scope_name": scope_name, "category": category, **result}
+
 @api_router.get("/leaderboard/rising-stars")
 async def get_rising_stars(limit: int = 10, current_user: User = Depends(get_current_user)):
     """Get users with biggest point gains this week"""
@@ -2542,22 +2795,20 @@ async def get_rising_stars(limit: int = 10, current_user: User = Depends(get_cur
 
 # ============= FRIEND ENDPOINTS =============
 
-@api_router.get("/friends", response_model=List[UserPublic])
-async def get_friends(current_user: User = Depends(get_current_user)):
+async def get_friend_ids(user_id: str) -> List[str]:
+    """User ids of all accepted friends of a user"""
     friendships = await db.friends.find({
         "$or": [
-            {"user_id": current_user.user_id, "status": "accepted"},
-            {"friend_id": current_user.user_id, "status": "accepted"}
+            {"user_id": user_id, "status": "accepted"},
+            {"friend_id": user_id, "status": "accepted"}
         ]
-    }, {"_id": 0}).to_list(1000)
-    
-    friend_ids = []
-    for f in friendships:
-        if f["user_id"] == current_user.user_id:
-            friend_ids.append(f["friend_id"])
-        else:
-            friend_ids.append(f["user_id"])
+    }, {"user_id": 1, "friend_id": 1, "_id": 0}).to_list(1000)
     
+    return [f["friend_id"] if f["user_id"] == user_id else f["user_id"] for f in friendships]
+
+@api_router.get("/friends", response_model=List[UserPublic])
+async def get_friends(current_user: User = Depends(get_current_user)):
+    friend_ids = await get_friend_ids(current_user.user_id)
     friends = await db.users.find({"user_id": {"$in": friend_ids}}, {"_id": 0}).to_list(1000)
     return [UserPublic(**f) for f in friends]
 
@@ -2737,15 +2988,8 @@ async def get_stats(current_user: User = Depends(get_current_user)):
     # Get user document
     user = await db.users.find_one({"user_id": current_user.user_id}, {"_id": 0})
     
-    # Get user's visits
-    visits = await db.visits.find({"user_id": current_user.user_id}, {"_id": 0}).to_list(1000)
-    
-    # Get unique countries and continents
-    landmark_ids = [v["landmark_id"] for v in visits]
-    landmarks = await db.landmarks.find({"landmark_id": {"$in": landmark_ids}}, {"_id": 0}).to_list(1000)
-    
-    countries = set(l["country_name"] for l in landmarks)
-    continents = set(l["continent"] for l in landmarks)
+    # Visit totals, countries and continents from the user's progress document
+    progress = await get_user_progress(db, current_user.user_id)
     
     # Count friends
     friend_count = await db.friends.count_documents({
@@ -2756,9 +3000,9 @@ async def get_stats(current_user: User = Depends(get_current_user)):
     })
     
     return {
-        "total_visits": len(visits),
-        "countries_visited": len(countries),
-        "continents_visited": len(continents),
+        "total_visits": progress.get("visits", 0),
+        "countries_visited": sum(1 for visited in (progress.get("countries") or {}).values() if visited),
+        "continents_visited": sum(1 for visited in (progress.get("continents") or {}).values() if visited),
         "friends_count": friend_count,
         "points": user.get("points", 0),
         "leaderboard_points": user.get("leaderboard_points", 0)
@@ -2768,45 +3012,24 @@ async def get_stats(current_user: User = Depends(get_current_user)):
 
 @api_router.get("/progress")
 async def get_progress_stats(current_user: User = Depends(get_current_user)):
-    """Get comprehensive progress statistics for user"""
-    
-    # Get all user's visits
-    visits = await db.visits.find({"user_id": current_user.user_id}, {"_id": 0}).to_list(10000)
-    visited_landmark_ids = {v["landmark_id"] for v in visits}
+    """Get comprehensive progress statistics for user.
     
-    # Calculate total points earned
-    total_points = sum(v.get("points_earned", 10) for v in visits)
-    
-    # Get all landmarks and countries
-    all_landmarks = await db.landmarks.find({}, {"_id": 0}).to_list(10000)
-    all_countries = await db.countries.find({}, {"_id": 0}).to_list(100)
+    One read of the user's progress document; totals come from the in-memory catalog.
+    """
+    catalog = await catalog_store.get(db)
+    progress = await get_user_progress(db, current_user.user_id)
+    visited_by_country = progress.get("countries") or {}
     
     # Calculate overall progress
-    total_landmarks = len(all_landmarks)
-    visited_landmarks = len(visited_landmark_ids)
+    total_landmarks = len(catalog.landmarks)
+    visited_landmarks = progress.get("landmarks", 0)
     overall_percentage = round((visited_landmarks / total_landmarks * 100) if total_landmarks > 0 else 0, 1)
     
-    # Calculate continental progress
+    # Calculate continental progress (countries with at least one visited landmark)
     continental_progress = {}
-    continent_country_map = {}
-    
-    for country in all_countries:
-        continent = country["continent"]
-        if continent not in continent_country_map:
-            continent_country_map[continent] = []
-        continent_country_map[continent].append(country["country_id"])
-    
-    for continent, country_ids in continent_country_map.items():
-        # Count countries in this continent
+    for continent, country_ids in catalog.countries_by_continent.items():
         total_countries = len(country_ids)
-        
-        # Count visited countries in this continent
-        visited_countries = set()
-        for landmark in all_landmarks:
-            if landmark["country_id"] in country_ids and landmark["landmark_id"] in visited_landmark_ids:
-                visited_countries.add(landmark["country_id"])
-        
-        visited_count = len(visited_countries)
+        visited_count = sum(1 for country_id in country_ids if visited_by_country.get(country_id))
         percentage = round((visited_count / total_countries * 100) if total_countries > 0 else 0, 1)
         
         continental_progress[continent] = {
@@ -2817,11 +3040,10 @@ async def get_progress_stats(current_user: User = Depends(get_current_user)):
     
     # Calculate per-country progress
     country_progress = {}
-    for country in all_countries:
+    for country in catalog.countries:
         country_id = country["country_id"]
-        country_landmarks = [l for l in all_landmarks if l["country_id"] == country_id]
-        total = len(country_landmarks)
-        visited = sum(1 for l in country_landmarks if l["landmark_id"] in visited_landmark_ids)
+        total = len(catalog.landmarks_by_country.get(country_id, ()))
+        visited = visited_by_country.get(country_id, 0)
         percentage = round((visited / total * 100) if total > 0 else 0, 1)
         
         country_progress[country_id] = {
@@ -2838,7 +3060,7 @@ async def get_progress_stats(current_user: User = Depends(get_current_user)):
             "total": total_landmarks,
             "percentage": overall_percentage
         },
-        "totalPoints": total_points,
+        "totalPoints": progress.get("points", 0),
         "continents": continental_progress,
         "countries": country_progress
     }
@@ -3567,28 +3789,70 @@ async def create_country_visit(data: CountryVisitCreate, current_user: User = De
     # Determine visibility (use provided or user's default)
     visibility = data.visibility or current_user.default_privacy or "public"
     
+    if not existing_visit:
+        # Award 50 points for new country visit
+        points_earned = 50
+        leaderboard_points_earned = 50 if has_photos else 0
+    
+        # Create country visit
+        country_visit_id = f"cv_{uuid.uuid4().hex[:12]}"
+        country_visit = {
+            "country_visit_id": country_visit_id,
+            "user_id": current_user.user_id,
+            "user_name": current_user.name,
+            "user_picture": current_user.picture,
+            "country_id": data.country_id,
+            "country_name": country_name,
+            "continent": continent,
+            "photos": data.photos,
+            "diary": data.diary_notes,
+            "visibility": visibility,
+            "visited_at": visited_at,
+            "points_earned": points_earned,
+            "leaderboard_points_earned": leaderboard_points_earned,
+            "has_photos": has_photos,
+            "source": "manual",
+            "created_at": datetime.now(timezone.utc)
+        }
+    
+        try:
+            await db.country_visits.insert_one(country_visit)
+        except DuplicateKeyError:
+            # Created concurrently (same request retried, or a landmark visit's auto
+            # country visit): upgrade that one instead of awarding the points twice
+            existing_visit = await db.country_visits.find_one({
+                "user_id": current_user.user_id,
+                "country_id": data.country_id
+            })
+    
     if existing_visit:
         # Upgrade existing visit with new photos/diary
         # If adding photos for the first time, also award leaderboard points
-        existing_has_photos = bool(existing_visit.get("photos", []))
         leaderboard_points_to_add = 0
+        upgrade = {"$set": {
+            "photos": data.photos,
+            "diary": data.diary_notes,
+            "visibility": visibility,
+            "source": "manual",
+            "has_photos": has_photos,
+            "leaderboard_points_earned": existing_visit.get("points_earned", 50) if has_photos else 0,
+            "updated_at": datetime.now(timezone.utc)
+        }}
         
-        # If upgrading from no photos to having photos, award leaderboard points
-        if has_photos and not existing_has_photos:
-            leaderboard_points_to_add = existing_visit.get("points_earned", 50)
-        
-        await db.country_visits.update_one(
-            {"country_visit_id": existing_visit["country_visit_id"]},
-            {"$set": {
-                "photos": data.photos,
-                "diary": data.diary_notes,
-                "visibility": visibility,
-                "source": "manual",
-                "has_photos": has_photos,
-                "leaderboard_points_earned": existing_visit.get("points_earned", 50) if has_photos else 0,
-                "updated_at": datetime.now(timezone.utc)
-            }}
-        )
+        # If upgrading from no photos to having photos, award leaderboard points.
+        # The photo-less state is part of the filter so only one upgrade can win it.
+        if has_photos:
+            result = await db.country_visits.update_one(
+                {"country_visit_id": existing_visit["country_visit_id"], "photos.0": {"$exists": False}},
+                upgrade
+            )
+            if result.modified_count:
+                leaderboard_points_to_add = existing_visit.get("points_earned", 50)
+        if not leaderboard_points_to_add:
+            await db.country_visits.update_one(
+                {"country_visit_id": existing_visit["country_visit_id"]},
+                upgrade
+            )
         
         # If adding photos for first time, award leaderboard points
         if leaderboard_points_to_add > 0:
@@ -3618,32 +3882,8 @@ async def create_country_visit(data: CountryVisitCreate, current_user: User = De
             "has_photos": has_photos
         }
     
-    # Award 50 points for new country visit
-    points_earned = 50
-    leaderboard_points_earned = 50 if has_photos else 0
-    
-    # Create country visit
-    country_visit_id = f"cv_{uuid.uuid4().hex[:12]}"
-    country_visit = {
-        "country_visit_id": country_visit_id,
-        "user_id": current_user.user_id,
-        "user_name": current_user.name,
-        "user_picture": current_user.picture,
-        "country_id": data.country_id,
-        "country_name": country_name,
-        "continent": continent,
-        "photos": data.photos,
-        "diary": data.diary_notes,
-        "visibility": visibility,
-        "visited_at": visited_at,
-        "points_earned": points_earned,
-        "leaderboard_points_earned": leaderboard_points_earned,
-        "has_photos": has_photos,
-        "source": "manual",
-        "created_at": datetime.now(timezone.utc)
-    }
-    
-    await db.country_visits.insert_one(country_visit)
+    await record_rollup(db, current_user.user_id, data.country_id, continent, points=points_earned, countries=1)
+    await record_country_visit(db, current_user.user_id, data.country_id)
     
     # Award points to user
     # Personal points: always awarded
@@ -3741,6 +3981,11 @@ async def delete_country_visit(country_visit_id: str, current_user: User = Depen
         {"user_id": current_user.user_id},
         {"$inc": {"points": -points_to_deduct}}
     )
+    await record_rollup(
+        db, current_user.user_id, country_visit["country_id"], country_visit.get("continent"),
+        points=-points_to_deduct, countries=-1
+    )
+    await record_country_visit(db, current_user.user_id, country_visit["country_id"], visited=False)
     
     return {"message": "Country visit deleted"}
 
@@ -3815,20 +4060,15 @@ async def check_country_visit_status(country_id: str, current_user: User = Depen
             "has_diary": bool(country_visit.get("diary"))
         }
     
-    # Check if any landmarks in this country have been visited
-    # Get all landmarks for this country
-    country_landmarks = await db.landmarks.find(
-        {"country_id": country_id},
-        {"landmark_id": 1}
-    ).to_list(1000)
-    
-    landmark_ids = [lm["landmark_id"] for lm in country_landmarks]
+    # Check if any landmarks in this country have been visited: the country's
+    # mask against the user's visited bitset, then one visit row for its date
+    catalog = await catalog_store.get(db)
+    visited_set = VisitedSet.from_progress(await get_user_progress(db, current_user.user_id), catalog)
     
-    if landmark_ids:
-        # Check if user has visited any of these landmarks
+    if visited_set.visited_any_in_country(country_id):
         landmark_visit = await db.visits.find_one({
             "user_id": current_user.user_id,
-            "landmark_id": {"$in": landmark_ids}
+            "landmark_id": {"$in": [l["landmark_id"] for l in catalog.landmarks_by_country.get(country_id, ())]}
         })
         
         if landmark_visit:
@@ -4199,7 +4439,8 @@ async def get_achievements_showcase(current_user: User = Depends(get_current_use
     earned_badge_types = {badge["badge_type"] for badge in earned_achievements}
     
     # Get user stats for progress calculation
-    visit_count = await db.visits.count_documents({"user_id": current_user.user_id})
+    progress = await get_user_progress(db, current_user.user_id)
+    visit_count = progress.get("visits", 0)
     user = await db.users.find_one({"user_id": current_user.user_id}, {"_id": 0})
     total_points = user.get("points", 0)
     longest_streak = user.get("longest_streak", 0)
@@ -4212,29 +4453,8 @@ async def get_achievements_showcase(current_user: User = Depends(get_current_use
         ]
     })
     
-    # Count completed countries
-    completed_countries = await db.visits.aggregate([
-        {"$match": {"user_id": current_user.user_id}},
-        {"$group": {"_id": "$country_id", "visit_count": {"$sum": 1}}},
-        {"$lookup": {
-            "from": "landmarks",
-            "let": {"country": "$_id"},
-            "pipeline": [
-                {"$match": {"$expr": {"$and": [
-                    {"$eq": ["$country_id", "$$country"]},
-                    {"$eq": ["$category", "official"]}
-                ]}}},
-                {"$count": "total"}
-            ],
-            "as": "landmark_info"
-        }},
-        {"$match": {"$expr": {"$eq": [
-            "$visit_count",
-            {"$arrayElemAt": ["$landmark_info.total", 0]}
-        ]}}}
-    ]).to_list(1000)
-    
-    completed_country_count = len(completed_countries)
+    # Completed countries are kept on the progress document
+    completed_country_count = len(progress.get("completed_countries") or [])
     
     # Build all badges with progress
     all_badges = []
@@ -4348,6 +4568,9 @@ async def manually_check_achievements(current_user: User = Depends(get_current_u
 
 # ============= END ACHIEVEMENTS ENDPOINTS =============
 
+# Compress everything that is not already pre-compressed (see response_cache.py)
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -4468,26 +4691,33 @@ BADGE_DEFINITIONS = {
     },
 }
 
-async def check_and_award_badges(user_id: str):
-    """Check for new badges and award them"""
+async def check_and_award_badges(user_id: str, user: Optional[dict] = None, progress: Optional[dict] = None,
+                                 awarded_by: Optional[str] = None):
+    """Check for new badges and award them.
+    
+    Works from the user's points/streak and their visit counters (user_progress),
+    so the cost does not grow with the number of visits. Callers that already
+    hold the user document or the counters (add_visit) pass them in. Badges are
+    stamped with `awarded_by` (the visit whose job awarded them) when given.
+    """
     newly_awarded = []
     
     # Get user's existing badges
-    existing_badges = await db.achievements.find({"user_id": user_id}).to_list(1000)
+    existing_badges = await db.achievements.find({"user_id": user_id}, {"_id": 0, "badge_type": 1}).to_list(None)
     existing_badge_types = {badge["badge_type"] for badge in existing_badges}
     
     # Get user document for accurate stats
-    user = await db.users.find_one({"user_id": user_id}, {"_id": 0})
-    if not user:
-        return newly_awarded
+    if user is None:
+        user = await db.users.find_one({"user_id": user_id}, {"_id": 0})
+        if not user:
+            return newly_awarded
+    if progress is None:
+        progress = await get_user_progress(db, user_id)
     
     # Get accurate stats from user document
     total_points = user.get("points", 0)
     longest_streak = user.get("longest_streak", 0)
-    
-    # Get user's visits for visit count
-    visits = await db.visits.find({"user_id": user_id}).to_list(1000)
-    visit_count = len(visits)
+    visit_count = progress.get("visits", 0)
     
     # Get friend count
     friend_count = await db.friends.count_documents({
@@ -4497,26 +4727,33 @@ async def check_and_award_badges(user_id: str):
         ]
     })
     
+    achievements = []
+    
+    def award(badge_type: str, name: str, description: str, icon: str, is_featured: bool):
+        achievement = {
+            "achievement_id": f"achievement_{uuid.uuid4().hex[:12]}",
+            "user_id": user_id,
+            "badge_type": badge_type,
+            "badge_name": name,
+            "badge_description": description,
+            "badge_icon": icon,
+            "earned_at": datetime.now(timezone.utc),
+            "is_featured": is_featured
+        }
+        if awarded_by:
+            achievement["awarded_by"] = awarded_by
+        achievements.append(achievement)
+        existing_badge_types.add(badge_type)
+        newly_awarded.append(badge_type)
+    
     # Check milestone badges (689 total landmarks)
     milestones = [1, 10, 25, 50, 100, 200, 350, 500]
     for milestone in milestones:
         badge_type = f"milestone_{milestone}" if milestone > 1 else "first_visit"
         if visit_count >= milestone and badge_type not in existing_badge_types:
-            badge_def = BADGE_DEFINITIONS.get(badge_type if milestone > 1 else "first_visit")
+            badge_def = BADGE_DEFINITIONS.get(badge_type)
             if badge_def:
-                achievement_id = f"achievement_{uuid.uuid4().hex[:12]}"
-                achievement = {
-                    "achievement_id": achievement_id,
-                    "user_id": user_id,
-                    "badge_type": badge_type,
-                    "badge_name": badge_def["name"],
-                    "badge_description": badge_def["description"],
-                    "badge_icon": badge_def["icon"],
-                    "earned_at": datetime.now(timezone.utc),
-                    "is_featured": milestone >= 100
-                }
-                await db.achievements.insert_one(achievement)
-                newly_awarded.append(badge_type)
+                award(badge_type, badge_def["name"], badge_def["description"], badge_def["icon"], milestone >= 100)
     
     # Check points badges
     point_milestones = [(100, "points_100"), (500, "points_500"), (1000, "points_1000"), (5000, "points_5000")]
@@ -4524,19 +4761,7 @@ async def check_and_award_badges(user_id: str):
         if total_points >= points and badge_type not in existing_badge_types:
             badge_def = BADGE_DEFINITIONS.get(badge_type)
             if badge_def:
-                achievement_id = f"achievement_{uuid.uuid4().hex[:12]}"
-                achievement = {
-                    "achievement_id": achievement_id,
-                    "user_id": user_id,
-                    "badge_type": badge_type,
-                    "badge_name": badge_def["name"],
-                    "badge_description": badge_def["description"],
-                    "badge_icon": badge_def["icon"],
-                    "earned_at": datetime.now(timezone.utc),
-                    "is_featured": points >= 1000
-                }
-                await db.achievements.insert_one(achievement)
-                newly_awarded.append(badge_type)
+                award(badge_type, badge_def["name"], badge_def["description"], badge_def["icon"], points >= 1000)
     
     # Check social badges
     social_milestones = [(5, "social_5"), (10, "social_10"), (25, "social_25")]
@@ -4544,58 +4769,27 @@ async def check_and_award_badges(user_id: str):
         if friend_count >= count and badge_type not in existing_badge_types:
             badge_def = BADGE_DEFINITIONS.get(badge_type)
             if badge_def:
-                achievement_id = f"achievement_{uuid.uuid4().hex[:12]}"
-                achievement = {
-                    "achievement_id": achievement_id,
-                    "user_id": user_id,
-                    "badge_type": badge_type,
-                    "badge_name": badge_def["name"],
-                    "badge_description": badge_def["description"],
-                    "badge_icon": badge_def["icon"],
-                    "earned_at": datetime.now(timezone.utc),
-                    "is_featured": count >= 25
-                }
-                await db.achievements.insert_one(achievement)
-                newly_awarded.append(badge_type)
+                award(badge_type, badge_def["name"], badge_def["description"], badge_def["icon"], count >= 25)
     
     # Check country complete badges
-    if visits:
-        # Group visits by country
-        visited_by_country = {}
-        for visit in visits:
-            landmark = await db.landmarks.find_one({"landmark_id": visit["landmark_id"]})
-            if landmark:
-                country_id = landmark.get("country_id")
-                if country_id:
-                    if country_id not in visited_by_country:
-                        visited_by_country[country_id] = set()
-                    visited_by_country[country_id].add(visit["landmark_id"])
-        
-        # Check if any country is complete
-        for country_id, visited_landmarks in visited_by_country.items():
-            all_country_landmarks = await db.landmarks.find({"country_id": country_id}).to_list(1000)
-            total_in_country = len(all_country_landmarks)
-            
-            if len(visited_landmarks) >= total_in_country and total_in_country > 0:
-                badge_type = f"country_complete_{country_id}"
-                if badge_type not in existing_badge_types:
-                    country = await db.countries.find_one({"country_id": country_id})
-                    country_name = country.get("name", "Unknown") if country else "Unknown"
-                    
-                    achievement_id = f"achievement_{uuid.uuid4().hex[:12]}"
-                    achievement = {
-                        "achievement_id": achievement_id,
-                        "user_id": user_id,
-                        "badge_type": badge_type,
-                        "badge_name": f"{country_name} Master",
-                        "badge_description": f"Completed all landmarks in {country_name}",
-                        "badge_icon": "🏆",
-                        "earned_at": datetime.now(timezone.utc),
-                        "is_featured": True
-                    }
-                    await db.achievements.insert_one(achievement)
-                    newly_awarded.append(badge_type)
-    
+    catalog = await catalog_store.get(db)
+    for country_id in progress.get("completed_countries") or []:
+        badge_type = f"country_complete_{country_id}"
+        if badge_type not in existing_badge_types:
+            country = catalog.countries_by_id.get(country_id)
+            country_name = country.get("name", "Unknown") if country else "Unknown"
+            award(badge_type, f"{country_name} Master", f"Completed all landmarks in {country_name}", "🏆", True)
+    
+    if achievements:
+        try:
+            await db.achievements.insert_many(achievements, ordered=False)
+        except BulkWriteError as e:
+            # A concurrent check already awarded these (unique user_id + badge_type)
+            errors = e.details.get("writeErrors", [])
+            if any(error.get("code") != 11000 for error in errors):
+                raise
+            duplicates = {achievements[error["index"]]["badge_type"] for error in errors}
+            newly_awarded = [badge_type for badge_type in newly_awarded if badge_type not in duplicates]
     return newly_awarded
 
 # ============= END BADGE SYSTEM =============
@@ -4996,6 +5190,96 @@ async def notify_streak_reminder(user_id: str, current_streak: int):
 # Include the router in the main app (MUST be after all routes are defined)
 app.include_router(api_router)
 
+async def ensure_indexes():
+    """Create the indexes the hot queries rely on (no-op when they already exist)"""
+    indexes = [
+        (db.landmarks, [("landmark_id", 1)], {"unique": True}),
+        (db.landmarks, [("country_id", 1)], {}),
+        (db.catalog_changes, [("kind", 1), ("id", 1)], {"unique": True}),
+        # One upvote document per user and landmark (the toggle upserts it)
+        (db.landmark_upvotes, [("landmark_id", 1), ("user_id", 1)], {"unique": True}),
+        # Trending: one stats document per landmark, top-k read from the score indexes
+        (db.landmark_stats, [("landmark_id", 1)], {"unique": True}),
+        # Landmark visitors and friends-who-visited lookups
+        (db.landmark_visitors, [("landmark_id", 1), ("user_id", 1)], {"unique": True}),
+        (db.friends, [("user_id", 1), ("status", 1)], {}),
+        (db.friends, [("friend_id", 1), ("status", 1)], {}),
+        (db.landmark_stats, [("trend_score", -1)], {}),
+        (db.landmark_stats, [("continent", 1), ("trend_score", -1)], {}),
+        # Live upvote counts changed since a worker's last refresh
+        (db.landmark_stats, [("upvotes_at", 1)], {}),
+        # Per-user visit counters (visit_progress.py)
+        (db.user_progress, [("user_id", 1)], {"unique": True}),
+        # Country/continent leaderboards: top-N and rank walk (scope, counter)
+        (db.leaderboard_rollups, [("scope", 1), ("user_id", 1)], {"unique": True}),
+        (db.leaderboard_rollups, [("scope", 1), ("points", -1), ("user_id", 1)], {}),
+        (db.leaderboard_rollups, [("scope", 1), ("landmarks", -1), ("user_id", 1)], {}),
+        (db.leaderboard_rollups, [("scope", 1), ("countries", -1), ("user_id", 1)], {}),
+        # Visited/unvisited filtering and per-user visit lookups
+        (db.visits, [("user_id", 1), ("landmark_id", 1)], {}),
+        (db.visits, [("user_id", 1), ("visited_at", -1)], {}),
+        # One country visit per user and country, one badge per user and type:
+        # concurrent visits cannot create or award them twice
+        (db.country_visits, [("user_id", 1), ("country_id", 1)], {"unique": True}),
+        (db.achievements, [("user_id", 1), ("badge_type", 1)], {"unique": True}),
+        # Background jobs: idempotent enqueue, due/expired-lease claims, cleanup.
+        # Job-written activities and notifications have fixed ids (retries are no-ops)
+        (db.jobs, [("key", 1)], {"unique": True}),
+        (db.jobs, [("status", 1), ("run_at", 1)], {}),
+        (db.jobs, [("status", 1), ("lease_until", 1)], {}),
+        (db.jobs, [("finished_at", 1)], {"expireAfterSeconds": int(JOB_RETENTION.total_seconds())}),
+        (db.activities, [("activity_id", 1)], {"unique": True}),
+        (db.notifications, [("notification_id", 1)], {"unique": True}),
+    ]
+    missing_unique = []
+    for collection, keys, options in indexes:
+        try:
+            await collection.create_index(keys, **options)
+            continue
+        except Exception as e:
+            error = e
+        # Duplicates from before the index (check-then-insert races): remove them and retry
+        deduplicate = DEDUPLICATORS.get(collection.name) if options.get("unique") else None
+        if deduplicate:
+            try:
+                removed = await deduplicate(db)
+                logger.warning(f"Removed {removed} duplicate documents from {collection.name}")
+                await collection.create_index(keys, **options)
+                continue
+            except Exception as e:
+                error = e
+        logger.error(f"Could not create index {keys} on {collection.name}: {error}")
+        if options.get("unique"):
+            missing_unique.append(f"{collection.name} {keys}")
+    # Write paths rely on unique indexes for idempotency (duplicate key = already
+    # done); serving without them would duplicate visits, badges, jobs...
+    if missing_unique:
+        raise RuntimeError(f"Missing unique indexes: {', '.join(missing_unique)}")
+
+@app.on_event("startup")
+async def load_catalog():
+    await ensure_indexes()
+    # Visits from before landmark_visitors existed (one-time, first worker only)
+    if await ensure_landmark_visitors(db):
+        logger.info("Backfilled landmark_visitors from visits")
+    app.state.visitors_backfill = asyncio.create_task(
+        watch_landmark_visitors(db, VISITORS_BACKFILL_POLL_SECONDS)
+    )
+    await catalog_store.load(db, CATALOG_SNAPSHOT_FILE)
+    app.state.catalog_watcher = asyncio.create_task(catalog_store.watch(db, CATALOG_POLL_SECONDS))
+    app.state.upvote_flusher = asyncio.create_task(
+        sync_upvotes(db, upvote_counter, live_upvotes, UPVOTE_FLUSH_SECONDS, UPVOTE_PUBLISH_SECONDS)
+    )
+    app.state.job_workers = asyncio.create_task(job_queue.run(db, JOB_WORKERS, JOB_POLL_SECONDS))
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for task_name in ("catalog_watcher", "upvote_flusher", "job_workers", "visitors_backfill"):
+        task = getattr(app.state, task_name, None)
+        if task:
+            task.cancel()
+    try:
+        await upvote_counter.flush(db)
+    except Exception as e:
+        logger.error(f"Final upvote flush failed: {e}")
     client.close()
@@ -0,0 +1,75 @@
+"""
+Visit streaks (consecutive days with at least one visit).
+
+`advance_streak` moves a user's streak forward and applies the visit's point
+increments in one conditional `find_one_and_update`: the write only matches
+while `last_visit_date`/`current_streak` still hold the values the new streak
+was computed from, and is retried on a fresh read otherwise. Two visits posted
+at once (a flaky connection retrying a request) can neither both extend the
+streak nor lose each other's points, and no lock is held across requests.
+"""
+
+from datetime import date
+from typing import Optional, Tuple
+
+from pymongo import ReturnDocument
+
+STREAK_MILESTONES = (7, 30, 100)
+
+_PROJECTION = {"_id": 0, "last_visit_date": 1, "current_streak": 1, "longest_streak": 1, "points": 1}
+
+
+def next_streak(last_visit_date: Optional[str], current_streak: int, longest_streak: int, today: date) -> dict:
+    """The streak after a visit today, from the stored one"""
+    continued = False
+    if not last_visit_date:
+        # First ever visit
+        current_streak = 1
+    else:
+        days_diff = (today - date.fromisoformat(last_visit_date)).days
+        if days_diff == 1:
+            # Consecutive day
+            current_streak += 1
+            continued = True
+        elif days_diff != 0:
+            # Streak broken (a same-day visit leaves it alone)
+            current_streak = 1
+    return {
+        "current_streak": current_streak,
+        "longest_streak": max(longest_streak, current_streak),
+        "last_visit_date": today.isoformat(),
+        "milestone": current_streak if continued and current_streak in STREAK_MILESTONES else 0,
+    }
+
+
+async def advance_streak(db, user_id: str, increments: dict, today: Optional[date] = None) -> Tuple[dict, dict]:
+    """Advance the streak and apply `increments` ($inc) atomically.
+
+    Returns (user document after the write, streak). The document holds points
+    and streaks only; it is empty if the user does not exist.
+    """
+    today = today or date.today()
+    user = await db.users.find_one({"user_id": user_id}, _PROJECTION)
+    while user is not None:
+        streak = next_streak(
+            user.get("last_visit_date"), user.get("current_streak") or 0, user.get("longest_streak") or 0, today
+        )
+        updated = await db.users.find_one_and_update(
+            {
+                "user_id": user_id,
+                "last_visit_date": user.get("last_visit_date"),
+                "current_streak": user.get("current_streak"),
+            },
+            {
+                "$set": {"current_streak": streak["current_streak"], "last_visit_date": streak["last_visit_date"]},
+                "$max": {"longest_streak": streak["longest_streak"]},
+                "$inc": increments,
+            },
+            projection=_PROJECTION,
+            return_document=ReturnDocument.AFTER,
+        )
+        if updated is not None:
+            return updated, streak
+        # Another visit moved the streak since we read it: recompute from its result
+        user = await db.users.find_one({"user_id": user_id}, _PROJECTION)
+    return {}, next_streak(None, 0, 0, today)
@@ -0,0 +1,256 @@
+import asyncio
+import copy
+import sys
+from pathlib import Path
+
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+# Let unit tests import backend modules (catalog, catalog_search, ...) directly
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+# ============= IN-MEMORY MONGO =============
+# Shared by the unit tests (from conftest import FakeDb, ...). Covers the
+# queries and updates the backend issues, not MongoDB at large.
+
+def _get(doc, path):
+    for part in path.split("."):
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(part)
+    return doc
+
+
+def _set(doc, path, value):
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    doc[last] = value
+
+
+_OPERATORS = {
+    "$lt": lambda value, operand: value is not None and value < operand,
+    "$lte": lambda value, operand: value is not None and value <= operand,
+    "$gt": lambda value, operand: value is not None and value > operand,
+    "$gte": lambda value, operand: value is not None and value >= operand,
+    "$ne": lambda value, operand: value != operand,
+    "$in": lambda value, operand: value in operand,
+    "$exists": lambda value, operand: (value is not None) == operand,
+}
+
+
+def matches(doc, query) -> bool:
+    """Whether a document matches a find filter"""
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(matches(doc, q) for q in condition):
+                return False
+        elif isinstance(condition, dict) and condition and all(op in _OPERATORS for op in condition):
+            value = _get(doc, field)
+            if not all(_OPERATORS[op](value, operand) for op, operand in condition.items()):
+                return False
+        elif _get(doc, field) != condition:
+            return False
+    return True
+
+
+def apply_update(doc, update, inserted=False):
+    for field, value in update.get("$set", {}).items():
+        _set(doc, field, value)
+    for field in update.get("$unset", {}):
+        *parents, last = field.split(".")
+        parent = _get(doc, ".".join(parents)) if parents else doc
+        if isinstance(parent, dict):
+            parent.pop(last, None)
+    for field, value in update.get("$inc", {}).items():
+        _set(doc, field, (_get(doc, field) or 0) + value)
+    for field, value in update.get("$addToSet", {}).items():
+        values = _get(doc, field) or []
+        _set(doc, field, values if value in values else values + [value])
+    for field, value in update.get("$pull", {}).items():
+        _set(doc, field, [v for v in _get(doc, field) or [] if v != value])
+    for field, operand in update.get("$bit", {}).items():
+        _set(doc, field, (_get(doc, field) or 0) | operand["or"])
+    for field, value in update.get("$max", {}).items():
+        current = _get(doc, field)
+        _set(doc, field, value if current is None else max(current, value))
+    if inserted:
+        for field, value in update.get("$setOnInsert", {}).items():
+            _set(doc, field, value)
+
+
+def _sort_key(field):
+    # Missing values sort first, as in MongoDB
+    def key(doc):
+        value = _get(doc, field)
+        return (value is not None, value if value is not None else 0)
+    return key
+
+
+class FakeResult:
+    def __init__(self, matched=0, upserted_id=None):
+        self.matched_count = self.modified_count = int(matched)
+        self.upserted_id = upserted_id
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, key, direction=1):
+        keys = [(key, direction)] if isinstance(key, str) else key
+        for field, field_direction in reversed(keys):
+            self.docs.sort(key=_sort_key(field), reverse=field_direction < 0)
+        return self
+
+    def limit(self, n):
+        if n:
+            self.docs = self.docs[:n]
+        return self
+
+    async def to_list(self, length):
+        return self.docs
+
+    def __aiter__(self):
+        async def docs():
+            for doc in self.docs:
+                yield doc
+        return docs()
+
+
+class FakeCollection:
+    """One collection: documents in a list, an optional unique key, and a
+    yield to the event loop per command so concurrent requests interleave
+    the way they do against MongoDB. Projections are not applied."""
+
+    def __init__(self, db=None, name="collection", unique=None, docs=()):
+        self.db = db
+        self.name = name
+        self.unique = unique
+        self.docs = [dict(doc) for doc in docs]
+
+    def _count(self):
+        if self.db is not None:
+            self.db.commands += 1
+
+    async def _command(self):
+        self._count()
+        await asyncio.sleep(0)
+
+    def _find(self, query):
+        return [d for d in self.docs if matches(d, query)]
+
+    def _insert(self, doc):
+        if self.unique:
+            key = tuple(_get(doc, field) for field in self.unique)
+            if any(tuple(_get(d, field) for field in self.unique) == key for d in self.docs):
+                raise DuplicateKeyError(f"duplicate key {key}")
+        self.docs.append(doc)
+
+    def _upsert(self, query, update, upsert):
+        doc = next(iter(self._find(query)), None)
+        inserted = doc is None
+        if inserted:
+            if not upsert:
+                return None, False
+            doc = {k: v for k, v in query.items() if not k.startswith("$") and not isinstance(v, dict)}
+            apply_update(doc, update, inserted)
+            self._insert(doc)
+        else:
+            apply_update(doc, update, inserted)
+        return doc, inserted
+
+    async def insert_one(self, doc):
+        await self._command()
+        self._insert(copy.deepcopy(doc))
+
+    async def insert_many(self, docs, ordered=True):
+        await self._command()
+        errors = []
+        for index, doc in enumerate(docs):
+            try:
+                self._insert(copy.deepcopy(doc))
+            except DuplicateKeyError:
+                errors.append({"index": index, "code": 11000})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors})
+
+    async def find_one(self, query, projection=None):
+        await self._command()
+        return copy.deepcopy(next(iter(self._find(query)), None))
+
+    def find(self, query=None, projection=None):
+        self._count()
+        return FakeCursor(copy.deepcopy(self._find(query or {})))
+
+    async def count_documents(self, query, limit=0):
+        await self._command()
+        count = len(self._find(query))
+        return min(count, limit) if limit else count
+
+    async def update_one(self, query, update, upsert=False):
+        await self._command()
+        doc, inserted = self._upsert(query, update, upsert)
+        return FakeResult(doc is not None and not inserted, "new" if inserted else None)
+
+    async def update_many(self, query, update):
+        await self._command()
+        matched = self._find(query)
+        for doc in matched:
+            apply_update(doc, update)
+        return FakeResult(len(matched))
+
+    async def delete_many(self, query):
+        await self._command()
+        self.docs = [d for d in self.docs if not matches(d, query)]
+
+    async def find_one_and_update(self, query, update, projection=None, upsert=False, return_document=None,
+                                  sort=None):
+        await self._command()
+        if sort:
+            candidates = FakeCursor(self._find(query)).sort(sort).docs
+            if not candidates:
+                return None
+            apply_update(candidates[0], update)
+            return copy.deepcopy(candidates[0])
+        doc, _ = self._upsert(query, update, upsert)
+        return copy.deepcopy(doc)
+
+    async def bulk_write(self, ops, ordered=True):
+        await self._command()
+        for op in ops:
+            self._upsert(op._filter, op._doc, op._upsert)
+
+    def aggregate(self, pipeline):
+        self._count()
+        return FakeCursor([])
+
+
+class FakeDb:
+    """Collections are created on first use. `unique` maps collection names
+    to the fields of their unique index; `commands` counts round trips."""
+
+    collection_class = FakeCollection
+
+    def __init__(self, unique=None):
+        self.commands = 0
+        self.unique = unique or {}
+        self.collections = {}
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        if name not in self.collections:
+            self.collections[name] = self.collection_class(self, name, self.unique.get(name))
+        return self.collections[name]
+
+    __getitem__ = __getattr__
+
+
+class UntouchableDb:
+    """For code paths that must be served without the database"""
+
+    def __getattr__(self, name):
+        raise AssertionError(f"db.{name} used")
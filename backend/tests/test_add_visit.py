@@ -0,0 +1,222 @@
+"""
+POST /api/visits (server.add_visit) against an in-memory database.
+
+The database counts every command it receives, enforces the unique indexes the
+write path relies on, and yields to the event loop before each command so
+concurrent requests interleave the way they do against MongoDB. Checks the
+number of round trips does not depend on continent size, and that one user
+posting many visits at once gets every point, bonus and streak step once.
+Feed activities and badges are queued jobs (jobs.py): the tests drain the
+queue before checking them.
+"""
+
+import asyncio
+import os
+from datetime import date, datetime, timedelta, timezone
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "round_trip_test")
+
+import pytest  # noqa: E402
+
+import server  # noqa: E402
+from catalog import CatalogSnapshot  # noqa: E402
+from conftest import FakeDb  # noqa: E402
+from leaderboards import build_rollups  # noqa: E402
+from visited_set import VisitedSet  # noqa: E402
+
+# Commands one visit may issue, whatever the catalog size (the effects job is
+# queued before the visit is written and released after it: two of them)
+VISIT_ROUND_TRIP_BUDGET = 11
+
+
+# Unique indexes from server.ensure_indexes that the visit write path relies on
+UNIQUE_KEYS = {
+    "user_progress": ("user_id",),
+    "landmark_visitors": ("landmark_id", "user_id"),
+    "country_visits": ("user_id", "country_id"),
+    "achievements": ("user_id", "badge_type"),
+    "jobs": ("key",),
+    "activities": ("activity_id",),
+    "notifications": ("notification_id",),
+}
+
+
+def _catalog(countries_in_continent):
+    countries = [{"country_id": f"c{i}", "name": f"Country {i}", "continent": "Asia"}
+                 for i in range(countries_in_continent)]
+    landmarks = [
+        {"landmark_id": f"c{i}_l{j}", "name": f"Landmark {i}.{j}", "country_id": f"c{i}",
+         "country_name": f"Country {i}", "continent": "Asia", "category": "official", "points": 10,
+         "ordinal": 2 * i + j}
+        for i in range(countries_in_continent) for j in range(2)
+    ]
+    return CatalogSnapshot.build(1, countries, landmarks)
+
+
+def _setup(monkeypatch, countries_in_continent, **user_fields):
+    db = FakeDb(unique=UNIQUE_KEYS)
+    db.users.docs.append({"user_id": "u1", "points": 0, **user_fields})
+    # Steady state: the user's counters already exist
+    db.user_progress.docs.append({"user_id": "u1", "visits": 0, "landmarks": 0, "countries": {}})
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server.catalog_store, "_snapshot", _catalog(countries_in_continent))
+    user = server.User(user_id="u1", email="u1@example.com", name="U1", created_at=datetime.now(timezone.utc))
+    return db, user
+
+
+def _run_visits(monkeypatch, countries_in_continent, landmark_ids):
+    db, user = _setup(monkeypatch, countries_in_continent)
+    results = []
+    for landmark_id in landmark_ids:
+        before = db.commands
+        response = asyncio.run(server.add_visit(server.VisitCreate(landmark_id=landmark_id), current_user=user))
+        results.append((db.commands - before, response))
+    asyncio.run(server.job_queue.drain(db))
+    return db, results
+
+
+def test_visit_round_trips_do_not_grow_with_the_continent(monkeypatch):
+    # First landmark of a country (and continent), completing the country, a plain revisit
+    visits = ["c0_l0", "c0_l1", "c0_l1"]
+    round_trips = {}
+    for countries_in_continent in (1, 3, 80):
+        db, results = _run_visits(monkeypatch, countries_in_continent, visits)
+        round_trips[countries_in_continent] = [commands for commands, _ in results]
+
+        _, (_, completed), (_, revisit) = results
+        assert completed["country_completed"] and not revisit["country_completed"]
+        assert completed["continent_completed"] == (countries_in_continent == 1)
+        continent_bonus = 200 if countries_in_continent == 1 else 0
+        # 3 visits x 10 + country bonus 20 + first-in-continent 50 + country completion 50
+        assert db.users.docs[0]["points"] == 30 + 20 + 50 + 50 + continent_bonus
+        assert len(db.country_visits.docs) == 1
+        assert db.user_progress.docs[0]["countries"] == {"c0": 2}
+
+    assert round_trips[1] == round_trips[3] == round_trips[80]
+    assert max(round_trips[80]) <= VISIT_ROUND_TRIP_BUDGET
+
+
+def test_progress_endpoints_read_the_progress_document(monkeypatch):
+    db, results = _run_visits(monkeypatch, 3, ["c0_l0", "c0_l1", "c1_l0", "c1_l0"])
+    user = server.User(user_id="u1", email="u1@example.com", name="U1", created_at=datetime.now(timezone.utc))
+
+    before = db.commands
+    progress = asyncio.run(server.get_progress_stats(current_user=user))
+    assert db.commands - before == 1
+    assert progress["overall"] == {"visited": 3, "total": 6, "percentage": 50.0}
+    assert progress["totalPoints"] == 40
+    assert progress["continents"]["Asia"]["visited"] == 2
+    assert (progress["countries"]["c0"]["visited"], progress["countries"]["c1"]["percentage"]) == (2, 50.0)
+
+    stats = asyncio.run(server.get_stats(current_user=user))
+    assert (stats["total_visits"], stats["countries_visited"], stats["continents_visited"]) == (4, 2, 1)
+    assert db.user_progress.docs[0]["completed_countries"] == ["c0"]
+    assert db.user_progress.docs[0]["country_visits"] == ["c0", "c1"]
+
+    # Visited filters come from the bitset the visits set
+    before = db.commands
+    status = asyncio.run(server.check_country_visit_status("c2", current_user=user))
+    assert (status["visited"], db.commands - before) == (False, 2)
+    visited = VisitedSet.from_progress(db.user_progress.docs[0], server.catalog_store._snapshot)
+    assert set(visited) == {"c0_l0", "c0_l1", "c1_l0"}
+
+
+def test_concurrent_visits_by_one_user_award_everything_once(monkeypatch):
+    # Day 7 of a streak; both landmarks of the country posted ten times at once
+    yesterday = (date.today() - timedelta(days=1)).isoformat()
+    db, user = _setup(monkeypatch, 3, last_visit_date=yesterday, current_streak=6, longest_streak=6)
+
+    async def hammer():
+        return await asyncio.gather(*(
+            server.add_visit(server.VisitCreate(landmark_id=f"c0_l{i % 2}"), current_user=user)
+            for i in range(20)
+        ))
+
+    responses = asyncio.run(hammer())
+    assert len(db.jobs.docs) == 20
+    assert asyncio.run(server.job_queue.drain(db)) == 20
+
+    user_doc = db.users.docs[0]
+    # 20 visits x 10 + country bonus 20 + first-in-continent 50 + country completion 50
+    assert user_doc["points"] == 200 + 20 + 50 + 50
+    assert (user_doc["current_streak"], user_doc["longest_streak"]) == (7, 7)
+    assert [r["new_milestone"] for r in responses].count(7) == 1
+    assert sum(r["country_completed"] for r in responses) == 1
+    assert len(db.country_visits.docs) == 1
+    assert {k: db.user_progress.docs[0][k] for k in ("visits", "landmarks", "countries")} == {
+        "visits": 20, "landmarks": 2, "countries": {"c0": 2}}
+
+    activities = [a["activity_type"] for a in db.activities.docs]
+    assert (activities.count("visit"), activities.count("country_complete"), activities.count("milestone")) == (20, 1, 1)
+    badges = [a["badge_type"] for a in db.achievements.docs]
+    assert len(badges) == len(set(badges)) and "first_visit" in badges
+    # One notification per badge, however many jobs saw it
+    assert sorted(n["related_id"] for n in db.notifications.docs) == sorted(badges)
+    # Each badge is reported by exactly one visit: the one whose job awarded it
+    reported = []
+    for response in responses:
+        effects = asyncio.run(server.get_visit_effects(response["visit_id"], current_user=user))
+        assert effects["status"] == "done"
+        reported += [badge["badge_type"] for badge in effects["newly_awarded_badges"]]
+    assert sorted(reported) == sorted(badges)
+
+    # Delivery is at-least-once: running every job again writes nothing new
+    for job in db.jobs.docs:
+        job["status"] = "queued"
+    assert asyncio.run(server.job_queue.drain(db)) == 20
+    assert (len(db.activities.docs), len(db.achievements.docs), len(db.notifications.docs)) == (
+        len(activities), len(badges), len(badges))
+
+    # Scoped boards count the same points as the user's total, bonuses included
+    rollups = {r["scope"]: r for r in db.leaderboard_rollups.docs}
+    assert (rollups["country:c0"]["points"], rollups["country:c0"]["landmarks"], rollups["country:c0"]["countries"]) == (
+        user_doc["points"], 2, 1)
+    assert rollups["continent:Asia"]["points"] == user_doc["points"]
+
+    # ... and a rebuild from visits and country visits comes to the same counters
+    groups = {}
+    for visit in db.visits.docs:
+        group = groups.setdefault(visit["landmark_id"], {
+            "user_id": "u1", "landmark_id": visit["landmark_id"], "points": 0, "first_at": visit["created_at"]})
+        group["points"] += visit["points_earned"]
+        group["first_at"] = min(group["first_at"], visit["created_at"])
+    rebuilt = build_rollups(list(groups.values()), db.country_visits.docs, server.catalog_store._snapshot.landmarks_by_id)
+    assert rebuilt[("country:c0", "u1")] == {k: rollups["country:c0"][k] for k in ("points", "landmarks", "countries")}
+
+
+
+def test_effects_still_run_when_the_request_dies_after_the_visit(monkeypatch):
+    db, user = _setup(monkeypatch, 1)
+
+    async def crash(*args, **kwargs):
+        raise ConnectionError("mongo went away")
+
+    monkeypatch.setattr(server, "advance_streak", crash)
+    with pytest.raises(ConnectionError):
+        asyncio.run(server.add_visit(server.VisitCreate(landmark_id="c0_l0"), current_user=user))
+    visit, = db.visits.docs
+    # Not due until the grace period is up
+    assert asyncio.run(server.job_queue.drain(db)) == 0
+
+    db.jobs.docs[0]["run_at"] = datetime.now(timezone.utc) - timedelta(seconds=1)
+    assert asyncio.run(server.job_queue.drain(db)) == 1
+    activity, = db.activities.docs
+    assert (activity["activity_type"], activity["visit_id"]) == ("visit", visit["visit_id"])
+    assert "first_visit" in [a["badge_type"] for a in db.achievements.docs]
+
+
+def test_effects_of_a_visit_that_was_never_saved_do_nothing(monkeypatch):
+    db, user = _setup(monkeypatch, 1)
+
+    async def crash(doc):
+        raise ConnectionError("mongo went away")
+
+    monkeypatch.setattr(db.visits, "insert_one", crash)
+    with pytest.raises(ConnectionError):
+        asyncio.run(server.add_visit(server.VisitCreate(landmark_id="c0_l0"), current_user=user))
+
+    db.jobs.docs[0]["run_at"] = datetime.now(timezone.utc) - timedelta(seconds=1)
+    assert asyncio.run(server.job_queue.drain(db)) == 1
+    assert db.jobs.docs[0]["result"]["visit_saved"] is False
+    assert db.activities.docs == [] and db.achievements.docs == []
@@ -0,0 +1,99 @@
+"""
+Unit tests for the in-memory catalog snapshot (catalog.py)
+"""
+
+from catalog import CatalogSnapshot, _plan_publish, content_hash
+
+COUNTRIES = [
+    {"country_id": "norway", "name": "Norway", "continent": "Europe"},
+    {"country_id": "japan", "name": "Japan", "continent": "Asia"},
+    {"country_id": "peru", "name": "Peru", "continent": "South America"},
+]
+
+LANDMARKS = [
+    {"landmark_id": "norway_bryggen", "name": "Bryggen", "country_id": "norway", "country_name": "Norway",
+     "continent": "Europe", "category": "official", "points": 10, "upvotes": 4},
+    {"landmark_id": "norway_trolltunga", "name": "Trolltunga", "country_id": "norway", "country_name": "Norway",
+     "continent": "Europe", "category": "premium", "points": 25, "upvotes": 9},
+    {"landmark_id": "norway_geirangerfjord", "name": "Geirangerfjord", "country_id": "norway",
+     "country_name": "Norway", "continent": "Europe", "category": "official", "points": 10, "upvotes": 7},
+    {"landmark_id": "japan_fuji", "name": "Mount Fuji", "country_id": "japan", "country_name": "Japan",
+     "continent": "Asia", "category": "official", "points": 10, "upvotes": 1},
+]
+
+
+def _snapshot():
+    return CatalogSnapshot.build(1, COUNTRIES, LANDMARKS)
+
+
+def test_summary_totals():
+    summary = _snapshot().summary
+    countries = {c["country_id"]: c for c in summary.countries}
+    assert (countries["norway"]["landmark_count"], countries["norway"]["total_points"]) == (3, 45)
+    assert (countries["peru"]["landmark_count"], countries["peru"]["total_points"]) == (0, 0)
+    assert [c["continent"] for c in summary.continents] == ["Asia", "Europe"]
+    assert dict(summary.grand_total) == {"landmarks": 4, "points": 55, "countries": 2}
+
+
+def test_with_landmark_replaces_and_adds():
+    snapshot = _snapshot()
+    updated = snapshot.with_landmark(dict(LANDMARKS[3], upvotes=2), version=2)
+    assert updated.version == 2
+    assert updated.landmarks_by_id["japan_fuji"]["upvotes"] == 2
+    assert snapshot.landmarks_by_id["japan_fuji"]["upvotes"] == 1
+
+    added = updated.with_landmark(
+        {"landmark_id": "peru_machu_picchu", "name": "Machu Picchu", "country_id": "peru",
+         "country_name": "Peru", "continent": "South America", "category": "official", "points": 10},
+        version=3,
+    )
+    assert len(added.landmarks) == 5
+    assert added.summary.grand_total["countries"] == 3
+
+
+def test_ordered_landmarks_puts_official_first():
+    snapshot = _snapshot()
+    ids = [l["landmark_id"] for l in snapshot.ordered_landmarks("upvotes_desc", "norway")]
+    assert ids == ["norway_geirangerfjord", "norway_bryggen", "norway_trolltunga"]
+
+    ids = [l["landmark_id"] for l in snapshot.ordered_landmarks("name_desc")]
+    assert ids == ["japan_fuji", "norway_geirangerfjord", "norway_bryggen", "norway_trolltunga"]
+
+    # Unknown sort keys fall back to name order
+    ids = [l["landmark_id"] for l in snapshot.ordered_landmarks("bogus", "norway")]
+    assert ids == ["norway_bryggen", "norway_geirangerfjord", "norway_trolltunga"]
+    assert snapshot.ordered_landmarks("bogus", "norway") is snapshot.ordered_landmarks("name_asc", "norway")
+
+
+def test_plan_publish_stamps_changes_and_finds_deletions():
+    stamped = dict(LANDMARKS[0], updated_version=3)
+    stamped["content_hash"] = content_hash(stamped)
+    edited = dict(LANDMARKS[1], updated_version=3, content_hash=content_hash(LANDMARKS[1]), points=30)
+    meta = {"version": 3, "landmark_ids": ["norway_bryggen", "norway_trolltunga", "japan_gone"]}
+
+    plan = _plan_publish(meta, {"country": COUNTRIES, "landmark": [stamped, edited, LANDMARKS[3]]})
+    assert [doc_id for doc_id, _ in plan["stamps"]["landmark"]] == ["norway_trolltunga", "japan_fuji"]
+    assert plan["deleted"] == {"country": [], "landmark": ["japan_gone"]}
+    assert len(plan["stamps"]["country"]) == 3
+
+
+def test_changes_since():
+    landmarks = [dict(l, updated_version=1, content_hash="x") for l in LANDMARKS]
+    landmarks[3]["updated_version"] = 3
+    tombstones = [
+        {"kind": "landmark", "id": "peru_nazca", "version": 2},
+        {"kind": "landmark", "id": "norway_bryggen", "version": 3},  # re-added since
+    ]
+    snapshot = CatalogSnapshot.build(3, COUNTRIES, landmarks, tombstones=tombstones)
+
+    delta = snapshot.changes_since(1)
+    assert not delta["full"]
+    assert [l["landmark_id"] for l in delta["landmarks"]] == ["japan_fuji"]
+    assert "content_hash" not in delta["landmarks"][0]
+    assert delta["deleted_landmark_ids"] == ["peru_nazca"]
+    assert snapshot.changes_since(2)["deleted_landmark_ids"] == []
+    assert snapshot.changes_since(3)["landmarks"] == []
+
+    for since in (None, 0, 7):
+        bundle = snapshot.changes_since(since)
+        assert bundle["full"] and len(bundle["landmarks"]) == 4 and bundle["deleted_landmark_ids"] == []
@@ -0,0 +1,153 @@
+"""
+Unit tests for bulk catalog patch validation (catalog_bulk.py)
+"""
+
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from pymongo import DeleteOne, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError
+
+import catalog_bulk
+from catalog import CatalogSnapshot
+from catalog_bulk import CatalogBatchPartiallyApplied, apply_patches, build_operations, validate_patches
+
+CREATED = datetime(2024, 5, 1, tzinfo=timezone.utc)
+
+COUNTRIES = [
+    {"country_id": "norway", "name": "Norway", "continent": "Europe"},
+    {"country_id": "peru", "name": "Peru", "continent": "South America"},
+]
+
+LANDMARKS = [
+    {"landmark_id": "norway_bryggen", "name": "Bryggen", "country_id": "norway", "country_name": "Norway",
+     "continent": "Europe", "description": "Wharf", "category": "official", "points": 10, "upvotes": 4,
+     "created_at": CREATED},
+]
+
+SNAPSHOT = CatalogSnapshot.build(1, COUNTRIES, LANDMARKS)
+
+MACHU_PICCHU = {"name": "Machu Picchu", "country_id": "peru", "description": "Inca citadel", "category": "premium",
+                "facts": [{"text": "Built around 1450", "icon": "time-outline"}]}
+
+
+def test_valid_batch_builds_one_operation_list_per_collection():
+    patches = [
+        {"op": "update", "kind": "country", "id": "norway", "fields": {"name": "Kingdom of Norway"}},
+        {"op": "update", "kind": "landmark", "id": "norway_bryggen", "fields": {"points": 15}},
+        {"op": "upsert", "kind": "landmark", "id": "peru_machu_picchu", "fields": MACHU_PICCHU},
+    ]
+    assert validate_patches(patches, SNAPSHOT) == []
+
+    operations = build_operations(patches, SNAPSHOT)
+    assert [type(op) for op in operations["countries"]] == [UpdateOne]
+    assert [type(op) for op in operations["landmarks"]] == [UpdateOne, UpdateOne, UpdateMany]
+    upsert = operations["landmarks"][1]
+    assert upsert._upsert and upsert._filter == {"landmark_id": "peru_machu_picchu"}
+    created = upsert._doc["$set"]
+    assert (created["country_name"], created["continent"], created["points"]) == ("Peru", "South America", 25)
+    assert upsert._doc["$setOnInsert"]["upvotes"] == 0
+
+
+def test_upsert_keeps_fields_the_patch_does_not_own():
+    patch = {"op": "upsert", "kind": "landmark", "id": "norway_bryggen",
+             "fields": {"name": "Bryggen", "country_id": "norway", "description": "Hanseatic wharf", "category": "official"}}
+    update = build_operations([patch], SNAPSHOT)["landmarks"][0]._doc
+    # Writable fields left out are cleared; stored state is never in $set or $unset
+    assert {"images", "latitude", "facts"} <= set(update["$unset"])
+    touched = set(update["$set"]) | set(update["$unset"])
+    assert not touched & {"upvotes", "ordinal", "created_at", "image_placeholders", "created_by"}
+    assert set(update["$setOnInsert"]) == {"created_at", "upvotes"}
+
+
+def test_invalid_patches_are_all_reported():
+    patches = [
+        {"op": "update", "kind": "landmark", "id": "norway_bryggen", "fields": {"points": -5, "colour": "red"}},
+        {"op": "update", "kind": "landmark", "id": "nowhere", "fields": {"points": 10}},
+        {"op": "upsert", "kind": "landmark", "id": "atlantis_temple", "fields": dict(MACHU_PICCHU, country_id="atlantis")},
+        {"op": "upsert", "kind": "landmark", "id": "peru_nazca", "fields": {"name": "Nazca Lines"}},
+        {"op": "rename", "kind": "landmark", "id": "norway_bryggen"},
+        {"op": "upsert", "kind": "landmark", "id": "peru_colca", "fields": dict(MACHU_PICCHU, facts=[{"text": "No icon"}])},
+    ]
+    errors = validate_patches(patches, SNAPSHOT)
+    assert any("patch 0" in e and "'colour'" in e for e in errors)
+    assert any("patch 0" in e and "'points'" in e for e in errors)
+    assert any("patch 1" in e and "does not exist" in e for e in errors)
+    assert any("patch 2" in e and "unknown country 'atlantis'" in e for e in errors)
+    assert any("patch 3" in e and "'category'" in e for e in errors)
+    assert any("patch 4" in e and "op must be" in e for e in errors)
+    assert any("patch 5" in e and "'facts'" in e for e in errors)
+
+
+def test_deleting_a_country_needs_its_landmarks_deleted():
+    delete_norway = {"op": "delete", "kind": "country", "id": "norway"}
+    assert any("norway_bryggen" in e for e in validate_patches([delete_norway], SNAPSHOT))
+
+    patches = [delete_norway, {"op": "delete", "kind": "landmark", "id": "norway_bryggen"}]
+    assert validate_patches(patches, SNAPSHOT) == []
+    operations = build_operations(patches, SNAPSHOT)
+    assert [type(op) for op in operations["countries"] + operations["landmarks"]] == [DeleteOne, DeleteOne]
+
+
+def test_duplicate_and_empty_batches():
+    update = {"op": "update", "kind": "landmark", "id": "norway_bryggen", "fields": {"points": 12}}
+    assert any("more than once" in e for e in validate_patches([update, update], SNAPSHOT))
+    assert validate_patches([], SNAPSHOT) == ["batch is empty"]
+
+
+class FakeCollection:
+    def __init__(self, error=None):
+        self.error = error
+
+    async def bulk_write(self, ops, ordered=True):
+        if self.error:
+            raise self.error
+
+
+class FakeDb:
+    def __init__(self, **errors):
+        self.collections = {name: FakeCollection(errors.get(name)) for name in ("countries", "landmarks")}
+
+    def __getitem__(self, name):
+        return self.collections[name]
+
+
+@pytest.fixture
+def published(monkeypatch):
+    versions = []
+
+    async def reload(db):
+        return SNAPSHOT
+
+    async def publish(db):
+        versions.append(len(versions) + 2)
+        return versions[-1]
+
+    monkeypatch.setattr(catalog_bulk.catalog_store, "reload", reload)
+    monkeypatch.setattr(catalog_bulk, "publish_catalog_changes", publish)
+    return versions
+
+
+BATCH = [
+    {"op": "update", "kind": "country", "id": "norway", "fields": {"image_url": "https://example.com/n.jpg"}},
+    {"op": "update", "kind": "landmark", "id": "norway_bryggen", "fields": {"description": "Hanseatic wharf"}},
+    {"op": "upsert", "kind": "landmark", "id": "peru_machu_picchu", "fields": MACHU_PICCHU},
+]
+
+
+def test_a_partially_applied_batch_is_published_and_reported(published):
+    failed = BulkWriteError({"writeErrors": [{"index": 1, "code": 11000}]})
+    with pytest.raises(CatalogBatchPartiallyApplied) as partial:
+        asyncio.run(apply_patches(FakeDb(landmarks=failed), BATCH))
+    assert partial.value.applied == {"countries": 1, "landmarks": 1}
+    assert (partial.value.version, published) == (2, [2])
+
+
+def test_nothing_written_publishes_nothing(published):
+    failed = BulkWriteError({"writeErrors": [{"index": 0, "code": 11000}]})
+    with pytest.raises(BulkWriteError):
+        asyncio.run(apply_patches(FakeDb(countries=failed), BATCH))
+    assert published == []
+
+    assert asyncio.run(apply_patches(FakeDb(), BATCH))["version"] == 2
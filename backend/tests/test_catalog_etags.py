@@ -0,0 +1,105 @@
+"""
+ETags and conditional GETs on the catalog endpoints (server.catalog_etag / not_modified)
+"""
+
+import asyncio
+import os
+from datetime import datetime, timezone
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "catalog_etag_test")
+
+import pytest  # noqa: E402
+from fastapi import Request, Response  # noqa: E402
+
+import server  # noqa: E402
+from catalog import CatalogSnapshot  # noqa: E402
+from conftest import UntouchableDb  # noqa: E402
+
+NOW = datetime.now(timezone.utc)
+
+
+def _catalog(version, eiffel_points=10):
+    countries = [{"country_id": "france", "name": "France", "continent": "Europe"}]
+    landmarks = [
+        {"landmark_id": "eiffel", "name": "Eiffel Tower", "points": eiffel_points, "category": "official"},
+        {"landmark_id": "versailles", "name": "Versailles", "points": 25, "category": "premium"},
+    ]
+    for landmark in landmarks:
+        landmark.update(country_id="france", country_name="France", continent="Europe", description="", created_at=NOW)
+    return CatalogSnapshot.build(version, countries, landmarks)
+
+
+@pytest.fixture(autouse=True)
+def catalog(monkeypatch):
+    monkeypatch.setattr(server.catalog_store, "_snapshot", _catalog(1))
+    monkeypatch.setattr(server, "db", UntouchableDb())
+
+
+def _request(query=b"", etag=None):
+    headers = [(b"if-none-match", etag.encode())] if etag else []
+    return Request({"type": "http", "method": "GET", "path": "/", "query_string": query, "headers": headers})
+
+
+def _user(tier="free"):
+    return server.User(user_id="u1", email="u1@example.com", name="U1", created_at=NOW, subscription_tier=tier)
+
+
+def _landmarks(query=b"", etag=None, tier="free", **params):
+    response = Response()
+    result = asyncio.run(server.get_landmarks(
+        _request(query, etag), response, **{"sort_by": "name_asc", **params}, current_user=_user(tier)
+    ))
+    return result, response
+
+
+def _countries(etag=None):
+    response = Response()
+    result = asyncio.run(server.get_countries(_request(etag=etag), response, current_user=_user()))
+    return result, response
+
+
+def test_etag_is_stable_and_quoted():
+    assert server.catalog_etag("countries", 1) == server.catalog_etag("countries", 1)
+    assert server.catalog_etag("countries", 1) != server.catalog_etag("countries", 2)
+    etag = server.catalog_etag("countries", 1)
+    assert etag.startswith('"') and etag.endswith('"')
+
+
+def test_if_none_match_returns_304():
+    result, response = _countries()
+    assert result.status_code == 200
+    etag = response.headers["etag"]
+    assert response.headers["cache-control"] == "private, no-cache"
+
+    for header in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        cached, _ = _countries(etag=header)
+        assert cached.status_code == 304
+        assert cached.headers["etag"] == etag and not cached.body
+
+    stale, _ = _countries(etag='"other"')
+    assert stale.status_code == 200
+
+
+def test_version_bump_changes_the_etag(monkeypatch):
+    _, response = _countries()
+    etag = response.headers["etag"]
+
+    monkeypatch.setattr(server.catalog_store, "_snapshot", _catalog(2, eiffel_points=15))
+    result, response = _countries(etag=etag)
+    assert result.status_code == 200 and response.headers["etag"] != etag
+    _, landmark_response = _landmarks()
+    assert _landmarks(etag=landmark_response.headers["etag"])[0].status_code == 304
+
+
+def test_landmark_etags_split_by_tier_and_query():
+    _, free = _landmarks()
+    _, pro = _landmarks(tier="pro")
+    _, europe = _landmarks(query=b"continent=Europe", continent="Europe")
+    etags = {free.headers["etag"], pro.headers["etag"], europe.headers["etag"]}
+    assert len(etags) == 3
+
+    # is_locked differs by tier, so one tier's ETag never validates the other's body
+    assert _landmarks(etag=free.headers["etag"], tier="pro")[0].status_code == 200
+    assert _landmarks(etag=pro.headers["etag"], tier="pro")[0].status_code == 304
+    assert _landmarks(query=b"continent=Europe", etag=free.headers["etag"], continent="Europe")[0].status_code == 200
@@ -0,0 +1,87 @@
+"""
+Unit tests for the compiled catalog snapshot file (catalog_file.py)
+"""
+
+import asyncio
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from catalog import CatalogStore
+from catalog_file import CatalogFileError, read_catalog_file, write_catalog_file
+
+CREATED = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+
+COUNTRIES = [
+    {"country_id": "norway", "name": "Norway", "continent": "Europe"},
+    {"country_id": "japan", "name": "Japan", "continent": "Asia"},
+]
+
+LANDMARKS = [
+    {"landmark_id": f"norway_{i:05d}", "name": f"Fjord {i} – Ålesund", "country_id": "norway",
+     "country_name": "Norway", "continent": "Europe", "category": "official", "points": 10,
+     "facts": [{"title": "Fact", "text": "Ænd"}], "created_at": CREATED, "_id": object()}
+    for i in range(10000)
+]
+
+TOMBSTONES = [{"kind": "landmark", "id": "japan_gone", "version": 6, "deleted": True}]
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path / "catalog.json"
+    write_catalog_file(path, 7, COUNTRIES, LANDMARKS[:50], TOMBSTONES)
+
+    contents = read_catalog_file(path, expected_version=7)
+    assert contents["version"] == 7
+    assert [c["country_id"] for c in contents["countries"]] == ["japan", "norway"]
+    assert len(contents["landmarks"]) == 50
+    assert "_id" not in contents["landmarks"][0]
+    assert contents["landmarks"][3]["created_at"] == CREATED
+    assert contents["landmarks"][3]["name"] == "Fjord 3 – Ålesund"
+    assert contents["tombstones"] == TOMBSTONES
+
+
+def test_stale_missing_and_corrupt_files(tmp_path):
+    path = tmp_path / "catalog.json"
+    assert read_catalog_file(path) is None
+    write_catalog_file(path, 7, COUNTRIES, [])
+    assert read_catalog_file(path, expected_version=8) is None
+
+    path.write_bytes(b"not a catalog file at all" * 10)
+    with pytest.raises(CatalogFileError):
+        read_catalog_file(path)
+
+    # Valid JSON, but not a compiled catalog
+    path.write_text('{"version": 7}')
+    with pytest.raises(CatalogFileError):
+        read_catalog_file(path)
+
+
+class FakeMeta:
+    def __init__(self, version):
+        self.version = version
+
+    async def find_one(self, query, projection=None):
+        return {"version": self.version}
+
+
+class FakeDb:
+    def __init__(self, version):
+        self.catalog_meta = FakeMeta(version)
+
+
+def test_store_loads_10k_landmarks_from_file_quickly(tmp_path):
+    path = tmp_path / "catalog.json"
+    write_catalog_file(path, 3, COUNTRIES, LANDMARKS, TOMBSTONES)
+
+    store = CatalogStore()
+    started = time.perf_counter()
+    snapshot = asyncio.run(store.load(FakeDb(3), path))
+    elapsed = time.perf_counter() - started
+
+    assert snapshot.version == 3
+    assert len(snapshot.landmarks) == 10000
+    assert snapshot.landmarks_by_id["norway_00001"]["created_at"] == CREATED
+    assert snapshot.summary.grand_total["landmarks"] == 10000
+    assert elapsed < 2
@@ -0,0 +1,120 @@
+"""
+Unit tests for the in-process landmark search index (catalog_search.py)
+"""
+
+from catalog_search import PrefixIndex, SearchIndex, fold, tokenize
+
+LANDMARKS = [
+    {"landmark_id": "france_sacre_coeur", "name": "Sacré-Cœur", "country_name": "France",
+     "description": "Basilica on the summit of Montmartre in Paris."},
+    {"landmark_id": "france_eiffel_tower", "name": "Eiffel Tower", "country_name": "France",
+     "description": "Iron lattice tower on the Champ de Mars in Paris."},
+    {"landmark_id": "japan_tokyo_tower", "name": "Tokyo Tower", "country_name": "Japan",
+     "description": "Communications tower inspired by the Eiffel Tower."},
+    {"landmark_id": "peru_machu_picchu", "name": "Machu Picchu", "country_name": "Peru",
+     "description": "15th-century Inca citadel (c. 1450) in the Andes."},
+]
+
+
+def test_fold_strips_accents_and_case():
+    assert fold("Sacré-Cœur") == "sacre-coeur"
+    assert tokenize("São Paulo, BRASÍLIA") == ["sao", "paulo", "brasilia"]
+
+
+def test_accent_insensitive_match():
+    index = SearchIndex(LANDMARKS)
+    results = index.search("sacre coeur")
+    assert [l["landmark_id"] for l, _ in results] == ["france_sacre_coeur"]
+
+
+def test_name_hit_ranks_above_description_hit():
+    index = SearchIndex(LANDMARKS)
+    ids = [l["landmark_id"] for l, _ in index.search("eiffel")]
+    assert ids == ["france_eiffel_tower", "japan_tokyo_tower"]
+
+
+def test_country_hit_ranks_above_description_hit():
+    index = SearchIndex(LANDMARKS + [
+        {"landmark_id": "peru_ceviche_tour", "name": "Lima Food Tour", "country_name": "Peru",
+         "description": "Japan-Peruvian nikkei cuisine tasting."},
+    ])
+    ids = [l["landmark_id"] for l, _ in index.search("japan")]
+    assert ids == ["japan_tokyo_tower", "peru_ceviche_tour"]
+
+
+def test_all_terms_must_match():
+    index = SearchIndex(LANDMARKS)
+    ids = [l["landmark_id"] for l, _ in index.search("tower japan")]
+    assert ids == ["japan_tokyo_tower"]
+
+
+def test_last_term_matches_as_prefix():
+    index = SearchIndex(LANDMARKS)
+    ids = [l["landmark_id"] for l, _ in index.search("machu pic")]
+    assert ids == ["peru_machu_picchu"]
+
+
+def test_input_is_plain_text_not_a_pattern():
+    index = SearchIndex(LANDMARKS)
+    assert index.search(".*") == []
+    assert [l["landmark_id"] for l, _ in index.search("(c. 1450)")] == ["peru_machu_picchu"]
+
+
+def test_limit():
+    index = SearchIndex(LANDMARKS)
+    assert len(index.search("tower", limit=1)) == 1
+
+
+COUNTRIES = [
+    {"country_id": "france", "name": "France"},
+    {"country_id": "japan", "name": "Japan"},
+    {"country_id": "peru", "name": "Peru"},
+]
+
+
+def _autocomplete_landmarks():
+    return [
+        dict(LANDMARKS[0], upvotes=3, points=10),
+        dict(LANDMARKS[1], upvotes=40, points=10),
+        dict(LANDMARKS[2], upvotes=7, points=25, alternate_names=["Nippon Denpatō"]),
+        dict(LANDMARKS[3], upvotes=12, points=10),
+    ]
+
+
+def test_autocomplete_ranks_by_upvotes():
+    index = PrefixIndex(_autocomplete_landmarks(), COUNTRIES)
+    labels = [s["label"] for s in index.suggest("tow")]
+    assert labels == ["Eiffel Tower", "Tokyo Tower"]
+
+
+def test_autocomplete_matches_word_starts_alternate_and_country_names():
+    index = PrefixIndex(_autocomplete_landmarks(), COUNTRIES)
+    assert [s["id"] for s in index.suggest("picc")] == ["peru_machu_picchu"]
+    assert [s["id"] for s in index.suggest("nippon den")] == ["japan_tokyo_tower"]
+    assert [(s["type"], s["id"]) for s in index.suggest("jap")] == [("country", "japan")]
+    assert [s["id"] for s in index.suggest("SACRE")] == ["france_sacre_coeur"]
+
+
+def test_autocomplete_limit_and_empty_prefix():
+    index = PrefixIndex(_autocomplete_landmarks(), COUNTRIES)
+    assert len(index.suggest("t", limit=1)) == 1
+    assert index.suggest("  ") == []
+
+
+def test_autocomplete_incremental_update_matches_full_rebuild():
+    landmarks = _autocomplete_landmarks()
+    base = PrefixIndex(landmarks, COUNTRIES)
+
+    changed = [
+        dict(landmarks[0], name="Basilique du Sacré-Cœur"),  # renamed
+        dict(landmarks[1], upvotes=1),  # re-ranked only
+        landmarks[2],
+        {"landmark_id": "peru_rainbow_mountain", "name": "Rainbow Mountain", "country_id": "peru",
+         "country_name": "Peru", "upvotes": 50, "points": 25},
+    ]  # machu picchu removed
+    incremental = base.updated(changed, COUNTRIES)
+    full = PrefixIndex(changed, COUNTRIES)
+
+    for prefix in ["basil", "sacre", "tow", "machu", "rain", "p", "t"]:
+        assert incremental.suggest(prefix) == full.suggest(prefix), prefix
+    assert [s["label"] for s in incremental.suggest("tow")] == ["Tokyo Tower", "Eiffel Tower"]
@@ -0,0 +1,79 @@
+"""
+Unit tests for diff-based seeding (catalog_seeding.py)
+"""
+
+import os
+from datetime import datetime, timezone
+
+import pytest
+from pymongo import DeleteOne
+
+from catalog_seeding import plan_sync
+
+CREATED = datetime(2024, 5, 1, tzinfo=timezone.utc)
+
+
+def _landmark(landmark_id, **fields):
+    doc = {"landmark_id": landmark_id, "name": landmark_id.title(), "country_id": "norway", "category": "official",
+           "points": 10, "upvotes": 0, "created_by": None, "created_at": datetime.now(timezone.utc)}
+    doc.update(fields)
+    return doc
+
+
+def test_only_new_and_changed_documents_are_written():
+    stored = [
+        # Runtime state and job output must not count as a change
+        _landmark("bryggen", upvotes=42, created_at=CREATED, updated_version=3, content_hash="x",
+                  image_placeholders=[{"url": "u"}]),
+        _landmark("trolltunga", created_at=CREATED),
+    ]
+    desired = [_landmark("bryggen"), _landmark("trolltunga", points=25), _landmark("preikestolen")]
+
+    plan = plan_sync("landmark", desired, stored)
+    assert plan["counts"] == {"inserted": 1, "updated": 1, "unchanged": 1, "deleted": 0}
+
+    updates = {op._filter["landmark_id"]: op._doc for op in plan["operations"]}
+    assert set(updates) == {"trolltunga", "preikestolen"}
+    assert updates["trolltunga"]["$set"]["points"] == 25
+    # upvotes / created_at are only written when the document is inserted
+    assert "upvotes" not in updates["trolltunga"]["$set"]
+    assert set(updates["trolltunga"]["$setOnInsert"]) == {"created_at", "upvotes"}
+
+
+def test_reseeding_the_same_data_is_a_no_op():
+    desired = [_landmark("bryggen"), _landmark("trolltunga")]
+    stored = [dict(doc, created_at=CREATED, upvotes=7) for doc in desired]
+    assert plan_sync("landmark", desired, stored)["operations"] == []
+
+
+def test_prune_keeps_user_created_landmarks():
+    stored = [_landmark("bryggen"), _landmark("old_seed"), _landmark("users_own", created_by="user_1")]
+    plan = plan_sync("landmark", [_landmark("bryggen")], stored, prune=True)
+    assert [type(op) for op in plan["operations"]] == [DeleteOne]
+    assert plan["operations"][0]._filter == {"landmark_id": "old_seed"}
+    assert plan_sync("landmark", [_landmark("bryggen")], stored)["counts"]["deleted"] == 0
+
+
+def test_duplicate_ids_in_the_seed_are_rejected():
+    with pytest.raises(ValueError):
+        plan_sync("landmark", [_landmark("bryggen"), _landmark("bryggen")], [])
+
+
+def test_fields_the_seed_leaves_out_are_not_touched():
+    stored = [_landmark("bryggen", latitude=60.397, longitude=5.324, facts=[{"text": "Hanseatic", "icon": "i"}])]
+    assert plan_sync("landmark", [_landmark("bryggen")], stored)["operations"] == []
+
+    update, = plan_sync("landmark", [_landmark("bryggen", points=15)], stored)["operations"]
+    assert not {"latitude", "longitude", "facts"} & set(update._doc["$set"])
+
+
+def test_seeds_leave_coordinates_out(monkeypatch):
+    # The seed scripts connect on import (lazily; nothing is sent)
+    monkeypatch.setenv("MONGO_URL", os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    monkeypatch.setenv("DB_NAME", os.environ.get("DB_NAME", "seed_test"))
+    import seed_data
+    import seed_data_expansion
+
+    for seed in (seed_data, seed_data_expansion):
+        _, landmarks = seed.build_catalog()
+        assert not any(landmark.get("latitude", 0) is None or landmark.get("longitude", 0) is None for landmark in landmarks)
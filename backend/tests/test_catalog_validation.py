@@ -0,0 +1,131 @@
+"""
+Unit tests for catalog validation (catalog_validation.py)
+"""
+
+import random
+import time
+
+from catalog import CatalogSnapshot
+from catalog_bulk import preview_catalog
+from catalog_validation import ERROR, WARNING, new_issues, similar_name_pairs, validate_catalog
+
+COUNTRIES = [
+    {"country_id": "norway", "name": "Norway", "continent": "Europe"},
+    {"country_id": "peru", "name": "Peru", "continent": "South America"},
+]
+
+
+def _landmark(landmark_id, name, country_id="norway", lat=None, lng=None, **fields):
+    doc = {"landmark_id": landmark_id, "name": name, "country_id": country_id, "category": "official",
+           "points": 10, "latitude": lat, "longitude": lng, "image_url": f"https://img.example/{landmark_id}.jpg"}
+    doc.update(fields)
+    return doc
+
+
+NORWAY = [
+    _landmark("bryggen", "Bryggen", lat=60.397, lng=5.324),
+    _landmark("preikestolen", "Preikestolen", lat=58.986, lng=6.190),
+    _landmark("geiranger", "Geirangerfjord", lat=62.101, lng=7.094),
+    _landmark("nordkapp", "North Cape", lat=71.169, lng=25.783),
+]
+
+
+def _checks(issues, severity=None):
+    return {(i["check"], tuple(i["ids"])) for i in issues if severity is None or i["severity"] == severity}
+
+
+def test_clean_catalog_has_no_issues():
+    assert validate_catalog(COUNTRIES, NORWAY) == []
+
+
+def test_name_duplicates():
+    landmarks = NORWAY + [
+        _landmark("bryggen_2", "The Bryggen"),
+        _landmark("geiranger_2", "Geirangerfjorden"),
+        _landmark("peru_bryggen", "Bryggen", country_id="peru"),
+    ]
+    issues = validate_catalog(COUNTRIES, landmarks)
+    assert _checks(issues, ERROR) == {("duplicate_name", ("bryggen", "bryggen_2"))}
+    assert _checks(issues, WARNING) == {
+        ("duplicate_name", ("geiranger", "geiranger_2")),
+        ("duplicate_name", ("bryggen", "peru_bryggen")),
+    }
+
+
+def test_similar_name_pairs_matches_brute_force():
+    random.seed(7)
+    words = ["lake", "tower", "old", "town", "falls", "fjord", "castle", "north", "cape", "st", "olaf"]
+    keys = [" ".join(random.sample(words, random.randint(1, 3))) for _ in range(300)]
+    found = {(i, j) for i, j, _ in similar_name_pairs(keys, threshold=0.6)}
+
+    def jaccard(a, b):
+        grams = [{f" {k} "[n:n + 3] for n in range(len(k))} for k in (a, b)]
+        return len(grams[0] & grams[1]) / len(grams[0] | grams[1])
+
+    expected = {(i, j) for j in range(len(keys)) for i in range(j) if jaccard(keys[i], keys[j]) >= 0.6}
+    assert found == expected
+
+
+def test_coordinate_checks():
+    landmarks = NORWAY + [
+        _landmark("swapped", "Trolltunga", lat=6.740, lng=60.124),
+        _landmark("invalid", "Lofoten", lat=68.2, lng=None),
+        _landmark("far", "Svalbard Seed Vault", lat=-33.9, lng=18.4),
+        _landmark("next_door", "Bryggens Museum", lat=60.3975, lng=5.3245),
+    ]
+    issues = validate_catalog(COUNTRIES, landmarks)
+    assert _checks(issues, ERROR) == {
+        ("swapped_coordinates", ("swapped",)),
+        ("invalid_coordinates", ("invalid",)),
+    }
+    assert _checks(issues, WARNING) == {
+        ("out_of_country", ("far",)),
+        ("too_close", ("bryggen", "next_door")),
+    }
+
+
+def test_references_points_and_images():
+    landmarks = NORWAY + [
+        _landmark("orphan", "Nazca Lines", country_id="atlantis"),
+        _landmark("cheap_premium", "Atlantic Road", category="premium", points=10),
+        _landmark("negative", "Jostedalsbreen", points=-1),
+        _landmark("suggested", "Secret Beach", category="user_suggested", points=3),
+        _landmark("copycat", "Ålesund", image_url="https://IMG.example/bryggen.jpg?w=400",
+                  images=["https://img.example/copycat.jpg"]),
+    ]
+    issues = validate_catalog(COUNTRIES, landmarks)
+    assert _checks(issues, ERROR) == {
+        ("orphan_country", ("orphan",)),
+        ("points", ("cheap_premium",)),
+        ("points", ("negative",)),
+    }
+    assert _checks(issues, WARNING) == {("reused_image", ("bryggen", "copycat"))}
+    assert [i["severity"] for i in issues][:3] == [ERROR] * 3
+
+
+def test_only_issues_added_by_a_batch_are_new():
+    snapshot = CatalogSnapshot.build(1, COUNTRIES, NORWAY + [_landmark("orphan", "Nazca", country_id="atlantis")])
+    patches = [
+        {"op": "upsert", "kind": "landmark", "id": "bryggen_2",
+         "fields": {"name": "Bryggen", "country_id": "norway", "description": "", "category": "official"}},
+        {"op": "delete", "kind": "landmark", "id": "nordkapp"},
+    ]
+    before = validate_catalog(snapshot.countries, snapshot.landmarks)
+    issues = new_issues(before, validate_catalog(*preview_catalog(patches, snapshot)))
+    assert _checks(issues) == {("duplicate_name", ("bryggen", "bryggen_2"))}
+
+
+def test_10k_landmarks_validate_in_well_under_a_second():
+    random.seed(1)
+    words = ["temple", "palace", "tower", "falls", "lake", "mount", "old", "town", "castle", "bridge",
+             "park", "national", "cathedral", "museum", "gate", "fort", "river", "bay", "island", "valley"]
+    countries = [{"country_id": f"c{i}", "name": f"C{i}", "continent": "Europe"} for i in range(100)]
+    landmarks = [
+        _landmark(f"l{i}", " ".join(random.sample(words, 3)) + f" {i}", country_id=f"c{i % 100}",
+                  lat=(i % 100) % 30 * 2 - 30 + random.random() * 3, lng=(i % 100) // 30 * 20 + random.random() * 3,
+                  images=[f"https://img.example/l{i}_b.jpg"])
+        for i in range(10_000)
+    ]
+    started = time.perf_counter()
+    validate_catalog(countries, landmarks)
+    assert time.perf_counter() - started < 1.0
@@ -0,0 +1,98 @@
+"""
+Removing duplicates that block a unique index (duplicates.py), and
+server.ensure_indexes running it before giving up on an index
+"""
+
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "duplicates_test")
+
+import pytest  # noqa: E402
+from pymongo.errors import OperationFailure  # noqa: E402
+
+import server  # noqa: E402
+from conftest import FakeCollection, FakeCursor, FakeDb  # noqa: E402
+from duplicates import merge_duplicate_country_visits, remove_duplicate_achievements  # noqa: E402
+
+NOW = datetime.now(timezone.utc)
+
+
+class IndexedCollection(FakeCollection):
+    """Answers the duplicate-group aggregation; refuses a unique index over duplicates"""
+
+    broken = False
+
+    def _groups(self, keys):
+        groups = {}
+        for doc in self.docs:
+            groups.setdefault(tuple(doc.get(key) for key in keys), []).append(doc["_id"])
+        return [ids for ids in groups.values() if len(ids) > 1]
+
+    def aggregate(self, pipeline, **kwargs):
+        keys = list(pipeline[0]["$group"]["_id"])
+        return FakeCursor([{"ids": ids, "count": len(ids)} for ids in self._groups(keys)])
+
+    async def create_index(self, keys, unique=False, **options):
+        if self.broken:
+            raise OperationFailure("not authorized")
+        if unique and self._groups([key for key, _ in keys]):
+            raise OperationFailure("E11000 duplicate key error", code=11000)
+
+
+class IndexedDb(FakeDb):
+    collection_class = IndexedCollection
+
+
+def test_duplicate_badges_keep_the_first_award():
+    db = IndexedDb()
+    db.achievements.docs += [
+        {"_id": 1, "user_id": "u1", "badge_type": "first_visit", "earned_at": NOW + timedelta(seconds=1)},
+        {"_id": 2, "user_id": "u1", "badge_type": "first_visit", "earned_at": NOW},
+        {"_id": 3, "user_id": "u1", "badge_type": "points_100", "earned_at": NOW},
+        {"_id": 4, "user_id": "u2", "badge_type": "first_visit", "earned_at": NOW},
+    ]
+    assert asyncio.run(remove_duplicate_achievements(db)) == 1
+    assert sorted(d["_id"] for d in db.achievements.docs) == [2, 3, 4]
+    assert asyncio.run(remove_duplicate_achievements(db)) == 0
+
+
+def test_duplicate_country_visits_are_merged_into_the_first():
+    db = IndexedDb()
+    db.country_visits.docs += [
+        {"_id": 1, "country_visit_id": "cv_a", "user_id": "u1", "country_id": "japan", "photos": [],
+         "diary": "", "points_earned": 50, "has_photos": False, "created_at": NOW},
+        {"_id": 2, "country_visit_id": "cv_b", "user_id": "u1", "country_id": "japan", "photos": ["p1", "p2"],
+         "diary": "Sakura", "points_earned": 50, "has_photos": True, "created_at": NOW + timedelta(seconds=1)},
+        {"_id": 3, "country_visit_id": "cv_c", "user_id": "u1", "country_id": "japan", "photos": ["p2", "p3"],
+         "diary": "Ramen", "points_earned": 50, "has_photos": True, "created_at": NOW + timedelta(seconds=2)},
+    ]
+    db.activities.docs.append({"activity_id": "act_b", "country_visit_id": "cv_b"})
+
+    assert asyncio.run(merge_duplicate_country_visits(db)) == 2
+    kept, = db.country_visits.docs
+    assert (kept["country_visit_id"], kept["photos"], kept["diary"]) == ("cv_a", ["p1", "p2", "p3"], "Sakura\n\nRamen")
+    assert (kept["has_photos"], kept["leaderboard_points_earned"]) == (True, 50)
+    assert db.activities.docs[0]["country_visit_id"] == "cv_a"
+    assert asyncio.run(merge_duplicate_country_visits(db)) == 0
+
+
+def test_startup_removes_duplicates_then_builds_the_unique_indexes(monkeypatch):
+    db = IndexedDb()
+    db.achievements.docs += [
+        {"_id": i, "user_id": "u1", "badge_type": "first_visit", "earned_at": NOW} for i in (1, 2)
+    ]
+    monkeypatch.setattr(server, "db", db)
+    asyncio.run(server.ensure_indexes())
+    assert len(db.achievements.docs) == 1
+
+    # A non-unique index that cannot be built is only a slower query
+    db.friends.broken = True
+    asyncio.run(server.ensure_indexes())
+
+    # A unique index that still cannot be built: the write paths would duplicate more
+    db.notifications.broken = True
+    with pytest.raises(RuntimeError, match="notifications"):
+        asyncio.run(server.ensure_indexes())
@@ -0,0 +1,58 @@
+"""
+Unit tests for the landmark spatial index (geo_index.py)
+"""
+
+import random
+
+from geo_index import GeoIndex, haversine_km
+
+LANDMARKS = [
+    {"landmark_id": "france_eiffel_tower", "latitude": 48.8584, "longitude": 2.2945},
+    {"landmark_id": "france_louvre", "latitude": 48.8606, "longitude": 2.3376},
+    {"landmark_id": "france_versailles", "latitude": 48.8049, "longitude": 2.1204},
+    {"landmark_id": "uk_big_ben", "latitude": 51.5007, "longitude": -0.1246},
+    {"landmark_id": "fiji_taveuni", "latitude": -16.8, "longitude": 179.95},
+    {"landmark_id": "fiji_rabi", "latitude": -16.5, "longitude": -179.98},
+    {"landmark_id": "no_coordinates", "latitude": None, "longitude": None},
+]
+
+
+def test_haversine_paris_london():
+    assert 340 < haversine_km(48.8566, 2.3522, 51.5074, -0.1278) < 345
+
+
+def test_nearby_sorted_by_distance():
+    index = GeoIndex(LANDMARKS)
+    results = index.nearby(48.8600, 2.3300, radius_km=30)
+    assert [l["landmark_id"] for l, _ in results] == ["france_louvre", "france_eiffel_tower", "france_versailles"]
+    distances = [d for _, d in results]
+    assert distances == sorted(distances)
+
+
+def test_nearby_radius_limit_and_exclude():
+    index = GeoIndex(LANDMARKS)
+    assert [l["landmark_id"] for l, _ in index.nearby(48.8584, 2.2945, 5, exclude_id="france_eiffel_tower")] == ["france_louvre"]
+    assert len(index.nearby(48.86, 2.33, 500, limit=2)) == 2
+    assert "uk_big_ben" in [l["landmark_id"] for l, _ in index.nearby(48.86, 2.33, 500)]
+
+
+def test_nearby_across_antimeridian():
+    index = GeoIndex(LANDMARKS)
+    ids = [l["landmark_id"] for l, _ in index.nearby(-16.6, 179.99, 100)]
+    assert ids == ["fiji_rabi", "fiji_taveuni"] or ids == ["fiji_taveuni", "fiji_rabi"]
+
+
+def test_matches_brute_force():
+    rnd = random.Random(7)
+    landmarks = [
+        {"landmark_id": f"l{i}", "latitude": rnd.uniform(-89, 89), "longitude": rnd.uniform(-180, 180)}
+        for i in range(3000)
+    ]
+    index = GeoIndex(landmarks)
+    for _ in range(50):
+        lat, lng, radius = rnd.uniform(-85, 85), rnd.uniform(-180, 180), rnd.choice([50, 300, 1500])
+        expected = sorted(
+            (haversine_km(lat, lng, l["latitude"], l["longitude"]), l["landmark_id"]) for l in landmarks
+        )
+        expected = [i for d, i in expected if d <= radius][:25]
+        assert [l["landmark_id"] for l, _ in index.nearby(lat, lng, radius, limit=25)] == expected
@@ -0,0 +1,160 @@
+"""
+Unit tests for the image URL health checker (image_health.py),
+probing a local stand-in image server
+"""
+
+import asyncio
+import http.server
+import socket
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from image_health import BROKEN_MAX_AGE, check_catalog_images, is_stale, probe_images
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 120
+
+
+class ImageHandler(http.server.BaseHTTPRequestHandler):
+    active = 0
+    max_active = 0
+    lock = threading.Lock()
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def _respond(self, send_body):
+        path = self.path
+        ImageHandler.requests.append((self.command, path))
+        if path.startswith("/slow/"):
+            with ImageHandler.lock:
+                ImageHandler.active += 1
+                ImageHandler.max_active = max(ImageHandler.max_active, ImageHandler.active)
+            time.sleep(0.05)
+            with ImageHandler.lock:
+                ImageHandler.active -= 1
+        if path == "/moved.png":
+            self.send_response(301)
+            self.send_header("Location", "/photo.png")
+            self.end_headers()
+            return
+        if path == "/nohead.png" and self.command == "HEAD":
+            self.send_response(405)
+            self.end_headers()
+            return
+        if path == "/page.html":
+            body, content_type = b"<html></html>", "text/html; charset=utf-8"
+        elif path.endswith(".png"):
+            body, content_type = PNG, "image/png"
+        else:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+
+@pytest.fixture(scope="module")
+def image_server():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), ImageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def _closed_port_url():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{s.getsockname()[1]}/gone.png"
+
+
+def test_probe_reports_type_size_and_failures(image_server):
+    urls = [f"{image_server}/{name}" for name in ("photo.png", "nohead.png", "moved.png", "page.html", "missing.jpg")]
+    urls.append(_closed_port_url())
+    photo, nohead, moved, page, missing, unreachable = asyncio.run(probe_images(urls))
+
+    assert (photo["ok"], photo["status"], photo["content_type"], photo["size"]) == (True, 200, "image/png", len(PNG))
+    # HEAD refused: falls back to GET
+    assert (nohead["ok"], nohead["size"]) == (True, len(PNG))
+    assert ("GET", "/nohead.png") in ImageHandler.requests
+    assert moved["ok"] and moved["final_url"] == f"{image_server}/photo.png"
+    assert (page["ok"], page["error"]) == (False, "not an image (text/html)")
+    assert (missing["ok"], missing["status"], missing["error"]) == (False, 404, "HTTP 404")
+    assert not unreachable["ok"] and unreachable["status"] is None and unreachable["error"]
+
+
+def test_probes_are_bounded_by_the_semaphore(image_server):
+    ImageHandler.max_active = 0
+    results = asyncio.run(probe_images([f"{image_server}/slow/{i}.png" for i in range(12)], concurrency=3))
+    assert all(r["ok"] for r in results)
+    assert 1 <= ImageHandler.max_active <= 3
+
+
+def test_stale_results():
+    now = datetime.now(timezone.utc)
+    assert is_stale({}, now)
+    assert not is_stale({"ok": True, "checked_at": now - timedelta(days=1)}, now)
+    assert is_stale({"ok": False, "checked_at": now - BROKEN_MAX_AGE * 2}, now)
+    # Mongo hands datetimes back without a timezone
+    assert not is_stale({"ok": True, "checked_at": (now - timedelta(hours=1)).replace(tzinfo=None)}, now)
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length):
+        return self.docs
+
+
+class FakeCollection:
+    def __init__(self, docs):
+        self.docs = {doc.get("url") or doc["landmark_id"]: doc for doc in docs}
+
+    def find(self, query, projection=None):
+        return FakeCursor(list(self.docs.values()))
+
+    async def bulk_write(self, ops, ordered=True):
+        for op in ops:
+            self.docs[op._filter["url"]] = dict(op._doc["$set"])
+
+
+class FakeDb:
+    def __init__(self, landmarks):
+        self.landmarks = FakeCollection(landmarks)
+        self.image_checks = FakeCollection([])
+
+
+def test_reruns_only_probe_new_and_stale_urls(image_server):
+    photo, missing = f"{image_server}/photo.png", f"{image_server}/missing.jpg"
+    db = FakeDb([
+        {"landmark_id": "bryggen", "image_url": photo, "images": [photo, missing]},
+        {"landmark_id": "fjord", "image_url": photo},
+    ])
+
+    report = asyncio.run(check_catalog_images(db))
+    assert (report["urls"], report["probed"], report["cached"]) == (2, 2, 0)
+    assert [(b["url"], b["landmark_ids"]) for b in report["broken"]] == [(missing, ["bryggen"])]
+    assert report["content_types"] == {"image/png": 1}
+
+    # The broken URL's result goes stale first
+    db.image_checks.docs[missing]["checked_at"] -= BROKEN_MAX_AGE * 2
+    ImageHandler.requests.clear()
+    report = asyncio.run(check_catalog_images(db))
+    assert (report["probed"], report["cached"]) == (1, 1)
+    assert {path for _, path in ImageHandler.requests} == {"/missing.jpg"}
+    assert len(report["broken"]) == 1
@@ -0,0 +1,79 @@
+"""
+Unit tests for the image placeholder batch job (image_placeholders.py),
+fetching from a local stand-in image server
+"""
+
+import base64
+import functools
+import http.server
+import io
+import threading
+
+import pytest
+from PIL import Image
+
+from image_placeholders import (
+    _BASE83, blurhash_encode, compute_placeholders, landmark_placeholders,
+)
+
+
+def _decode83(text: str) -> int:
+    value = 0
+    for ch in text:
+        value = value * 83 + _BASE83.index(ch)
+    return value
+
+
+@pytest.fixture(scope="module")
+def image_server(tmp_path_factory):
+    root = tmp_path_factory.mktemp("images")
+    Image.new("RGB", (640, 480), (200, 30, 30)).save(root / "red.jpg", quality=90)
+    gradient = Image.new("RGB", (300, 200))
+    gradient.putdata([(x * 255 // 300, y * 255 // 200, 128) for y in range(200) for x in range(300)])
+    gradient.save(root / "gradient.png")
+
+    handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=str(root))
+    handler.log_message = lambda *args: None
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def test_blurhash_of_solid_color():
+    blurhash = blurhash_encode(Image.new("RGB", (50, 50), (255, 0, 0)), 4, 3)
+    assert len(blurhash) == 28
+    assert _decode83(blurhash[0]) == 3 + 2 * 9
+    # The DC component is the average color
+    assert _decode83(blurhash[2:6]) == 0xFF0000
+
+
+def test_blurhash_matches_reference_encoder():
+    image = Image.new("RGB", (64, 48))
+    image.putdata([(x * 4, y * 5, (x * y) % 256) for y in range(48) for x in range(64)])
+    # Reference implementation (blurhash-python) on the same 32x24 downscale
+    assert blurhash_encode(image, 4, 3) == "LzHLF_2pwuX4mDWUjrf6gGfhfPfj"
+
+
+def test_compute_placeholders_from_server(image_server):
+    red, gradient, missing = (f"{image_server}/{name}" for name in ("red.jpg", "gradient.png", "missing.jpg"))
+    placeholders = compute_placeholders([red, gradient, red, missing], workers=2)
+
+    assert set(placeholders) == {red, gradient}
+    assert (placeholders[red]["width"], placeholders[red]["height"]) == (640, 480)
+    assert (placeholders[gradient]["width"], placeholders[gradient]["height"]) == (300, 200)
+    lqip = placeholders[red]["lqip"]
+    assert lqip.startswith("data:image/jpeg;base64,")
+    thumb = Image.open(io.BytesIO(base64.b64decode(lqip.split(",", 1)[1])))
+    assert thumb.size == (16, 12)
+
+
+def test_landmark_placeholders_order_and_lqip():
+    placeholders = {
+        url: {"url": url, "width": 4, "height": 3, "blurhash": "x", "lqip": "data:"}
+        for url in ("a", "b", "c")
+    }
+    landmark = {"image_url": "b", "images": ["a", "b", "missing", "c"]}
+    entries = landmark_placeholders(landmark, placeholders)
+    assert [e["url"] for e in entries] == ["b", "a", "c"]
+    assert "lqip" in entries[0] and all("lqip" not in e for e in entries[1:])
@@ -0,0 +1,138 @@
+"""
+Unit tests for the Mongo-backed job queue (jobs.py)
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import jobs
+from conftest import FakeDb
+from jobs import JobQueue, job_status, retry_delay
+
+
+def _db():
+    return FakeDb(unique={"jobs": ("key",)})
+
+
+@pytest.fixture
+def queue():
+    queue = JobQueue()
+    queue.calls = []
+
+    @queue.handler("echo")
+    async def echo(job):
+        queue.calls.append(job["payload"])
+        if job["payload"].get("fail"):
+            raise RuntimeError("boom")
+        return {"echo": job["payload"]["n"]}
+
+    return queue
+
+
+def _past(db, field):
+    # Make a job due (or its lease expired) without waiting for it
+    for doc in db.jobs.docs:
+        doc[field] = datetime.now(timezone.utc) - timedelta(seconds=1)
+
+
+def test_enqueue_with_a_key_queues_once(queue):
+    db = _db()
+    asyncio.run(queue.enqueue(db, "echo", {"n": 1}, key="k"))
+    asyncio.run(queue.enqueue(db, "echo", {"n": 2}, key="k"))
+    assert asyncio.run(queue.drain(db)) == 1
+    assert queue.calls == [{"n": 1}]
+
+    status = asyncio.run(job_status(db, "k"))
+    assert (status["status"], status["attempts"], status["result"]) == ("done", 1, {"echo": 1})
+
+
+def test_jobs_run_oldest_first(queue):
+    db = _db()
+    for n in range(3):
+        asyncio.run(queue.enqueue(db, "echo", {"n": n}))
+    assert asyncio.run(queue.drain(db)) == 3
+    assert [call["n"] for call in queue.calls] == [0, 1, 2]
+
+
+def test_a_running_job_is_taken_over_only_after_its_lease(queue):
+    db = _db()
+    asyncio.run(queue.enqueue(db, "echo", {"n": 1}, key="k"))
+    job = asyncio.run(queue.claim(db, "dead-worker"))
+    assert job["status"] == "running" and job["lease_until"] > datetime.now(timezone.utc)
+    assert asyncio.run(queue.run_one(db, "w")) is False
+
+    _past(db, "lease_until")
+    assert asyncio.run(queue.run_one(db, "w")) is True
+    status = asyncio.run(job_status(db, "k"))
+    assert (status["status"], status["attempts"]) == ("done", 2)
+
+    # The dead worker's late result does not overwrite the job
+    asyncio.run(db.jobs.update_one({"job_id": job["job_id"], "worker": "dead-worker"}, {"$set": {"status": "failed"}}))
+    assert asyncio.run(job_status(db, "k"))["status"] == "done"
+
+
+def test_failures_back_off_then_fail(queue):
+    db = _db()
+    asyncio.run(queue.enqueue(db, "echo", {"n": 1, "fail": True}, key="k"))
+    for attempt in range(1, jobs.MAX_ATTEMPTS):
+        assert asyncio.run(queue.run_one(db, "w")) is True
+        doc = db.jobs.docs[0]
+        assert (doc["status"], doc["attempts"], doc["error"]) == ("queued", attempt, "boom")
+        assert doc["run_at"] - doc["updated_at"] == retry_delay(attempt)
+        # Not due until the backoff has passed
+        assert asyncio.run(queue.run_one(db, "w")) is False
+        _past(db, "run_at")
+
+    assert asyncio.run(queue.run_one(db, "w")) is True
+    status = asyncio.run(job_status(db, "k"))
+    assert (status["status"], status["attempts"]) == ("failed", jobs.MAX_ATTEMPTS)
+    assert "finished_at" in db.jobs.docs[0]
+    assert asyncio.run(queue.drain(db)) == 0
+
+
+def test_a_job_that_kills_its_worker_fails_after_max_attempts(queue):
+    db = _db()
+    asyncio.run(queue.enqueue(db, "echo", {"n": 1}, key="k"))
+    for attempt in range(1, jobs.MAX_ATTEMPTS + 1):
+        job = asyncio.run(queue.claim(db, f"dead-worker-{attempt}"))
+        assert job["attempts"] == attempt
+        _past(db, "lease_until")
+
+    # Not claimed a sixth time: marked failed instead
+    assert asyncio.run(queue.run_one(db, "w")) is False
+    status = asyncio.run(job_status(db, "k"))
+    assert (status["status"], status["attempts"]) == ("failed", jobs.MAX_ATTEMPTS)
+    assert "lease expired" in status["error"] and "finished_at" in db.jobs.docs[0]
+    assert queue.calls == []
+
+
+def test_a_delayed_job_runs_once_released_or_after_its_delay(queue):
+    db = _db()
+    asyncio.run(queue.enqueue(db, "echo", {"n": 1}, key="k", delay=timedelta(minutes=5)))
+    assert asyncio.run(queue.run_one(db, "w")) is False
+
+    assert asyncio.run(queue.release(db, "k", {"extra": True})) is True
+    assert asyncio.run(queue.drain(db)) == 1
+    assert queue.calls == [{"n": 1, "extra": True}]
+    # Already ran: nothing to release
+    assert asyncio.run(queue.release(db, "k", {"extra": False})) is False
+
+    # Never released: due when the delay is up
+    asyncio.run(queue.enqueue(db, "echo", {"n": 2}, key="k2", delay=timedelta(minutes=5)))
+    _past(db, "run_at")
+    assert asyncio.run(queue.drain(db)) == 1
+    assert queue.calls[-1] == {"n": 2}
+
+
+def test_unknown_kind_fails_without_retrying(queue):
+    db = _db()
+    asyncio.run(queue.enqueue(db, "missing", {}, key="k"))
+    assert asyncio.run(queue.drain(db)) == 1
+    status = asyncio.run(job_status(db, "k"))
+    assert (status["status"], status["attempts"]) == ("failed", 1)
+
+
+def test_retry_delay_doubles():
+    assert [retry_delay(n).total_seconds() for n in (1, 2, 3, 4)] == [5, 10, 20, 40]
@@ -0,0 +1,177 @@
+"""
+Unit tests for landmark visitors (landmark_visitors.py) and the landmark
+detail / visitors endpoints
+"""
+
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "landmark_visitors_test")
+
+import pytest  # noqa: E402
+from fastapi import Request, Response  # noqa: E402
+from pymongo.errors import DuplicateKeyError  # noqa: E402
+
+import landmark_visitors  # noqa: E402
+import server  # noqa: E402
+from catalog import CatalogSnapshot  # noqa: E402
+from conftest import FakeDb, UntouchableDb  # noqa: E402
+from landmark_visitors import ensure_landmark_visitors, friends_who_visited, record_visitor  # noqa: E402
+
+NOW = datetime.now(timezone.utc)
+
+
+def _db():
+    return FakeDb(unique={"migrations": ("_id",), "landmark_visitors": ("landmark_id", "user_id")})
+
+
+@pytest.fixture(autouse=True)
+def backfilled(monkeypatch):
+    monkeypatch.setattr(landmark_visitors, "_legacy_before", None)
+
+
+def test_first_visit_is_decided_by_the_visitor_document():
+    db = _db()
+    assert asyncio.run(record_visitor(db, "eiffel", "u1", "private", NOW)) == (True, True)
+    assert asyncio.run(record_visitor(db, "eiffel", "u1", "public", NOW + timedelta(days=1))) == (False, False)
+    visitor, = db.landmark_visitors.docs
+    # First visit time is kept; shared once any visit was not private
+    assert (visitor["first_visited_at"], visitor["shared"]) == (NOW, True)
+
+    async def lost_race(query, update, upsert=False):
+        # Another request inserted it between our match and our insert
+        raise DuplicateKeyError("duplicate key")
+
+    db.landmark_visitors.update_one = lost_race
+    assert asyncio.run(record_visitor(db, "louvre", "u1", "public", NOW)) == (False, False)
+
+
+def test_legacy_visits_add_the_visitor_but_are_not_a_first_visit(monkeypatch):
+    db = _db()
+    monkeypatch.setattr(landmark_visitors, "_legacy_before", NOW)
+    db.visits.docs.append({"user_id": "u1", "landmark_id": "eiffel", "created_at": NOW - timedelta(days=300)})
+    # The visit being recorded (created after the backfill started) does not count as legacy
+    db.visits.docs.append({"user_id": "u1", "landmark_id": "louvre", "created_at": NOW + timedelta(seconds=1)})
+    assert asyncio.run(record_visitor(db, "eiffel", "u1", "public", NOW)) == (True, False)
+    assert asyncio.run(record_visitor(db, "louvre", "u1", "public", NOW)) == (True, True)
+
+
+def test_the_backfill_runs_once(monkeypatch):
+    db = _db()
+    runs = []
+
+    async def rebuild(db):
+        runs.append(landmark_visitors._legacy_before)
+        return 0
+
+    monkeypatch.setattr(landmark_visitors, "rebuild_landmark_visitors", rebuild)
+    assert asyncio.run(ensure_landmark_visitors(db)) is True
+    # Legacy checks were on while it ran, and are off once it is done
+    assert runs[0] is not None and landmark_visitors._legacy_before is None
+    assert db.migrations.docs[0]["status"] == "done"
+
+    assert asyncio.run(ensure_landmark_visitors(db)) is False
+    assert len(runs) == 1 and landmark_visitors._legacy_before is None
+
+    # Another worker is still running it: keep checking for legacy visits
+    db.migrations.docs[0].update(status="running", started_at=NOW)
+    assert asyncio.run(ensure_landmark_visitors(db)) is False
+    assert landmark_visitors._legacy_before == NOW
+
+
+def test_other_workers_follow_the_backfill_and_take_over_a_dead_one(monkeypatch):
+    db = _db()
+    runs = []
+
+    async def rebuild(db):
+        runs.append(landmark_visitors._legacy_before)
+        return 0
+
+    monkeypatch.setattr(landmark_visitors, "rebuild_landmark_visitors", rebuild)
+    db.migrations.docs.append({"_id": landmark_visitors.MIGRATION_ID, "status": "running", "started_at": NOW})
+    assert asyncio.run(ensure_landmark_visitors(db)) is False
+
+    async def finish_then_watch():
+        watcher = asyncio.create_task(landmark_visitors.watch_landmark_visitors(db, 0))
+        await asyncio.sleep(0)
+        db.migrations.docs[0]["status"] = "done"
+        await asyncio.wait_for(watcher, 1)
+
+    # The worker running it finishes: legacy checks stop without running it again
+    asyncio.run(finish_then_watch())
+    assert runs == [] and landmark_visitors._legacy_before is None
+
+    # Its worker died an hour ago: the next check runs it
+    db.migrations.docs[0].update(status="running", started_at=NOW - landmark_visitors.BACKFILL_TIMEOUT * 2)
+    assert asyncio.run(ensure_landmark_visitors(db)) is True
+    assert len(runs) == 1 and db.migrations.docs[0]["status"] == "done"
+
+
+def test_friends_who_visited_lists_shared_visitors_most_recent_first():
+    db = _db()
+    for user_id, days_ago, visibility in (("a", 3, "public"), ("b", 1, "friends"), ("c", 2, "private"), ("d", 0, "public")):
+        asyncio.run(record_visitor(db, "eiffel", user_id, visibility, NOW - timedelta(days=days_ago)))
+    assert asyncio.run(friends_who_visited(db, "eiffel", ["a", "b", "c"])) == ["b", "a"]
+    assert asyncio.run(friends_who_visited(db, "eiffel", [])) == []
+
+
+def _catalog():
+    return CatalogSnapshot.build(7, [{"country_id": "france", "name": "France", "continent": "Europe"}], [{
+        "landmark_id": "eiffel", "name": "Eiffel Tower", "country_id": "france", "country_name": "France",
+        "continent": "Europe", "description": "", "category": "official", "points": 10, "upvotes": 3,
+        "created_at": NOW,
+    }])
+
+
+def _request(etag=None):
+    headers = [(b"if-none-match", etag.encode())] if etag else []
+    return Request({"type": "http", "method": "GET", "path": "/", "query_string": b"", "headers": headers})
+
+
+def _user():
+    return server.User(user_id="u1", email="u1@example.com", name="U1", created_at=NOW)
+
+
+def test_landmark_detail_revalidates_without_the_database(monkeypatch):
+    monkeypatch.setattr(server.catalog_store, "_snapshot", _catalog())
+    monkeypatch.setattr(server, "db", UntouchableDb())
+
+    response = Response()
+    first = asyncio.run(server.get_landmark("eiffel", _request(), response, current_user=_user()))
+    assert first.status_code == 200
+    etag = response.headers["etag"]
+
+    cached = asyncio.run(server.get_landmark("eiffel", _request(etag), Response(), current_user=_user()))
+    assert cached.status_code == 304
+
+    # A live upvote changes the representation
+    monkeypatch.setitem(server.live_upvotes.counts, "eiffel", 4)
+    response = Response()
+    fresh = asyncio.run(server.get_landmark("eiffel", _request(etag), response, current_user=_user()))
+    assert fresh.status_code == 200 and response.headers["etag"] != etag
+    assert b'"upvotes":4' in fresh.body
+
+
+def test_landmark_visitors_endpoint(monkeypatch):
+    db = _db()
+    monkeypatch.setattr(server.catalog_store, "_snapshot", _catalog())
+    monkeypatch.setattr(server, "db", db)
+    db.landmark_stats.docs.append({"landmark_id": "eiffel", "visitor_count": 4})
+    db.friends.docs += [
+        {"user_id": "u1", "friend_id": "a", "status": "accepted"},
+        {"user_id": "b", "friend_id": "u1", "status": "accepted"},
+        {"user_id": "u1", "friend_id": "c", "status": "pending"},
+    ]
+    db.users.docs += [{"user_id": i, "name": i.upper()} for i in "abc"]
+    for user_id, days_ago in (("a", 2), ("b", 1), ("c", 0)):
+        asyncio.run(record_visitor(db, "eiffel", user_id, "public", NOW - timedelta(days=days_ago)))
+
+    visitors = asyncio.run(server.get_landmark_visitors("eiffel", current_user=_user()))
+    assert (visitors.visitor_count, visitors.friends_visited_count) == (4, 2)
+    assert [f.user_id for f in visitors.friends_visited] == ["b", "a"]
+
+    with pytest.raises(server.HTTPException) as missing:
+        asyncio.run(server.get_landmark_visitors("nowhere", current_user=_user()))
+    assert missing.value.status_code == 404
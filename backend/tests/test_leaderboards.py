@@ -0,0 +1,77 @@
+"""
+Unit tests for country/continent leaderboards (leaderboards.py)
+"""
+
+import asyncio
+
+from conftest import FakeDb
+from leaderboards import build_rollups, record_rollup, scoped_leaderboard
+
+
+def _db(users):
+    db = FakeDb()
+    db.users.docs += [{"user_id": u, "name": u.title()} for u in users]
+    return db
+
+
+def test_rollups_feed_scoped_boards_with_shared_ranks():
+    db = _db(["ana", "ben", "cho", "dev"])
+
+    async def run():
+        for user, points in (("ana", 30), ("ben", 50), ("cho", 30), ("dev", 10)):
+            await record_rollup(db, user, "japan", "Asia", points=points, landmarks=1)
+        await record_rollup(db, "dev", "thailand", "Asia", points=60, landmarks=1, countries=1)
+        japan = await scoped_leaderboard(db, "country:japan", "points", "cho", limit=3)
+        asia = await scoped_leaderboard(db, "continent:Asia", "points", "dev")
+        friends = await scoped_leaderboard(db, "country:japan", "points", "dev", user_ids=["dev", "ana"])
+        return japan, asia, friends
+
+    japan, asia, friends = asyncio.run(run())
+    assert [(e["user_id"], e["value"], e["rank"]) for e in japan["leaderboard"]] == [
+        ("ben", 50, 1), ("ana", 30, 2), ("cho", 30, 2)]
+    assert (japan["user_rank"], japan["user_value"], japan["total_users"]) == (2, 30, 4)
+    # Dev's Thailand visit counts towards Asia but not Japan
+    assert (asia["leaderboard"][0]["user_id"], asia["leaderboard"][0]["value"], asia["user_rank"]) == ("dev", 70, 1)
+    assert ([e["user_id"] for e in friends["leaderboard"]], friends["user_rank"]) == (["ana", "dev"], 2)
+
+
+def test_caller_without_activity_has_no_rank():
+    db = _db(["ana"])
+    asyncio.run(record_rollup(db, "ana", "japan", "Asia", points=10))
+    board = asyncio.run(scoped_leaderboard(db, "country:japan", "points", "zoe"))
+    assert (board["user_rank"], board["user_value"]) == (None, 0)
+
+
+def test_build_rollups_from_visits_and_country_visits():
+    landmarks = {
+        "japan_fuji": {"country_id": "japan", "continent": "Asia"},
+        "japan_kinkakuji": {"country_id": "japan", "continent": "Asia"},
+        "nepal_everest": {"country_id": "nepal", "continent": "Asia"},
+    }
+    visits = [
+        {"user_id": "ana", "landmark_id": "japan_fuji", "points": 20, "first_at": 1},  # two visits of one landmark
+        {"user_id": "ana", "landmark_id": "japan_kinkakuji", "points": 10, "first_at": 2},
+        {"user_id": "ana", "landmark_id": "deleted_landmark", "points": 10, "first_at": 3},
+        {"user_id": "ben", "landmark_id": "nepal_everest", "points": 10, "first_at": 5},
+    ]
+    country_visits = [
+        # Auto-created by ana's first Japan visit: carries the country bonus
+        {"user_id": "ana", "country_id": "japan", "continent": "Asia", "points_earned": 20,
+         "first_landmark_id": "japan_fuji"},
+        {"user_id": "ana", "country_id": "nepal", "continent": "Asia", "points_earned": 50},
+        # Manual, before ben's landmark visit: the country bonus came on top
+        {"user_id": "ben", "country_id": "nepal", "continent": "Asia", "points_earned": 50},
+    ]
+    rollups = build_rollups(visits, country_visits, landmarks)
+    # 30 visit points + 20 country bonus + 50 Japan completion + 50 first in Asia
+    assert rollups[("country:japan", "ana")] == {"points": 150, "landmarks": 2, "countries": 1}
+    assert rollups[("continent:Asia", "ana")] == {"points": 200, "landmarks": 2, "countries": 2}
+    assert rollups[("country:nepal", "ana")] == {"points": 50, "landmarks": 0, "countries": 1}
+    # 10 + 20 country bonus + 50 Nepal completion + 50 first in Asia + 50 country visit
+    assert rollups[("country:nepal", "ben")] == {"points": 180, "landmarks": 1, "countries": 1}
+
+    # Ana completes Nepal last: Asia is complete, and the bonus goes to Nepal's scopes
+    visits.append({"user_id": "ana", "landmark_id": "nepal_everest", "points": 10, "first_at": 4})
+    rollups = build_rollups(visits, country_visits, landmarks)
+    assert rollups[("country:japan", "ana")]["points"] == 150
+    assert rollups[("country:nepal", "ana")]["points"] == 50 + 10 + 20 + 50 + 200
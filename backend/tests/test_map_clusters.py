@@ -0,0 +1,51 @@
+"""
+Unit tests for server-side map clustering (map_clusters.py)
+"""
+
+import pytest
+
+from map_clusters import MAX_ZOOM, MapClusters, parse_bbox
+
+LANDMARKS = [
+    {"landmark_id": "france_eiffel_tower", "name": "Eiffel Tower", "latitude": 48.8584, "longitude": 2.2945},
+    {"landmark_id": "france_louvre", "name": "Louvre", "latitude": 48.8606, "longitude": 2.3376},
+    {"landmark_id": "uk_big_ben", "name": "Big Ben", "latitude": 51.5007, "longitude": -0.1246},
+    {"landmark_id": "japan_fuji", "name": "Mount Fuji", "latitude": 35.3606, "longitude": 138.7274},
+    {"landmark_id": "no_coordinates", "name": "Unknown", "latitude": None, "longitude": None},
+]
+
+
+def test_every_zoom_accounts_for_every_located_landmark():
+    clusters = MapClusters(LANDMARKS)
+    for zoom in range(0, MAX_ZOOM + 1):
+        assert sum(c["count"] for c in clusters.clusters(zoom)) == 4
+
+
+def test_clusters_split_as_zoom_increases():
+    clusters = MapClusters(LANDMARKS)
+    low = clusters.clusters(2)
+    high = clusters.clusters(MAX_ZOOM)
+    assert len(low) < len(high) == 4
+    paris = [c for c in high if c.get("landmark_id") == "france_louvre"][0]
+    assert paris["name"] == "Louvre" and paris["count"] == 1
+
+
+def test_bbox_filter_and_visited_counts():
+    clusters = MapClusters(LANDMARKS)
+    europe = clusters.clusters(3, parse_bbox("-10,35,30,60"), visited_ids={"france_louvre", "japan_fuji"})
+    assert sum(c["count"] for c in europe) == 3
+    assert sum(c["visited_count"] for c in europe) == 1
+    assert all("landmark_ids" not in c for c in europe)
+
+
+def test_bbox_across_antimeridian():
+    clusters = MapClusters([{"landmark_id": "fiji", "latitude": -17.7, "longitude": 178.0}])
+    assert len(clusters.clusters(5, parse_bbox("170,-30,-170,0"))) == 1
+    assert clusters.clusters(5, parse_bbox("-170,-30,170,0")) == []
+
+
+def test_parse_bbox_rejects_bad_input():
+    with pytest.raises(ValueError):
+        parse_bbox("1,2,3")
+    with pytest.raises(ValueError):
+        parse_bbox("0,50,10,40")
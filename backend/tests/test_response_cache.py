@@ -0,0 +1,53 @@
+"""
+Unit tests for pre-serialized / pre-compressed catalog payloads (response_cache.py)
+"""
+
+import asyncio
+import gzip
+import json
+
+import response_cache
+from response_cache import PayloadCache, accepted_encodings, negotiate_encoding
+
+
+def test_accept_encoding_parsing():
+    assert accepted_encodings("gzip, br;q=0.5, *;q=0") == {"gzip": 1.0, "br": 0.5, "*": 0.0}
+    assert negotiate_encoding("") is None
+    assert negotiate_encoding("identity") is None
+    assert negotiate_encoding("gzip;q=0") is None
+    assert negotiate_encoding("deflate, gzip") == "gzip"
+
+
+def test_brotli_preferred_when_available(monkeypatch):
+    monkeypatch.setattr(response_cache, "brotli", object())
+    assert negotiate_encoding("gzip, br") == "br"
+    monkeypatch.setattr(response_cache, "brotli", None)
+    assert negotiate_encoding("gzip, br") == "gzip"
+
+
+class _Request:
+    def __init__(self, accept_encoding):
+        self.headers = {"accept-encoding": accept_encoding}
+
+
+def test_payload_built_once_per_version():
+    cache = PayloadCache()
+    builds = []
+
+    def build():
+        builds.append(1)
+        return [{"name": "Bryggen", "description": "x" * 2000}]
+
+    async def run():
+        first = await cache.respond(_Request("gzip"), 1, "landmarks", build, headers={"ETag": '"a"'})
+        second = await cache.respond(_Request(""), 1, "landmarks", build)
+        third = await cache.respond(_Request(""), 2, "landmarks", build)
+        return first, second, third
+
+    first, second, third = asyncio.run(run())
+    assert len(builds) == 2
+    assert first.headers["content-encoding"] == "gzip"
+    assert first.headers["etag"] == '"a"'
+    assert json.loads(gzip.decompress(first.body)) == json.loads(second.body)
+    assert "content-encoding" not in second.headers
+    assert third.body == second.body
@@ -0,0 +1,65 @@
+"""
+Unit tests for the decayed trending scores (trending.py)
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from trending import TREND_HALF_LIFE_DAYS, current_score, event_score, top_trending
+
+
+def test_event_score_halves_every_half_life():
+    now = datetime.now(timezone.utc)
+    fresh = event_score(1.0, now)
+    old = event_score(1.0, now - timedelta(days=TREND_HALF_LIFE_DAYS))
+    assert old == pytest.approx(fresh / 2)
+    assert current_score(fresh, now) == pytest.approx(1.0)
+    assert current_score(fresh + old, now) == pytest.approx(1.5)
+
+
+def test_stored_order_matches_current_order():
+    now = datetime.now(timezone.utc)
+    # Ten visits a month ago vs. two visits today
+    burst_last_month = 10 * event_score(1.0, now - timedelta(days=30))
+    steady_today = 2 * event_score(1.0, now)
+    assert steady_today > burst_last_month
+    assert current_score(steady_today, now) > current_score(burst_last_month, now)
+
+
+def test_future_and_naive_timestamps():
+    now = datetime.now(timezone.utc)
+    assert event_score(1.0, now + timedelta(days=30)) == pytest.approx(event_score(1.0, now), rel=1e-4)
+    naive = (now - timedelta(days=1)).replace(tzinfo=None)
+    assert event_score(1.0, naive) == pytest.approx(event_score(1.0, now - timedelta(days=1)), rel=1e-4)
+
+
+class FakeStats:
+    def __init__(self):
+        self.limits = []
+
+    def find(self, query, projection=None):
+        return self
+
+    def sort(self, *args):
+        return self
+
+    def limit(self, n):
+        self.limits.append(n)
+        return self
+
+    async def to_list(self, length):
+        return []
+
+
+class FakeDb:
+    def __init__(self):
+        self.landmark_stats = FakeStats()
+
+
+def test_top_trending_never_asks_for_an_unlimited_scan():
+    db = FakeDb()
+    asyncio.run(top_trending(db, limit=0))
+    asyncio.run(top_trending(db, limit=-5))
+    assert db.landmark_stats.limits == [1, 1]
@@ -0,0 +1,153 @@
+"""
+Unit tests for the write-behind upvote counter and the live counts (upvotes.py)
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import upvotes
+from catalog import CatalogSnapshot
+from upvotes import LiveUpvotes, UpvoteCounter, publish_upvote_counts
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length):
+        return self.docs
+
+    def __aiter__(self):
+        async def rows():
+            for doc in self.docs:
+                yield doc
+        return rows()
+
+
+class FakeStats:
+    def __init__(self, fail=False):
+        self.writes = []
+        self.rows = []
+        self.queries = []
+        self.fail = fail
+
+    async def bulk_write(self, ops, ordered=True):
+        if self.fail:
+            raise ConnectionError("mongo went away")
+        batch = []
+        for op in ops:
+            added = op._doc[0]["$set"]["upvotes"]["$add"]
+            batch.append((op._filter["landmark_id"], added[0]["$ifNull"][1], added[1]))
+        self.writes.append(batch)
+
+    def find(self, query, projection=None):
+        self.queries.append(query)
+        since = query.get("upvotes_at", {}).get("$gte")
+        return FakeCursor([row for row in self.rows if since is None or row["upvotes_at"] >= since])
+
+
+class FakeLandmarks:
+    def __init__(self, docs=()):
+        self.docs = [dict(doc) for doc in docs]
+        self.writes = []
+
+    async def bulk_write(self, ops, ordered=True):
+        self.writes.append([(op._filter["landmark_id"], op._doc["$set"]["upvotes"]) for op in ops])
+        for op in ops:
+            for doc in self.docs:
+                if doc["landmark_id"] == op._filter["landmark_id"]:
+                    doc.update(op._doc["$set"])
+
+    def find(self, query, projection=None):
+        ids = query["landmark_id"]["$in"]
+        return FakeCursor([dict(doc) for doc in self.docs if doc["landmark_id"] in ids])
+
+
+class FakeDb:
+    def __init__(self, fail=False, landmarks=()):
+        self.landmark_stats = FakeStats(fail)
+        self.landmarks = FakeLandmarks(landmarks)
+
+
+@pytest.fixture(autouse=True)
+def published(monkeypatch):
+    batches = []
+
+    async def apply_landmarks(db, landmarks):
+        batches.append([l["landmark_id"] for l in landmarks])
+
+    monkeypatch.setattr(upvotes.catalog_store, "apply_landmarks", apply_landmarks)
+    monkeypatch.setattr(upvotes.catalog_store, "_snapshot", CatalogSnapshot.build(1, [], [
+        {"landmark_id": "paris_eiffel", "country_id": "france", "upvotes": 40},
+        {"landmark_id": "peru_machu_picchu", "country_id": "peru"},
+    ]))
+    return batches
+
+
+def test_flush_coalesces_deltas_into_one_bulk_write(published):
+    counter = UpvoteCounter()
+    for _ in range(5):
+        counter.add("paris_eiffel", 1)
+    counter.add("paris_eiffel", -1)
+    counter.add("rome_colosseum", 1)
+    counter.add("rome_colosseum", -1)
+    counter.add("peru_machu_picchu", -1)
+    assert counter.pending("paris_eiffel") == 4
+
+    db = FakeDb()
+    assert asyncio.run(counter.flush(db)) == 2
+    # (landmark, count to start from if it has no live count yet, delta)
+    assert db.landmark_stats.writes == [[("paris_eiffel", 40, 4), ("peru_machu_picchu", 0, -1)]]
+    # Upvotes alone never publish a catalog version
+    assert published == []
+    assert counter.pending("paris_eiffel") == 0
+    assert asyncio.run(counter.flush(db)) == 0
+
+
+def test_failed_flush_keeps_deltas(published):
+    counter = UpvoteCounter()
+    counter.add("paris_eiffel", 2)
+    with pytest.raises(ConnectionError):
+        asyncio.run(counter.flush(FakeDb(fail=True)))
+    counter.add("paris_eiffel", 1)
+    assert counter.pending("paris_eiffel") == 3
+
+
+def test_live_counts_override_the_catalog_and_refresh_incrementally():
+    now = datetime.now(timezone.utc)
+    db = FakeDb()
+    db.landmark_stats.rows = [{"landmark_id": "paris_eiffel", "upvotes": 44, "upvotes_at": now}]
+    live = LiveUpvotes()
+    assert live.get({"landmark_id": "paris_eiffel", "upvotes": 40}) == 40
+
+    assert asyncio.run(live.refresh(db)) == 1
+    assert live.get({"landmark_id": "paris_eiffel", "upvotes": 40}) == 44
+    assert live.get({"landmark_id": "peru_machu_picchu"}) == 0
+
+    db.landmark_stats.rows = [
+        {"landmark_id": "paris_eiffel", "upvotes": 44, "upvotes_at": now - timedelta(minutes=5)},
+        {"landmark_id": "peru_machu_picchu", "upvotes": 3, "upvotes_at": now + timedelta(seconds=2)},
+    ]
+    # Only the counts written since the last refresh (with some overlap) are read again
+    assert asyncio.run(live.refresh(db)) == 1
+    assert db.landmark_stats.queries[-1]["upvotes_at"]["$gte"] == now - upvotes._REFRESH_OVERLAP
+    assert live.get({"landmark_id": "peru_machu_picchu"}) == 3
+
+
+def test_publish_copies_only_moved_counts_as_one_version(published):
+    db = FakeDb(landmarks=[
+        {"landmark_id": "paris_eiffel", "upvotes": 40},
+        {"landmark_id": "peru_machu_picchu", "upvotes": 3},
+    ])
+    db.landmark_stats.rows = [
+        {"landmark_id": "paris_eiffel", "upvotes": 44},
+        {"landmark_id": "peru_machu_picchu", "upvotes": 3},
+    ]
+    assert asyncio.run(publish_upvote_counts(db)) == 1
+    assert db.landmarks.writes == [[("paris_eiffel", 44)]]
+    assert published == [["paris_eiffel"]]
+    # Nothing moved since: no new version
+    assert asyncio.run(publish_upvote_counts(db)) == 0
+    assert len(published) == 1
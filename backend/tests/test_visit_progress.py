@@ -0,0 +1,98 @@
+"""
+Unit tests for the per-user progress document (visit_progress.py)
+"""
+
+import asyncio
+
+import visit_progress
+from catalog import CatalogSnapshot
+from conftest import FakeCollection, FakeCursor, FakeDb
+from visit_progress import COUNTED_FIELD, build_progress, record_visit_progress, visit_outcome
+
+COUNTRIES = [
+    {"country_id": "norway", "name": "Norway", "continent": "Europe"},
+    {"country_id": "sweden", "name": "Sweden", "continent": "Europe"},
+    {"country_id": "japan", "name": "Japan", "continent": "Asia"},
+]
+LANDMARKS = [
+    {"landmark_id": "bryggen", "country_id": "norway", "continent": "Europe", "points": 10},
+    {"landmark_id": "geirangerfjorden", "country_id": "norway", "continent": "Europe", "points": 25},
+    {"landmark_id": "vasa", "country_id": "sweden", "continent": "Europe", "points": 10},
+    {"landmark_id": "fuji", "country_id": "japan", "continent": "Asia", "points": 10},
+]
+
+
+def _catalog():
+    return CatalogSnapshot.build(1, COUNTRIES, LANDMARKS)
+
+
+def test_build_progress_from_visits_and_country_visits():
+    progress = build_progress(
+        "ana", ["bryggen", "geirangerfjorden", "bryggen", "vasa", "removed_landmark"], 5, _catalog(),
+        points=55, country_visits=["japan", "norway", "japan"],
+    )
+    assert (progress["visits"], progress["landmarks"], progress["points"]) == (5, 3, 55)
+    assert progress["countries"] == {"norway": 2, "sweden": 1}
+    assert (progress["continents"], progress["continent_points"]) == ({"Europe": 3}, {"Europe": 45})
+    assert progress["completed_countries"] == ["norway", "sweden"]
+    assert progress["country_visits"] == ["japan", "norway"]
+
+
+def test_visit_outcome_from_the_counters_after_the_visit():
+    catalog = _catalog()
+    bryggen, vasa = catalog.landmarks_by_id["bryggen"], catalog.landmarks_by_id["vasa"]
+
+    first = visit_outcome(catalog, {"visits": 1, "countries": {"norway": 1}, "continents": {"Europe": 1}}, bryggen, True)
+    assert (first["first_in_country"], first["first_in_continent"], first["country_completed"]) == (True, True, False)
+
+    # Sweden's only landmark, Norway already complete: completes the country and Europe
+    last = visit_outcome(
+        catalog, {"visits": 4, "countries": {"norway": 2, "sweden": 1}, "continents": {"Europe": 3}}, vasa, True
+    )
+    assert (last["first_in_country"], last["first_in_continent"]) == (True, False)
+    assert (last["country_completed"], last["continent_completed"]) == (True, True)
+
+    # A revisit opens and completes nothing
+    again = visit_outcome(catalog, {"visits": 5, "countries": {"norway": 2, "sweden": 1}}, vasa, False)
+    assert not any(again[k] for k in ("first_in_country", "country_completed", "continent_completed"))
+    assert again["visit_count"] == 5
+
+
+class FakeVisits(FakeCollection):
+    def aggregate(self, pipeline):
+        # The per-user $group of _visited_landmarks
+        docs = self._find(pipeline[0]["$match"])
+        if not docs:
+            return FakeCursor([])
+        return FakeCursor([{
+            "user_id": docs[0]["user_id"],
+            "landmark_ids": sorted({d["landmark_id"] for d in docs}),
+            "visits": len(docs),
+            "points": sum(d["points_earned"] for d in docs),
+        }])
+
+
+def test_racing_first_visits_are_counted_once(monkeypatch):
+    monkeypatch.setattr(visit_progress.catalog_store, "_snapshot", _catalog())
+    catalog = _catalog()
+    visits = [
+        # From before progress documents: only the backfill counts it
+        {"user_id": "ana", "landmark_id": "fuji", "points_earned": 10},
+        # Inserted by add_visit, each counted by its own request
+        {"user_id": "ana", "landmark_id": "bryggen", "points_earned": 10, COUNTED_FIELD: True},
+        {"user_id": "ana", "landmark_id": "vasa", "points_earned": 10, COUNTED_FIELD: True},
+    ]
+    db = FakeDb(unique={"user_progress": ("user_id",)})
+    db.collections["visits"] = FakeVisits(db, "visits", docs=visits)
+
+    async def race():
+        return await asyncio.gather(
+            record_visit_progress(db, "ana", catalog.landmarks_by_id["bryggen"], True),
+            record_visit_progress(db, "ana", catalog.landmarks_by_id["vasa"], True),
+        )
+
+    results = asyncio.run(race())
+    progress, = db.user_progress.docs
+    assert (progress["visits"], progress["landmarks"], progress["points"]) == (3, 3, 30)
+    assert progress["countries"] == {"japan": 1, "norway": 1, "sweden": 1}
+    assert sorted(p["visits"] for p, _ in results) == [2, 3]
@@ -0,0 +1,89 @@
+"""
+Unit tests for the visited-landmark bitset (visited_set.py) and landmark ordinals
+"""
+
+import asyncio
+
+from bson.int64 import Int64
+
+from catalog import CatalogSnapshot, assign_landmark_ordinals
+from visited_set import VisitedSet, bit_update, decode, encode
+
+COUNTRIES = [
+    {"country_id": "norway", "name": "Norway", "continent": "Europe"},
+    {"country_id": "japan", "name": "Japan", "continent": "Asia"},
+]
+
+
+def _catalog():
+    landmarks = [
+        {"landmark_id": f"norway_{i}", "country_id": "norway", "continent": "Europe", "ordinal": i}
+        for i in range(70)
+    ]
+    landmarks.append({"landmark_id": "fuji", "country_id": "japan", "continent": "Asia", "ordinal": 70})
+    landmarks.append({"landmark_id": "unpublished", "country_id": "japan", "continent": "Asia"})
+    return CatalogSnapshot.build(1, COUNTRIES, landmarks)
+
+
+def test_words_round_trip_through_signed_int64():
+    words = encode([0, 63, 64, 130])
+    assert set(words) == {"0", "1", "2"}
+    assert all(isinstance(w, Int64) for w in words.values())
+    # Bit 63 is the sign bit of the stored word
+    assert words["0"] < 0
+    assert decode(words) == (1 << 0) | (1 << 63) | (1 << 64) | (1 << 130)
+    assert bit_update(63) == {"visited_bits.0": {"or": Int64(-(1 << 63))}}
+    assert bit_update(65) == {"visited_bits.1": {"or": Int64(2)}}
+
+
+def test_membership_and_counts_from_the_bits():
+    catalog = _catalog()
+    visited = VisitedSet.from_progress({"visited_bits": encode([1, 2, 63, 70])}, catalog)
+
+    assert "norway_63" in visited and "fuji" in visited
+    assert "norway_0" not in visited and "unpublished" not in visited and "gone" not in visited
+    assert set(visited) == {"norway_1", "norway_2", "norway_63", "fuji"}
+    assert (len(visited), visited.count_in_country("norway"), visited.count_in_country("japan")) == (4, 3, 1)
+    assert visited.visited_any_in_country("japan") and not visited.visited_any_in_country("sweden")
+    assert len(VisitedSet.from_progress({}, catalog)) == 0
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length):
+        return self.docs
+
+
+class FakeDb:
+    def __init__(self, landmarks):
+        self.meta = {}
+        self.docs = landmarks
+        self.landmarks = self
+        self.catalog_meta = self
+
+    def find(self, query, projection=None):
+        return FakeCursor([dict(d) for d in self.docs if "ordinal" not in d])
+
+    async def find_one_and_update(self, query, update, upsert=False, return_document=None):
+        for field, amount in update["$inc"].items():
+            self.meta[field] = self.meta.get(field, 0) + amount
+        return dict(self.meta)
+
+    async def bulk_write(self, ops, ordered=True):
+        for op in ops:
+            doc = next(d for d in self.docs if d["landmark_id"] == op._filter["landmark_id"])
+            doc.setdefault("ordinal", op._doc["$set"]["ordinal"])
+
+
+def test_ordinals_are_assigned_once_and_never_renumbered():
+    db = FakeDb([{"landmark_id": "vasa"}, {"landmark_id": "bryggen"}])
+    assert asyncio.run(assign_landmark_ordinals(db)) == 2
+    assert {d["landmark_id"]: d["ordinal"] for d in db.docs} == {"bryggen": 0, "vasa": 1}
+
+    # A deletion and an addition: the new landmark takes the next slot
+    db.docs = [d for d in db.docs if d["landmark_id"] != "bryggen"] + [{"landmark_id": "akershus"}]
+    assert asyncio.run(assign_landmark_ordinals(db)) == 1
+    assert {d["landmark_id"]: d["ordinal"] for d in db.docs} == {"vasa": 1, "akershus": 2}
+    assert asyncio.run(assign_landmark_ordinals(db)) == 0
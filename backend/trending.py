@@ -0,0 +1,82 @@
+"""
+Trending landmarks.
+
+Each landmark has one `landmark_stats` document with a `trend_score`: an
+exponentially decayed sum of recent visits and upvotes with a half-life of
+TREND_HALF_LIFE_DAYS. Instead of decaying every score over time, an event at
+time t adds `weight * exp(λ * (t - TREND_EPOCH))`. All scores are then in the
+same units, so ordering by the stored value is ordering by current trend, and
+recording an event is a single `$inc`. Serving reads the top-k entries of a
+`(continent, trend_score)` index and never touches `visits`.
+
+Scores double every half-life after the epoch; a float holds ~1000 doublings,
+so with a 7-day half-life there are about 19 years before the epoch has to
+move (rescale all scores by exp(-λ * shift)).
+"""
+
+import math
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+TREND_HALF_LIFE_DAYS = 7.0
+TREND_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+VISIT_WEIGHT = 1.0
+UPVOTE_WEIGHT = 0.5
+
+_DECAY_PER_SECOND = math.log(2) / (TREND_HALF_LIFE_DAYS * 86400)
+
+
+def _seconds_since_epoch(at: datetime) -> float:
+    if at.tzinfo is None:
+        at = at.replace(tzinfo=timezone.utc)
+    return (at - TREND_EPOCH).total_seconds()
+
+
+def event_score(weight: float, at: Optional[datetime] = None) -> float:
+    """Stored-score contribution of an event of `weight` happening at `at`"""
+    now = _seconds_since_epoch(datetime.now(timezone.utc))
+    # Events dated in the future count as happening now
+    seconds = min(_seconds_since_epoch(at), now) if at else now
+    return weight * math.exp(_DECAY_PER_SECOND * seconds)
+
+
+def current_score(stored: float, now: Optional[datetime] = None) -> float:
+    """A stored score decayed to `now`, i.e. in units of events happening now"""
+    now = now or datetime.now(timezone.utc)
+    return stored * math.exp(-_DECAY_PER_SECOND * _seconds_since_epoch(now))
+
+
+async def record_trending_event(
+    db,
+    landmark: dict,
+    weight: float,
+    at: Optional[datetime] = None,
+    counters: Optional[Dict[str, int]] = None,
+):
+    """Add an event to the landmark's trend score (and `counters` to the same stats document)"""
+    await db.landmark_stats.update_one(
+        {"landmark_id": landmark["landmark_id"]},
+        {
+            "$inc": {"trend_score": event_score(weight, at), **(counters or {})},
+            "$set": {"continent": landmark.get("continent"), "country_id": landmark.get("country_id")},
+        },
+        upsert=True,
+    )
+
+
+async def top_trending(db, continent: Optional[str] = None, limit: int = 20) -> List[dict]:
+    """[{landmark_id, trending_score}] best first, read from the top of the score index"""
+    # limit(0) means no limit to MongoDB
+    limit = max(limit, 1)
+    query = {"trend_score": {"$gt": 0}}
+    if continent:
+        query["continent"] = continent
+    stats = await db.landmark_stats.find(
+        query, {"landmark_id": 1, "trend_score": 1, "_id": 0}
+    ).sort("trend_score", -1).limit(limit).to_list(limit)
+    now = datetime.now(timezone.utc)
+    return [
+        {"landmark_id": s["landmark_id"], "trending_score": current_score(s["trend_score"], now)}
+        for s in stats
+    ]
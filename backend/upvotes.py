@@ -0,0 +1,254 @@
+"""
+Landmark upvotes.
+
+`landmark_upvotes` holds one document per (landmark_id, user_id), enforced by
+a unique index, with an `active` flag (documents written before the flag
+existed count as active). `toggle_upvote` flips it in a single atomic
+round trip, so concurrent double-taps serialize on that one document instead
+of racing a find / insert / delete sequence.
+
+The live count of each landmark is `landmark_stats.upvotes`, kept out of
+the versioned catalog. Each toggle adds +1/-1 to an in-process
+`UpvoteCounter`, and a background task flushes the pending deltas as one bulk
+write per interval, so a burst of taps on a popular landmark costs a single
+write. The same task refreshes `LiveUpvotes`, this worker's copy of the counts
+changed since its last refresh, which the landmark detail and the upvote
+response read.
+
+Upvotes alone never bump the catalog version: that would invalidate every
+ETag and cached payload, make every worker reload the catalog and put the
+landmarks in every client's delta sync. `landmarks.upvotes` (the catalog copy
+used to sort landmark lists and rank suggestions) is only brought up to date
+by `publish_upvote_counts`, every UPVOTE_PUBLISH_SECONDS, as one version.
+
+Deltas still pending when a worker dies are lost, so the counts are only
+guaranteed up to the last flush. `reconcile_upvote_counts` recomputes every
+count from `landmark_upvotes`. Run it while no worker has pending deltas,
+e.g. from a maintenance window or right after a deploy.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from catalog import catalog_store
+
+logger = logging.getLogger(__name__)
+
+# An upserted document has no created_at yet, so it starts inactive and the
+# toggle activates it. Legacy documents (no `active`) count as active.
+_TOGGLE = [
+    {"$set": {
+        "active": {"$not": [{"$ifNull": ["$active", {"$ne": [{"$type": "$created_at"}, "missing"]}]}]},
+        "created_at": {"$ifNull": ["$created_at", "$$NOW"]},
+        "updated_at": "$$NOW",
+    }}
+]
+
+ACTIVE_UPVOTE = {"active": {"$ne": False}}
+
+# Writes stamped just before a refresh may commit just after it: re-read this far back
+_REFRESH_OVERLAP = timedelta(seconds=5)
+
+
+def _add_upvotes(baseline: int, delta: int) -> list:
+    # A landmark's first live count starts from its catalog count
+    return [{"$set": {
+        "upvotes": {"$add": [{"$ifNull": ["$upvotes", baseline]}, delta]},
+        "upvotes_at": "$$NOW",
+    }}]
+
+
+async def toggle_upvote(db, landmark_id: str, user_id: str) -> Tuple[bool, bool]:
+    """Flip the user's upvote on a landmark.
+
+    Returns (upvoted, first_time): whether it is now upvoted, and whether this
+    was the user's first ever upvote of the landmark.
+    """
+    for attempt in range(2):
+        try:
+            upvote = await db.landmark_upvotes.find_one_and_update(
+                {"landmark_id": landmark_id, "user_id": user_id},
+                _TOGGLE,
+                upsert=True,
+                projection={"active": 1, "created_at": 1, "updated_at": 1, "_id": 0},
+                return_document=ReturnDocument.AFTER,
+            )
+            # $$NOW is constant within one update, so both are equal only on insert
+            return upvote["active"], upvote["created_at"] == upvote["updated_at"]
+        except DuplicateKeyError:
+            # Two first taps raced on the upsert; the retry matches the
+            # document the other one inserted.
+            if attempt:
+                raise
+
+
+class UpvoteCounter:
+    """Write-behind buffer of per-landmark upvote deltas"""
+
+    def __init__(self):
+        self._pending: Dict[str, int] = {}
+        self._lock = asyncio.Lock()
+
+    def add(self, landmark_id: str, delta: int):
+        self._pending[landmark_id] = self._pending.get(landmark_id, 0) + delta
+
+    def pending(self, landmark_id: str) -> int:
+        return self._pending.get(landmark_id, 0)
+
+    async def flush(self, db) -> int:
+        """Apply pending deltas to the live counts as one bulk write. Returns the number applied."""
+        async with self._lock:
+            pending, self._pending = self._pending, {}
+            deltas = [(landmark_id, delta) for landmark_id, delta in pending.items() if delta]
+            if not deltas:
+                return 0
+
+            catalog = await catalog_store.get(db)
+            failed = 0
+            try:
+                await db.landmark_stats.bulk_write([
+                    UpdateOne(
+                        {"landmark_id": landmark_id},
+                        _add_upvotes((catalog.landmarks_by_id.get(landmark_id) or {}).get("upvotes", 0) or 0, delta),
+                        upsert=True,
+                    )
+                    for landmark_id, delta in deltas
+                ], ordered=False)
+            except BulkWriteError as e:
+                # Keep the deltas whose update failed for the next flush
+                errors = e.details.get("writeErrors", [])
+                for error in errors:
+                    self.add(*deltas[error["index"]])
+                failed = len(errors)
+                logger.error(f"Upvote flush partially failed: {errors}")
+            except Exception:
+                for landmark_id, delta in deltas:
+                    self.add(landmark_id, delta)
+                raise
+            return len(deltas) - failed
+
+
+class LiveUpvotes:
+    """This worker's copy of the live upvote counts (`landmark_stats.upvotes`).
+
+    Holds the landmarks whose count was written since the worker started;
+    any other landmark's count is still the one in the catalog.
+    """
+
+    def __init__(self):
+        self.counts: Dict[str, int] = {}
+        self._seen_until: Optional[datetime] = None
+
+    def get(self, landmark: dict) -> int:
+        return self.counts.get(landmark["landmark_id"], landmark.get("upvotes", 0) or 0)
+
+    async def refresh(self, db) -> int:
+        """Read the counts written since the last refresh. Returns how many were read."""
+        query = {"upvotes": {"$exists": True}}
+        if self._seen_until is not None:
+            query["upvotes_at"] = {"$gte": self._seen_until - _REFRESH_OVERLAP}
+        rows = await db.landmark_stats.find(
+            query, {"landmark_id": 1, "upvotes": 1, "upvotes_at": 1, "_id": 0}
+        ).to_list(None)
+        for row in rows:
+            self.counts[row["landmark_id"]] = row["upvotes"]
+            if row.get("upvotes_at") and (self._seen_until is None or row["upvotes_at"] > self._seen_until):
+                self._seen_until = row["upvotes_at"]
+        return len(rows)
+
+
+async def publish_upvote_counts(db) -> int:
+    """Copy live counts that moved into `landmarks.upvotes`, as one catalog version.
+
+    Returns the number of landmarks published (0: no new version).
+    """
+    live = {
+        row["landmark_id"]: row["upvotes"]
+        async for row in db.landmark_stats.find({"upvotes": {"$exists": True}}, {"landmark_id": 1, "upvotes": 1, "_id": 0})
+    }
+    # Compared with the stored documents, so workers publishing at the same time find nothing left to do
+    stale = [
+        (landmark["landmark_id"], live[landmark["landmark_id"]])
+        async for landmark in db.landmarks.find(
+            {"landmark_id": {"$in": list(live)}}, {"landmark_id": 1, "upvotes": 1, "_id": 0}
+        )
+        if (landmark.get("upvotes") or 0) != live[landmark["landmark_id"]]
+    ]
+    if not stale:
+        return 0
+    await _set_catalog_upvotes(db, stale)
+    return len(stale)
+
+
+async def _set_catalog_upvotes(db, counts):
+    await db.landmarks.bulk_write([
+        UpdateOne({"landmark_id": landmark_id}, {"$set": {"upvotes": count}})
+        for landmark_id, count in counts
+    ], ordered=False)
+    landmarks = await db.landmarks.find(
+        {"landmark_id": {"$in": [landmark_id for landmark_id, _ in counts]}}, {"_id": 0}
+    ).to_list(None)
+    await catalog_store.apply_landmarks(db, landmarks)
+
+
+async def sync_upvotes(db, counter: "UpvoteCounter", live: LiveUpvotes, interval: float, publish_interval: float):
+    """Background task: flush `counter` and refresh `live` every `interval`
+    seconds, and publish the counts to the catalog every `publish_interval`"""
+    since_publish = 0.0
+    while True:
+        await asyncio.sleep(interval)
+        since_publish += interval
+        try:
+            await counter.flush(db)
+            await live.refresh(db)
+            if since_publish >= publish_interval:
+                since_publish = 0.0
+                await publish_upvote_counts(db)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Upvote sync failed: {e}")
+
+
+async def reconcile_upvote_counts(db) -> int:
+    """Reset every landmark's live and catalog `upvotes` to its count of active upvotes.
+
+    Returns the number of landmarks whose catalog count was corrected.
+    """
+    counts = {
+        row["_id"]: row["count"]
+        async for row in db.landmark_upvotes.aggregate([
+            {"$match": ACTIVE_UPVOTE},
+            {"$group": {"_id": "$landmark_id", "count": {"$sum": 1}}},
+        ])
+    }
+    landmarks = [
+        landmark async for landmark in db.landmarks.find({}, {"landmark_id": 1, "upvotes": 1, "_id": 0})
+    ]
+    if landmarks:
+        await db.landmark_stats.bulk_write([
+            UpdateOne(
+                {"landmark_id": landmark["landmark_id"]},
+                [{"$set": {"upvotes": counts.get(landmark["landmark_id"], 0), "upvotes_at": "$$NOW"}}],
+                upsert=True,
+            )
+            for landmark in landmarks
+        ], ordered=False)
+    stale = [
+        (landmark["landmark_id"], counts.get(landmark["landmark_id"], 0))
+        for landmark in landmarks
+        if (landmark.get("upvotes") or 0) != counts.get(landmark["landmark_id"], 0)
+    ]
+    if not stale:
+        return 0
+    await _set_catalog_upvotes(db, stale)
+    return len(stale)
+
+
+upvote_counter = UpvoteCounter()
+live_upvotes = LiveUpvotes()
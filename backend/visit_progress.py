@@ -0,0 +1,289 @@
+"""
+Per-user progress document.
+
+`user_progress` holds one document per user:
+
+    visits               visits posted
+    landmarks            distinct landmarks visited
+    points               points earned from landmark visits
+    countries            {country_id: distinct landmarks visited there}
+    continents           {continent: distinct landmarks visited there}
+    continent_points     {continent: catalog points of those landmarks}
+    completed_countries  countries whose every landmark was visited
+    country_visits       countries with a country visit (country_visits)
+    visited_bits         visited landmarks as a bitset (visited_set.py)
+
+It is updated on the write paths: `record_visit_progress` bumps it with a
+single `find_one_and_update` per visit, and `record_country_visit` when a
+country visit is created or deleted. `/progress`, `/stats`,
+`/continent-stats`, the achievements showcase and the badge check read it
+with one indexed `find_one` and compare it with the catalog snapshot's totals
+(in memory) instead of loading visits and landmarks.
+
+`add_visit` learns from the counters after its own `$inc` whether a visit
+opened or completed a country or continent, whatever the size of the
+continent. The counters only move through `$inc`, and a landmark counts once
+per user (`record_visitor` decides first visits on a unique index), so
+concurrent visits each see a distinct value and only one of them opens or
+completes a given country.
+
+A user without a document (visits from before it existed) gets one built from
+their visits on first use. Visits posted since are marked `progress_counted`:
+their own request counts them with `$inc`, so the build leaves them out and a
+visit racing the build is never counted twice. `completed_countries` follows the catalog at the
+time of the visit; after catalog edits, or to repair drift, rebuild every
+document with:
+
+    python visit_progress.py
+"""
+
+import asyncio
+import os
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReplaceOne, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from catalog import CatalogSnapshot, assign_landmark_ordinals, catalog_store
+from visited_set import bit_update, encode
+
+# Set on visits that record_visit_progress counts itself (add_visit)
+COUNTED_FIELD = "progress_counted"
+
+# Bonus points for what a visit opened or completed (see visit_outcome)
+FIRST_IN_COUNTRY_BONUS = 20
+FIRST_IN_CONTINENT_BONUS = 50
+COUNTRY_COMPLETION_BONUS = 50
+CONTINENT_COMPLETION_BONUS = 200
+
+
+def _continent(catalog: CatalogSnapshot, landmark: dict) -> Optional[str]:
+    # The catalog summary groups by the landmark's continent
+    if landmark.get("continent"):
+        return landmark["continent"]
+    return (catalog.countries_by_id.get(landmark.get("country_id")) or {}).get("continent")
+
+
+def _country_total(catalog: CatalogSnapshot, country_id: str) -> int:
+    return len(catalog.landmarks_by_country.get(country_id, ()))
+
+
+def build_progress(user_id: str, landmark_ids: Iterable[str], visits: int, catalog: CatalogSnapshot,
+                   points: int = 0, country_visits: Iterable[str] = ()) -> dict:
+    """A user's progress document from the landmarks they visited and their country visits"""
+    countries = defaultdict(int)
+    continents = defaultdict(int)
+    continent_points = defaultdict(int)
+    ordinals = []
+    landmarks = 0
+    for landmark_id in set(landmark_ids):
+        landmark = catalog.landmarks_by_id.get(landmark_id)
+        if not landmark:
+            continue
+        landmarks += 1
+        if landmark.get("ordinal") is not None:
+            ordinals.append(landmark["ordinal"])
+        if landmark.get("country_id"):
+            countries[landmark["country_id"]] += 1
+        continent = _continent(catalog, landmark)
+        if continent:
+            continents[continent] += 1
+            continent_points[continent] += landmark.get("points", 10)
+    return {
+        "user_id": user_id,
+        "visits": visits,
+        "landmarks": landmarks,
+        "points": points,
+        "countries": dict(countries),
+        "continents": dict(continents),
+        "continent_points": dict(continent_points),
+        "completed_countries": sorted(
+            country_id for country_id, visited in countries.items() if visited >= _country_total(catalog, country_id)
+        ),
+        "country_visits": sorted(set(country_visits)),
+        "visited_bits": encode(ordinals),
+        "updated_at": datetime.now(timezone.utc),
+    }
+
+
+async def _visited_landmarks(db, user_id: Optional[str] = None, uncounted_only: bool = False):
+    """[{user_id, landmark_ids, visits, points}] from the visits collection"""
+    match = {"user_id": user_id} if user_id else {}
+    if uncounted_only:
+        match[COUNTED_FIELD] = {"$ne": True}
+    return await db.visits.aggregate([
+        {"$match": match},
+        {"$group": {
+            "_id": "$user_id",
+            "landmark_ids": {"$addToSet": "$landmark_id"},
+            "visits": {"$sum": 1},
+            "points": {"$sum": {"$ifNull": ["$points_earned", 10]}},
+        }},
+        {"$project": {"_id": 0, "user_id": "$_id", "landmark_ids": 1, "visits": 1, "points": 1}},
+    ]).to_list(None)
+
+
+async def _visited_countries(db, user_id: Optional[str] = None):
+    """[{user_id, country_ids}] from the country_visits collection"""
+    return await db.country_visits.aggregate([
+        {"$match": {"user_id": user_id}} if user_id else {"$match": {}},
+        {"$group": {"_id": "$user_id", "country_ids": {"$addToSet": "$country_id"}}},
+        {"$project": {"_id": 0, "user_id": "$_id", "country_ids": 1}},
+    ]).to_list(None)
+
+
+def visit_outcome(catalog: CatalogSnapshot, progress: dict, landmark: dict, first_visit: bool) -> dict:
+    """What a visit opened or completed, from the counters after it"""
+    outcome = {
+        "visit_count": progress.get("visits", 0),
+        "first_in_country": False,
+        "first_in_continent": False,
+        "country_completed": False,
+        "continent_completed": False,
+    }
+    country_id = landmark.get("country_id")
+    if not first_visit or not country_id:
+        return outcome
+
+    counts = progress.get("countries") or {}
+    continent = _continent(catalog, landmark)
+    visited_here = counts.get(country_id, 0)
+
+    outcome["first_in_country"] = visited_here == 1
+    outcome["first_in_continent"] = visited_here == 1 and (progress.get("continents") or {}).get(continent) == 1
+    # Exactly one visit moves the counter onto the country's total, however many race
+    outcome["country_completed"] = visited_here == _country_total(catalog, country_id)
+    outcome["continent_completed"] = outcome["country_completed"] and all(
+        counts.get(other, 0) >= _country_total(catalog, other)
+        for other in catalog.countries_by_continent.get(continent, ())
+    )
+    return outcome
+
+
+async def record_visit_progress(db, user_id: str, landmark: dict, first_visit: bool) -> Tuple[dict, dict]:
+    """Count a visit (already inserted). Returns (progress document, visit outcome)."""
+    catalog = await catalog_store.get(db)
+    increments = {"visits": 1, "points": landmark.get("points", 10)}
+    update = {"$inc": increments, "$set": {"updated_at": datetime.now(timezone.utc)}}
+    if first_visit:
+        increments["landmarks"] = 1
+        if landmark.get("country_id"):
+            increments[f"countries.{landmark['country_id']}"] = 1
+        continent = _continent(catalog, landmark)
+        if continent:
+            increments[f"continents.{continent}"] = 1
+            increments[f"continent_points.{continent}"] = landmark.get("points", 10)
+        if landmark.get("ordinal") is not None:
+            update["$bit"] = bit_update(landmark["ordinal"])
+
+    async def increment():
+        return await db.user_progress.find_one_and_update(
+            {"user_id": user_id},
+            update,
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    progress = await increment()
+    if progress is None:
+        # First visit since counters exist: build them from the earlier visits
+        # (this one and any racing it are marked counted and left out), then count it
+        await _backfill(db, user_id, catalog)
+        progress = await increment()
+    outcome = visit_outcome(catalog, progress, landmark, first_visit)
+    completed = progress.setdefault("completed_countries", [])
+    if outcome["country_completed"] and landmark["country_id"] not in completed:
+        await db.user_progress.update_one(
+            {"user_id": user_id}, {"$addToSet": {"completed_countries": landmark["country_id"]}}
+        )
+        completed.append(landmark["country_id"])
+    return progress, outcome
+
+
+async def record_country_visit(db, user_id: str, country_id: str, visited: bool = True):
+    """Add (or, for a deleted country visit, remove) a country from the user's country visits"""
+    operator = "$addToSet" if visited else "$pull"
+    result = await db.user_progress.update_one(
+        {"user_id": user_id},
+        {operator: {"country_visits": country_id}, "$set": {"updated_at": datetime.now(timezone.utc)}},
+    )
+    if not result.matched_count:
+        # No document yet: the backfill reads country_visits, which already has this write
+        await get_user_progress(db, user_id)
+
+
+async def _backfill(db, user_id: str, catalog: CatalogSnapshot) -> Optional[dict]:
+    """Build and store a user's first progress document; None if another request just did"""
+    visited = await _visited_landmarks(db, user_id, uncounted_only=True)
+    countries = await _visited_countries(db, user_id)
+    progress = build_progress(
+        user_id,
+        visited[0]["landmark_ids"] if visited else [],
+        visited[0]["visits"] if visited else 0,
+        catalog,
+        points=visited[0]["points"] if visited else 0,
+        country_visits=countries[0]["country_ids"] if countries else (),
+    )
+    try:
+        await db.user_progress.insert_one(dict(progress))
+    except DuplicateKeyError:
+        return None
+    return progress
+
+
+async def get_user_progress(db, user_id: str) -> dict:
+    """A user's progress document, built on first use"""
+    progress = await db.user_progress.find_one({"user_id": user_id}, {"_id": 0})
+    if progress is None:
+        progress = await _backfill(db, user_id, await catalog_store.get(db))
+        if progress is None:
+            progress = await db.user_progress.find_one({"user_id": user_id}, {"_id": 0})
+    return progress
+
+
+async def rebuild_user_progress(db) -> int:
+    """Recompute every user's document from visits and country visits. Returns the number of users."""
+    catalog = await catalog_store.get(db)
+    visited = {v["user_id"]: v for v in await _visited_landmarks(db)}
+    countries = {c["user_id"]: c["country_ids"] for c in await _visited_countries(db)}
+    user_ids = visited.keys() | countries.keys()
+    if user_ids:
+        await db.user_progress.bulk_write([
+            ReplaceOne(
+                {"user_id": user_id},
+                build_progress(
+                    user_id,
+                    visited.get(user_id, {}).get("landmark_ids", []),
+                    visited.get(user_id, {}).get("visits", 0),
+                    catalog,
+                    points=visited.get(user_id, {}).get("points", 0),
+                    country_visits=countries.get(user_id, ()),
+                ),
+                upsert=True,
+            )
+            for user_id in user_ids
+        ], ordered=False)
+    return len(user_ids)
+
+
+async def main():
+    load_dotenv(Path(__file__).parent / ".env")
+    client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+    db = client[os.environ["DB_NAME"]]
+
+    await db.user_progress.create_index("user_id", unique=True)
+    # Visited bits are keyed by landmark ordinals
+    await assign_landmark_ordinals(db)
+    started = datetime.now(timezone.utc)
+    users = await rebuild_user_progress(db)
+    print(f"Rebuilt progress for {users} users in {(datetime.now(timezone.utc) - started).total_seconds():.1f}s")
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
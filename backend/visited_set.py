@@ -0,0 +1,95 @@
+"""
+Per-user visited-landmark bitset.
+
+Bit `n` is set when the user has visited the landmark whose stable catalog
+ordinal is `n` (assigned on publish, see catalog.py). The bits live on the
+user's `user_progress` document as a sparse map of 64-bit words,
+
+    visited_bits    {"<word index>": int64}
+
+because `$bit` only operates on integers: `record_visit_progress` sets a
+visit's bit in the same `find_one_and_update` that bumps the counters, and
+concurrent visits can never clear each other's bits. ~700 landmarks fit in 11
+words.
+
+`VisitedSet` reassembles the words into one Python int, so a membership test
+is a shift and a per-country count is `(bits & country_mask).bit_count()`
+against masks precomputed once per catalog version, instead of fetching the
+user's visit rows.
+
+Landmarks written without publishing have no ordinal yet and are reported as
+not visited until the next publish; `python visit_progress.py` rebuilds the
+bits together with the counters.
+"""
+
+from typing import Iterable, Iterator, Mapping
+
+from bson.int64 import Int64
+
+from catalog import CatalogSnapshot
+
+WORD_BITS = 64
+_WORD_MASK = (1 << WORD_BITS) - 1
+
+
+def _int64(word: int) -> Int64:
+    # Stored as a signed 64-bit integer: the top bit becomes the sign
+    return Int64(word - (1 << WORD_BITS) if word >> (WORD_BITS - 1) else word)
+
+
+def bit_update(ordinal: int) -> dict:
+    """`$bit` operand setting one ordinal's bit"""
+    word, bit = divmod(ordinal, WORD_BITS)
+    return {f"visited_bits.{word}": {"or": _int64(1 << bit)}}
+
+
+def encode(ordinals: Iterable[int]) -> dict:
+    """{"<word index>": int64} with the given ordinals' bits set"""
+    words = {}
+    for ordinal in ordinals:
+        word, bit = divmod(ordinal, WORD_BITS)
+        words[word] = words.get(word, 0) | (1 << bit)
+    return {str(word): _int64(value) for word, value in sorted(words.items())}
+
+
+def decode(words: Mapping[str, int]) -> int:
+    """The bitset as one non-negative int"""
+    bits = 0
+    for word, value in (words or {}).items():
+        bits |= (int(value) & _WORD_MASK) << (int(word) * WORD_BITS)
+    return bits
+
+
+class VisitedSet:
+    """The landmarks one user has visited, against one catalog snapshot"""
+
+    def __init__(self, bits: int, catalog: CatalogSnapshot):
+        self.bits = bits
+        self.catalog = catalog
+
+    @classmethod
+    def from_progress(cls, progress: dict, catalog: CatalogSnapshot) -> "VisitedSet":
+        return cls(decode((progress or {}).get("visited_bits")), catalog)
+
+    def __contains__(self, landmark_id: str) -> bool:
+        ordinal = (self.catalog.landmarks_by_id.get(landmark_id) or {}).get("ordinal")
+        return ordinal is not None and (self.bits >> ordinal) & 1 == 1
+
+    def __len__(self) -> int:
+        return self.bits.bit_count()
+
+    def __iter__(self) -> Iterator[str]:
+        """Visited landmark ids (landmarks still in the catalog)"""
+        bits, by_ordinal = self.bits, self.catalog.landmarks_by_ordinal
+        while bits:
+            low = bits & -bits
+            landmark = by_ordinal.get(low.bit_length() - 1)
+            if landmark:
+                yield landmark["landmark_id"]
+            bits ^= low
+
+    def count_in_country(self, country_id: str) -> int:
+        return (self.bits & self.catalog.country_ordinal_masks.get(country_id, 0)).bit_count()
+
+    def visited_any_in_country(self, country_id: str) -> bool:
+        return (self.bits & self.catalog.country_ordinal_masks.get(country_id, 0)) != 0
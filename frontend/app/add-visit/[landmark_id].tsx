@@ -15,7 +15,7 @@ import CelebrationEffect from '../../components/CelebrationEffect';
 import { checkLevelUp } from '../../utils/rankSystem';
 import UniversalHeader from '../../components/UniversalHeader';
 import { trackVisitForReview, maybePromptForReview } from '../../utils/appReview';
-import { sendAchievementNotification, sendStreakMilestoneNotification } from '../../utils/notifications';
+import { sendStreakMilestoneNotification } from '../../utils/notifications';
 
 // Helper to get token (works on both web and native)
 const getToken = async (): Promise<string | null> => {
@@ -131,6 +131,8 @@ export default function AddVisitScreen() {
         throw new Error('Failed to create visit');
       }
 
+      // Badges are awarded in the background after the visit is saved and
+      // arrive as push notifications (sent by the server)
       const result = await response.json();
 
       // Fetch updated user data to get new points and check for level-up
@@ -185,11 +187,6 @@ export default function AddVisitScreen() {
         celebrationMessage += `\n\n🔥 ${result.current_streak}-day streak going!`;
       }
 
-      // Add badge info if available
-      if (result.newly_awarded_badges && result.newly_awarded_badges.length > 0) {
-        celebrationMessage += `\n\n✨ New badge unlocked: ${result.newly_awarded_badges[0].name}!`;
-      }
-      
       // Add rank up mention even if there's a country/continent completion
       if (rankedUp && newRank && (result.country_completed || result.continent_completed)) {
         celebrationMessage += `\n\n⭐ BONUS: You also ranked up to ${newRank.name}!`;
@@ -209,12 +206,7 @@ export default function AddVisitScreen() {
       // Track visit for app review prompt
       await trackVisitForReview();
       
-      // Send notifications for achievements
-      if (result.newly_awarded_badges && result.newly_awarded_badges.length > 0) {
-        const badge = result.newly_awarded_badges[0];
-        await sendAchievementNotification(badge.name, badge.icon || '🏆');
-      }
-      
+      // Send notification for streak milestones
       if (result.streak_milestone_reached) {
         await sendStreakMilestoneNotification(result.new_milestone);
       }
@@ -50,6 +50,12 @@ interface Landmark {
   is_locked?: boolean;
 }
 
+interface LandmarkVisitors {
+  visitor_count: number;
+  friends_visited_count: number;
+  friends_visited: { user_id: string; name: string }[];
+}
+
 export default function LandmarkDetailScreen() {
   const { landmark_id } = useLocalSearchParams();
   const [landmark, setLandmark] = useState<Landmark | null>(null);
@@ -59,10 +65,12 @@ export default function LandmarkDetailScreen() {
   const [bucketListLoading, setBucketListLoading] = useState(false);
   const [isVisited, setIsVisited] = useState(false);
   const [visitId, setVisitId] = useState<string | null>(null);
+  const [visitors, setVisitors] = useState<LandmarkVisitors | null>(null);
   const router = useRouter();
 
   useEffect(() => {
     fetchLandmark();
+    fetchVisitors();
     checkBucketListStatus();
     checkVisitStatus();
   }, []);
@@ -87,6 +95,23 @@ export default function LandmarkDetailScreen() {
     }
   };
 
+  // Visitor counts and friends are per user, so they are not part of the
+  // (cacheable) landmark response
+  const fetchVisitors = async () => {
+    try {
+      const token = await getToken();
+      const response = await fetch(`${BACKEND_URL}/api/landmarks/${landmark_id}/visitors`, {
+        headers: { Authorization: `Bearer ${token}` },
+      });
+
+      if (response.ok) {
+        setVisitors(await response.json());
+      }
+    } catch (error) {
+      console.error('Error fetching visitors:', error);
+    }
+  };
+
   const checkVisitStatus = async () => {
     try {
       const token = await getToken();
@@ -382,6 +407,32 @@ export default function LandmarkDetailScreen() {
           </View>
         )}
 
+        {/* Visitors Section */}
+        {visitors && visitors.visitor_count > 0 && (
+          <View style={styles.section}>
+            <View style={styles.sectionHeader}>
+              <Ionicons name="footsteps" size={24} color={theme.colors.primary} />
+              <Text style={styles.sectionTitle}>Explorers</Text>
+            </View>
+            <Surface style={styles.card}>
+              <View style={styles.upvotesRow}>
+                <Ionicons name="people" size={24} color={theme.colors.primary} />
+                <Text style={styles.upvotesText}>
+                  {visitors.visitor_count} {visitors.visitor_count === 1 ? 'explorer has' : 'explorers have'} been here
+                </Text>
+              </View>
+              {visitors.friends_visited_count > 0 && (
+                <Text style={styles.friendsVisitedText}>
+                  Including {visitors.friends_visited.map((friend) => friend.name).join(', ')}
+                  {visitors.friends_visited_count > visitors.friends_visited.length
+                    ? ` and ${visitors.friends_visited_count - visitors.friends_visited.length} more friends`
+                    : ''}
+                </Text>
+              )}
+            </Surface>
+          </View>
+        )}
+
         {/* Community Section */}
         {landmark.category === 'user_suggested' && (
           <View style={styles.section}>
@@ -692,6 +743,11 @@ const styles = StyleSheet.create({
     color: theme.colors.text,
     fontWeight: '600',
   },
+  friendsVisitedText: {
+    ...theme.typography.body,
+    color: theme.colors.textSecondary,
+    marginTop: theme.spacing.sm,
+  },
   // Floating Action Button
   fabContainer: {
     position: 'absolute',